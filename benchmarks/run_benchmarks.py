@@ -0,0 +1,214 @@
+"""
+Benchmark suite for the tarjan_planner package.
+
+Generates synthetic cities of several sizes around Seoul and times loading
+the CSV files, building the graph, each route solver and rendering the map.
+Every case records its best wall-clock time over a number of repeats, its
+throughput and its peak traced memory; the clustered solver also records its
+quality gap against the flat heuristic given the same time budget. Results
+are compared against a stored baseline and regressions beyond the tolerance
+are flagged. Run from the repository root:
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 12 200 --update-baseline
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarjan_planner.relatives_manager import RelativesManager  # noqa: E402
+from tarjan_planner.synthetic import generate_city  # noqa: E402
+from tarjan_planner.tarjan_planner import TarjanPlanner  # noqa: E402
+from tarjan_planner.transport_manager import TransportLinkManager  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Largest city each exponential solver is run on
+EXACT_LIMITS = {"brute_force": 9, "pareto": 10, "branch_and_bound": 12, "held_karp": 16}
+
+
+# Solvers that stop at their time budget, so their wall time is not compared
+ANYTIME_CASES = ("heuristic", "clustered", "genetic")
+
+
+def measure(func, repeat):
+    """
+    Run 'func' 'repeat' times and return its best time, the peak traced memory and its last result.
+
+    The timed runs are not traced, tracemalloc slows every allocation down;
+    the memory peak comes from one extra traced run.
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def city_cases(files, n, time_budget, output_dir):
+    """
+    Return the (name, function, work items) benchmark cases for one city.
+    """
+    def load():
+        RelativesManager(files[0]).get_relatives()
+        manager = TransportLinkManager(files[1], files[2])
+        manager.get_transport()
+        manager.get_links()
+
+    def build():
+        planner = TarjanPlanner(*files)
+        planner.create_graph()
+        return planner
+
+    planner = build()
+    start = planner.edge_index.nodes[0]
+    links = len(planner.edge_index.arrays["start"])
+
+    def closure():
+        planner._closures = {}
+        planner.shortest_path_closure()
+
+    cases = [
+        ("load", load, n + links),
+        ("create_graph", build, links),
+        ("shortest_path_closure", closure, n * n),
+        ("heuristic", lambda: planner.find_best_route(
+            start, method="heuristic", time_budget=time_budget, use_shortest_paths=True), n),
+        ("clustered", lambda: planner.find_best_route(
+            start, method="clustered", time_budget=time_budget, use_shortest_paths=True), n),
+        ("genetic", lambda: planner.find_best_route(
+            start, method="genetic", time_budget=time_budget, use_shortest_paths=True), n),
+    ]
+    if n <= EXACT_LIMITS["held_karp"]:
+        cases.append(("held_karp", lambda: planner.find_best_route(
+            start, use_shortest_paths=True), 2 ** (n - 1)))
+    if n <= EXACT_LIMITS["branch_and_bound"]:
+        cases.append(("branch_and_bound", lambda: planner.find_best_route(
+            start, method="branch_and_bound", time_budget=time_budget, use_shortest_paths=True), 1))
+    if n <= EXACT_LIMITS["brute_force"]:
+        cases.append(("brute_force", lambda: planner.find_best_route(
+            start, method="brute_force"), 1))
+    if n <= EXACT_LIMITS["pareto"]:
+        cases.append(("pareto", lambda: planner.find_pareto_routes(start), 1))
+    route = planner.find_best_route(start, method="heuristic", time_budget=time_budget,
+                                    use_shortest_paths=True)
+    cases.append(("plot_graph", lambda: planner.plot_graph(
+        route, output_file=os.path.join(output_dir, f"map_{n}.png")), links))
+    return cases
+
+
+def run(sizes, links_per_relative, repeat, time_budget):
+    """
+    Run every benchmark case for each city size and return the results by case.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            files = generate_city(os.path.join(directory, str(n)), n, links_per_relative)
+            for name, func, items in city_cases(files, n, time_budget, directory):
+                seconds, peak, route = measure(func, repeat)
+                results[f"{n}/{name}"] = {
+                    "seconds": seconds,
+                    "items_per_second": items / seconds if seconds else None,
+                    "peak_memory_mb": peak / 2 ** 20,
+                }
+                if name in ("heuristic", "clustered", "genetic") and route:
+                    results[f"{n}/{name}"]["route_hours"] = sum(
+                        segment["duration"] for segment in route
+                    )
+            flat = results[f"{n}/heuristic"]
+            for name in ("clustered", "genetic"):
+                other = results[f"{n}/{name}"]
+                if "route_hours" in flat and "route_hours" in other:
+                    other["quality_gap"] = other["route_hours"] / flat["route_hours"] - 1
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Return the cases that are slower than the baseline by more than 'tolerance'.
+
+    Anytime solvers always use their whole time budget, so they are judged
+    by their route quality instead.
+    """
+    regressions = {}
+    for case, result in results.items():
+        if case.split("/", 1)[1] in ANYTIME_CASES:
+            continue
+        previous = baseline.get(case)
+        if previous and result["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions[case] = result["seconds"] / previous["seconds"]
+    return regressions
+
+
+def main():
+    """
+    Run the benchmarks, print a report and flag regressions against the baseline.
+    """
+    parser = argparse.ArgumentParser(description="tarjan_planner benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[9, 100, 1000],
+                        help="numbers of relatives in each synthetic city")
+    parser.add_argument("--links-per-relative", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--time-budget", type=float, default=0.5,
+                        help="seconds given to the heuristic solver")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a case is flagged, e.g. 0.25 for 25%%")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.links_per_relative, args.repeat, args.time_budget)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, mode="r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance)
+
+    print(f"{'Case':<28}{'Seconds':>10}{'Items/s':>14}{'Peak MB':>10}  Baseline")
+    for case, result in results.items():
+        previous = baseline.get(case)
+        if case in regressions:
+            status = f"REGRESSION x{regressions[case]:.2f}"
+        elif case.split("/", 1)[1] in ANYTIME_CASES:
+            status = "anytime"
+        elif previous:
+            status = f"x{result['seconds'] / previous['seconds']:.2f}"
+        else:
+            status = "-"
+        throughput = result["items_per_second"] or 0
+        print(f"{case:<28}{result['seconds']:>10.4f}{throughput:>14.0f}"
+              f"{result['peak_memory_mb']:>10.2f}  {status}")
+    for case, result in results.items():
+        if "quality_gap" in result:
+            print(f"{case}: {result['quality_gap']:+.1%} route time against the flat heuristic")
+
+    if args.json:
+        with open(args.json, mode="w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+    if args.update_baseline:
+        with open(args.baseline, mode="w", encoding="utf-8") as file:
+            json.dump(results, file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+    return 1 if regressions and not args.update_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Cold-start benchmark for the TarjanPlanner entry points.
+
+Each entry point is run in a fresh interpreter several times to record its
+wall-clock start-up time, then once more under ``python -X importtime`` to
+list the slowest imports it pulled in. The fastest run of each entry point
+is compared against a stored baseline and start-up regressions beyond the
+tolerance are flagged. Run from the repository root:
+
+    python benchmarks/startup.py --repeat 5 --json
+    python benchmarks/startup.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baseline.json")
+
+ENTRY_POINTS = {
+    "import": (["-c", "import tarjan_planner"], None),
+    "help": (["-m", "tarjan_planner", "--help"], None),
+    "menu": (["-m", "tarjan_planner"], "0\n"),
+    "plan": (["-m", "tarjan_planner", "plan", "--start", "Yeoui-daero", "--format", "json"], None),
+}
+
+
+def time_entry_point(args, stdin, repeat):
+    """
+    Return the wall-clock seconds of each run of an entry point.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + args, input=stdin, text=True, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def slowest_imports(args, stdin, count):
+    """
+    Return the top-level packages with the largest cumulative import time.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args, input=stdin, text=True, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Only count outermost imports, which are not indented
+        if not name.startswith("  "):
+            package = name.strip().split(".")[0]
+            packages[package] = packages.get(package, 0) + int(cumulative) / 1000
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def compare(report, baseline, tolerance):
+    """
+    Return the entry points whose fastest start is slower than the baseline by more than 'tolerance'.
+    """
+    regressions = {}
+    for name, result in report.items():
+        previous = baseline.get(name)
+        if previous and result["min_ms"] > previous["min_ms"] * (1 + tolerance):
+            regressions[name] = result["min_ms"] / previous["min_ms"]
+    return regressions
+
+
+def main():
+    """
+    Benchmark every entry point, print a report and flag regressions against the baseline.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before an entry point is flagged, e.g. 0.25 for 25%%")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    args = parser.parse_args()
+
+    report = {}
+    for name, (entry_args, stdin) in ENTRY_POINTS.items():
+        timings = time_entry_point(entry_args, stdin, args.repeat)
+        report[name] = {
+            "min_ms": min(timings) * 1000,
+            "median_ms": statistics.median(timings) * 1000,
+            "slowest_imports_ms": dict(slowest_imports(entry_args, stdin, args.top)),
+        }
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, mode="r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    regressions = compare(report, baseline, args.tolerance)
+
+    if args.json:
+        for name, result in report.items():
+            result["regression"] = regressions.get(name)
+        print(json.dumps(report, indent=4))
+    else:
+        for name, result in report.items():
+            previous = baseline.get(name)
+            if name in regressions:
+                status = f"REGRESSION x{regressions[name]:.2f}"
+            elif previous:
+                status = f"x{result['min_ms'] / previous['min_ms']:.2f}"
+            else:
+                status = "-"
+            imports = ", ".join(f"{module} {ms:.0f}ms" for module, ms in result["slowest_imports_ms"].items())
+            print(f"{name:<8} min {result['min_ms']:7.1f} ms  median {result['median_ms']:7.1f} ms  "
+                  f"{status:<16}[{imports}]")
+
+    if args.update_baseline:
+        with open(args.baseline, mode="w", encoding="utf-8") as file:
+            json.dump({
+                name: {"min_ms": result["min_ms"], "median_ms": result["median_ms"]}
+                for name, result in report.items()
+            }, file, indent=4)
+        print(f"Baseline written to {args.baseline}", file=sys.stderr if args.json else sys.stdout)
+    return 1 if regressions and not args.update_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
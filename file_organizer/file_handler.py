@@ -20,6 +20,7 @@ class FileHandler:
         if not os.path.exists(self.destination_directory):
             os.makedirs(self.destination_directory, exist_ok=True)
         
+        moved = 0
         for root, _, files in os.walk(self.source_directory):
             for file in files:
                 file_path = os.path.join(root, file)
@@ -30,4 +31,5 @@ class FileHandler:
                 shutil.move(file_path, dest_path)
                 normalized_dest_path = os.path.normpath(dest_path)
                 self.logger.log(f"Moved {file} to {normalized_dest_path}")
-                print(f"Moved {file} to {normalized_dest_path}")
\ No newline at end of file
+                moved += 1
+        print(f"Moved {moved} files")
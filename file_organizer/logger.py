@@ -1,46 +1,134 @@
 """
 Handles logging of operations.
+
+Log calls only put the record on a queue. A listener thread writes the lines
+to the log file in batches, and writes out whatever is waiting when the
+queue is idle or an error is logged.
 """
 
 import logging
 import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    Writes log lines to a file in batches.
+
+    Lines are buffered until 'batch_size' of them are waiting, 'flush_interval'
+    seconds have passed since the last write, or an error is logged.
+    """
+
+    def __init__(self, filename, mode='a', batch_size=100, flush_interval=1.0):
+        super().__init__(filename, mode, encoding='utf-8', delay=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+            if (
+                len(self.buffer) >= self.batch_size
+                or record.levelno >= logging.ERROR
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self.flush()
+        except Exception:
+            # Reported like any handler error, so the listener thread keeps running
+            self.buffer = []
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(''.join(self.buffer))
+                self.buffer = []
+            super().flush()
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class FlushingQueueListener(QueueListener):
+    """
+    Queue listener that writes out its handler's waiting lines while the queue is idle.
+    """
+
+    def __init__(self, log_queue, handler, flush_interval):
+        super().__init__(log_queue, handler, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    try:
+                        handler.flush()
+                    except (OSError, ValueError):
+                        pass
+
 
 class Logger:
-    def __init__(self, log_file):
+    # Logger whose listener is running, closed when a new one is created
+    _active = None
+
+    def __init__(self, log_file, level=logging.INFO, flush_interval=1.0, batch_size=100):
         log_file = os.path.abspath(log_file)
         log_dir = os.path.dirname(log_file)
         if not os.path.exists(log_dir):
-            os.makedirs(log_dir, exist_ok=True)    
-        print(f"Creating log file at: {log_file}")  # Debug statement
-        
-        # Clear any existing handlers
-        for handler in logging.root.handlers[:]:
-            logging.root.removeHandler(handler)
-        
-        logging.basicConfig(
-            filename=log_file,
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            filemode='w'
-        )
-        self.logger = logging.getLogger()
-        self.logger.setLevel(logging.INFO)
-        self.handler = logging.FileHandler(log_file, mode='w')
-        self.handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        self.logger.addHandler(self.handler)
+            os.makedirs(log_dir, exist_ok=True)
+
+        if Logger._active is not None:
+            Logger._active.close()
+        self.logger = logging.getLogger('file_organizer')
+        self.logger.propagate = False
+        self.logger.setLevel(level)
+        self.handler = BatchFileHandler(log_file, mode='w', batch_size=batch_size,
+                                        flush_interval=flush_interval)
+        self.handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.handler.setLevel(level)
+        log_queue = queue.Queue()
+        self.queue_handler = QueueHandler(log_queue)
+        self.logger.addHandler(self.queue_handler)
+        self.listener = FlushingQueueListener(log_queue, self.handler, flush_interval)
+        self.listener.start()
+        Logger._active = self
 
     def log(self, message):
-        # print(f"Logging message: {message}")  # Debug statement
         self.logger.info(message)
-        self.handler.flush()
 
     def log_error(self, error):
-        print(f"Logging error: {error}")  # Debug statement
         self.logger.error(error)
+        # Errors are on disk before the caller moves on
+        self.flush()
+
+    def flush(self):
+        if self.listener is not None:
+            self.listener.queue.join()
         self.handler.flush()
-        
+
     def close(self):
-        print("Closing log handler")  # Debug statement
-        self.logger.removeHandler(self.handler)
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.logger.removeHandler(self.queue_handler)
         self.handler.close()
-        logging.shutdown()
\ No newline at end of file
+        if Logger._active is self:
+            Logger._active = None
@@ -12,6 +12,7 @@ setup(
         "geopy", # For calculating distances
         "networkx", # For making graph nodes and edges
         "matplotlib", # For plotting graphs
+        "numpy", # For the route solver matrices
         'pytest',  # For running tests
         'logging',  # For logging operations
     ],
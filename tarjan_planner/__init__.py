@@ -2,19 +2,27 @@
 tarjan_planner init module also containing the main module.
 """
 
+import sys
 from .relatives_manager import RelativesManager
 from .transport_manager import TransportManager
-from . import interface
-from .logger import logger
+from .logger import logger, start_logging
 
 
-def main():
+def main(argv=None):
     """
-    Runs main program loop
+    Runs main program loop, or the command line interface when arguments are given
     """
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        from . import cli
+
+        return cli.run(argv)
+    from . import interface
 
     # relatives_manager = RelativesManager("tarjan_planner/relatives.csv")
     # transport_manager = TransportManager("tarjan_planner/transport_modes.csv")
+    start_logging()
     print("-" * 40)
     print("Welcome to TarjanPlanner!")
     logger.info("Program started.")
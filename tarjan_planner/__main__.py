@@ -2,8 +2,9 @@
 Entry point to program.
 """
 
+import sys
 from .__init__ import main
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
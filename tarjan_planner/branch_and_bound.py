@@ -0,0 +1,157 @@
+"""
+Module containing the anytime branch-and-bound route solver.
+
+Routes are extended one stop at a time, depth first and most promising
+extension first, with the cost of each partial route kept incrementally. A
+partial route is dropped as soon as its cost plus a lower bound on the rest
+of the route reaches the best complete route found so far, which starts out
+as a local search route. The search can be stopped at any time: the pending
+partial routes still hold the smallest bound any unexplored route could
+reach, so the best route is returned with a certified optimality gap.
+"""
+
+from time import perf_counter
+import numpy as np
+from .instrumentation import count
+from .route_solvers import local_search, path_cost
+
+# Share of the time budget spent finding the starting route
+INCUMBENT_SHARE = 0.1
+
+
+def lower_bound(weights, symmetric, last, remaining):
+    """
+    Return a lower bound on the cheapest path from 'last' over every node in 'remaining'.
+
+    Two admissible bounds are combined. Every remaining node has to be
+    entered once, from 'last' or another remaining node, which costs at
+    least its cheapest such incoming link. The path is also a spanning tree
+    over 'last' and the remaining nodes, so it costs at least their minimum
+    spanning tree on the cheaper direction of every link ('symmetric').
+    """
+    k = len(remaining)
+    if k == 0:
+        return 0.0
+    nodes = np.concatenate(([last], remaining))
+    incoming = weights[np.ix_(nodes, remaining)]
+    incoming[1:][np.diag_indices(k)] = np.inf
+    cheapest_incoming = float(incoming.min(axis=0).sum())
+    if not np.isfinite(cheapest_incoming):
+        return np.inf
+
+    # Prim's algorithm over the induced subgraph
+    block = symmetric[np.ix_(nodes, nodes)]
+    in_tree = np.zeros(k + 1, dtype=bool)
+    in_tree[0] = True
+    distance = block[0].copy()
+    tree = 0.0
+    for _ in range(k):
+        candidates = np.where(in_tree, np.inf, distance)
+        nearest = int(np.argmin(candidates))
+        tree += candidates[nearest]
+        in_tree[nearest] = True
+        np.minimum(distance, block[nearest], out=distance)
+    return max(cheapest_incoming, float(tree))
+
+
+def branch_and_bound(weights, start=0, time_budget=None, initial=None, node_limit=None):
+    """
+    Exact cheapest path from 'start' over every node, stopping early if asked.
+
+    The search stops after 'time_budget' seconds, after expanding
+    'node_limit' partial routes, or on KeyboardInterrupt, whichever comes
+    first; without limits it runs until the route is proven optimal.
+    'initial' optionally gives the starting route, otherwise one is found
+    by local search.
+
+    Returns the visiting order (or ``None`` if no route visits every node)
+    and a report with its 'cost', the certified 'lower_bound' on the optimal
+    cost, the relative 'gap' between them, whether the route is proven
+    'optimal', and the number of partial routes expanded and pruned.
+    """
+    started = perf_counter()
+    weights = np.asarray(weights, dtype=float)
+    n = len(weights)
+    symmetric = np.minimum(weights, weights.T)
+    deadline = started + time_budget if time_budget is not None else np.inf
+
+    if initial is None and n > 2:
+        share = INCUMBENT_SHARE * time_budget if time_budget is not None else 0.1
+        initial = local_search(weights, start, max(share, 0.01), patience=20)
+    best = list(initial) if initial is not None else None
+    best_cost = path_cost(weights, best) if best is not None else np.inf
+
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    root_bound = lower_bound(weights, symmetric, start, np.flatnonzero(~visited))
+    # Each pending partial route is (bound, cost, path, visited)
+    stack = [(root_bound, 0.0, [start], visited)]
+    expanded = pruned = 0
+    interrupted = False
+    # The partial route being expanded, put back if the search is interrupted
+    popped = None
+    try:
+        while stack:
+            popped = None
+            if perf_counter() >= deadline or node_limit is not None and expanded >= node_limit:
+                interrupted = True
+                break
+            popped = stack.pop()
+            bound, cost, path, visited = popped
+            if bound >= best_cost - 1e-12:
+                # The best route improved since this one was queued
+                pruned += 1
+                continue
+            expanded += 1
+            last = path[-1]
+            remaining = np.flatnonzero(~visited)
+            if len(remaining) == 0:
+                best, best_cost = path, cost
+                continue
+
+            children = []
+            for node in remaining.tolist():
+                child_cost = cost + weights[last, node]
+                if not child_cost < best_cost:
+                    pruned += 1
+                    continue
+                child_visited = visited.copy()
+                child_visited[node] = True
+                child_bound = child_cost + lower_bound(
+                    weights, symmetric, node, remaining[remaining != node]
+                )
+                if child_bound >= best_cost - 1e-12:
+                    pruned += 1
+                    continue
+                children.append((child_bound, child_cost, path + [node], child_visited))
+            # Pushed most promising last, so it is expanded first
+            children.sort(key=lambda child: child[0], reverse=True)
+            stack.extend(children)
+            popped = None
+    except KeyboardInterrupt:
+        interrupted = True
+        if popped is not None:
+            # Its bound stays part of the certified lower bound
+            stack.append(popped)
+
+    count("candidates_evaluated", expanded)
+    count("candidates_pruned", pruned)
+    pending = [entry[0] for entry in stack if entry[0] < best_cost - 1e-12]
+    lower = min([best_cost] + pending)
+    if not pending or best_cost == 0:
+        gap = 0.0
+    elif best is None:
+        gap = np.inf
+    else:
+        gap = (best_cost - lower) / best_cost
+    report = {
+        "cost": float(best_cost),
+        "lower_bound": float(lower),
+        "gap": float(gap),
+        "optimal": not pending,
+        "interrupted": interrupted,
+        "nodes_expanded": expanded,
+        "nodes_pruned": pruned,
+        "seconds": perf_counter() - started,
+    }
+    return best, report
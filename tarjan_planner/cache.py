@@ -0,0 +1,158 @@
+"""
+Module containing the persistent on-disk cache of planner artifacts.
+
+Entries are keyed by a hash of the three CSV files and the planner settings,
+so any change to the data produces a new key and only that entry is
+recomputed. Weight matrices are stored as .npy files that are memory-mapped
+on load, and solved routes are kept alongside them as JSON.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from .edge_index import EdgeIndex
+
+
+class PlannerCache:
+    """
+    Class containing all functions for storing and loading cached planner data
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def key(self, files, settings):
+        """
+        Return the cache key for the contents of the data files and the settings.
+        """
+        digest = hashlib.sha256()
+        for path in files:
+            with open(path, mode="rb") as file:
+                for chunk in iter(lambda: file.read(1 << 16), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def entry_dir(self, key):
+        """
+        Return the directory holding a cache entry.
+        """
+        return os.path.join(self.cache_dir, key)
+
+    def load_graph(self, key):
+        """
+        Load a cached edge index, node positions and unknown link reports, or None if not cached.
+        """
+        directory = self.entry_dir(key)
+        try:
+            with open(os.path.join(directory, "graph.json"), mode="r", encoding="utf-8") as file:
+                graph = json.load(file)
+            arrays = {
+                name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+                for name in graph["arrays"]
+            }
+            edge_index = EdgeIndex.from_arrays(graph["nodes"], graph["modes"], arrays)
+        except (OSError, ValueError, KeyError):
+            return None
+        positions = {name: tuple(pos) for name, pos in graph["positions"]}
+        return edge_index, positions, graph.get("unknown_links", [])
+
+    def store_graph(self, key, edge_index, positions, unknown_links=()):
+        """
+        Store an edge index, node positions and unknown link reports, replacing the entry atomically.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.cache_dir)
+        try:
+            arrays = edge_index.to_arrays()
+            graph = {
+                "nodes": edge_index.nodes,
+                "modes": edge_index.modes,
+                "positions": [[name, list(pos)] for name, pos in positions.items()],
+                "arrays": sorted(arrays),
+                "unknown_links": list(unknown_links),
+            }
+            with open(os.path.join(staging, "graph.json"), mode="w", encoding="utf-8") as file:
+                json.dump(graph, file)
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f"{name}.npy"), array)
+            directory = self.entry_dir(key)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(staging, directory)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def load_array(self, key, name):
+        """
+        Memory-map a cached array, or return None if it is not cached.
+        """
+        try:
+            return np.load(os.path.join(self.entry_dir(key), f"{name}.npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+    def store_array(self, key, name, array):
+        """
+        Store an extra array such as a shortest-path closure in a cache entry.
+        """
+        directory = self.entry_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.npy")
+        # Write beside the target first so readers never see a partial file
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".npy", delete=False) as file:
+            np.save(file, array)
+        os.replace(file.name, path)
+
+    def _load_routes(self, key):
+        """
+        Load every cached route for an entry.
+        """
+        try:
+            with open(os.path.join(self.entry_dir(key), "routes.json"), mode="r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def load_route_entry(self, key, query):
+        """
+        Return the cached route data and solver state for a query, or None if it was never solved.
+        """
+        entry = self._load_routes(key).get(json.dumps(query, sort_keys=True))
+        if entry is None:
+            return None
+        return entry["route"], entry["state"]
+
+    def load_route(self, key, query):
+        """
+        Return the cached route data for a query, or None if it was never solved.
+        """
+        entry = self.load_route_entry(key, query)
+        return None if entry is None else entry[0]
+
+    def store_route(self, key, query, route_data, state=None):
+        """
+        Store the route data solved for a query.
+
+        'state' holds the planner attributes the solve set, such as
+        'last_bounds', so a cache hit can restore them.
+        """
+        routes = self._load_routes(key)
+        routes[json.dumps(query, sort_keys=True)] = {"route": route_data, "state": state or {}}
+        directory = self.entry_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w", dir=directory, suffix=".json", delete=False, encoding="utf-8"
+        ) as file:
+            json.dump(routes, file)
+        os.replace(file.name, os.path.join(directory, "routes.json"))
+
+    def clear(self):
+        """
+        Remove every cache entry.
+        """
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
@@ -0,0 +1,311 @@
+"""
+Module containing the non-interactive command line interface.
+
+Examples:
+    TarjanPlanner plan --start Yeoui-daero --objective time --format json
+    TarjanPlanner batch queries.jsonl --output results.jsonl
+    TarjanPlanner plan --start Yeoui-daero --trace trace.json --trace-format chrome
+    TarjanPlanner serve --socket /tmp/tarjan_planner.sock
+    TarjanPlanner sweep --start Yeoui-daero --vary Bus:Speed_kmh=x1,x1.2 --vary Train:Transfer_Time_min=2,5
+
+A batch file holds one JSON query per line, for example
+{"start": "Yeoui-daero", "stops": ["Gangnam-daero", "Sinsa-daero"], "objective": "cost"}.
+The data files are loaded and the graph is built once for every query.
+'serve' keeps the graph loaded and answers the same queries over a socket,
+see tarjan_planner/service.py.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+RELATIVES_FILE = "tarjan_planner/relatives.csv"
+TRANSPORT_FILE = "tarjan_planner/transport_modes.csv"
+LINKS_FILE = "tarjan_planner/transport_links.csv"
+
+METHODS = ("held_karp", "heuristic", "brute_force", "clustered", "branch_and_bound", "genetic")
+# Kept in step with edge_index.OBJECTIVES, which is not imported so --help stays fast
+OBJECTIVES = ("time", "cost", "distance")
+
+
+def build_parser():
+    """
+    Build the argument parser for the planner subcommands.
+    """
+    parser = argparse.ArgumentParser(
+        prog="TarjanPlanner",
+        description="Plan routes through Seoul. Run without arguments for the interactive menu.",
+    )
+    data = argparse.ArgumentParser(add_help=False)
+    data.add_argument("--relatives", default=RELATIVES_FILE, help="relatives CSV file")
+    data.add_argument("--modes", default=TRANSPORT_FILE, help="transport modes CSV file")
+    data.add_argument("--links", default=LINKS_FILE, help="transport links CSV file")
+    data.add_argument("--cache-dir", help="directory for the persistent planner cache")
+    data.add_argument("--proximity-radius", type=float, metavar="KM",
+                      help="also link every pair of streets within KM by Walking and Bicycle")
+    data.add_argument("--osm", metavar="FILE",
+                      help="price links by road distance over this OpenStreetMap .osm extract")
+
+    solver = argparse.ArgumentParser(add_help=False)
+    solver.add_argument("--objective", choices=OBJECTIVES, default="time")
+    solver.add_argument("--method", choices=METHODS, default="held_karp")
+    solver.add_argument("--time-budget", type=float, default=1.0,
+                        help="seconds allowed for the heuristic, clustered, branch_and_bound and genetic methods")
+    solver.add_argument("--seed", type=int, default=0, help="random seed for the genetic method")
+    solver.add_argument("--generations", type=int,
+                        help="run the genetic method for this many generations instead of --time-budget, "
+                             "so the route depends only on --seed")
+    solver.add_argument("--shortest-paths", action="store_true",
+                        help="allow routes to pass through already visited streets")
+    solver.add_argument("--workers", type=int,
+                        help="worker processes for the exact and clustered methods")
+    solver.add_argument("--clustering", choices=("kmeans", "district"), default="kmeans",
+                        help="how the clustered method groups the stops")
+    solver.add_argument("--cluster-size", type=int, default=50,
+                        help="stops per cluster for k-means clustering")
+
+    tracing = argparse.ArgumentParser(add_help=False)
+    tracing.add_argument("--trace", help="record where the run spent its time and save it to this file")
+    tracing.add_argument("--trace-format", choices=("json", "chrome"), default="json",
+                         help="'chrome' writes trace events for chrome://tracing or Perfetto")
+    tracing.add_argument("--trace-memory", action="store_true",
+                         help="also record the tracemalloc peak of every span")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    plan = subparsers.add_parser("plan", parents=[data, solver, tracing], help="plan a single route")
+    plan.add_argument("--start", required=True, help="street name to start from")
+    plan.add_argument("--stops", nargs="+", help="street names to visit (default: all relatives)")
+    plan.add_argument("--format", choices=("text", "json"), default="text")
+    plan.add_argument("--map", help="save the route map to this PNG/SVG file")
+
+    batch = subparsers.add_parser("batch", parents=[data, solver, tracing],
+                                  help="plan every query in a JSON lines file")
+    batch.add_argument("queries", help="JSON lines file of queries, or - for stdin")
+    batch.add_argument("--output", "-o", default="-", help="JSON lines output file, or - for stdout")
+    batch.add_argument("--map-dir", help="save a route_<line>.png map for every query in this directory")
+
+    sweep = subparsers.add_parser("sweep", parents=[data, solver, tracing],
+                                  help="plan a route under every combination of transport mode parameters")
+    sweep.add_argument("--start", required=True, help="street name to start from")
+    sweep.add_argument("--stops", nargs="+", help="street names to visit (default: all relatives)")
+    sweep.add_argument("--vary", action="append", required=True, metavar="MODE:PARAMETER=V1,V2",
+                       help="values to try for a Speed_kmh, Cost_per_km or Transfer_Time_min column, "
+                            "e.g. Bus:Speed_kmh=40,48 or Bus:Speed_kmh=x1.2; repeat for more columns")
+    sweep.add_argument("--format", choices=("text", "json", "csv"), default="text")
+    sweep.add_argument("--output", "-o", default="-", help="output file, or - for stdout")
+
+    serve = subparsers.add_parser("serve", parents=[data, solver],
+                                  help="answer JSON line queries from a long-running service")
+    serve.add_argument("--socket", help="listen on this Unix socket instead of a TCP port")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--pool-workers", type=int, help="worker processes solving queries")
+    serve.add_argument("--cache-size", type=int, default=256, help="solved queries kept in memory")
+    return parser
+
+
+def planner_options(args):
+    """
+    Return the TarjanPlanner keyword arguments set on the command line.
+    """
+    return {
+        "cache_dir": args.cache_dir,
+        "proximity_radius_km": args.proximity_radius,
+        "road_network": args.osm,
+    }
+
+
+def route_result(query, route_data):
+    """
+    Return the JSON-serialisable result for a solved query.
+    """
+    return {
+        "query": query,
+        "route": route_data,
+        "total_duration": sum(segment["duration"] for segment in route_data),
+        "total_cost": sum(segment["cost"] for segment in route_data),
+        "found": bool(route_data),
+    }
+
+
+def solve_query(planner, query, args):
+    """
+    Solve one query, using the command line settings for anything it omits.
+    """
+    return planner.find_best_route(
+        query["start"],
+        method=query.get("method", args.method),
+        time_budget=query.get("time_budget", args.time_budget),
+        use_shortest_paths=query.get("shortest_paths", args.shortest_paths),
+        objective=query.get("objective", args.objective),
+        workers=query.get("workers", args.workers),
+        stops=query.get("stops"),
+        clustering=query.get("clustering", args.clustering),
+        cluster_size=query.get("cluster_size", args.cluster_size),
+        seed=query.get("seed", args.seed),
+        generations=query.get("generations", args.generations),
+    )
+
+
+def report_error(error):
+    """
+    Print why a query could not be solved and return the exit code for it.
+    """
+    print(f"TarjanPlanner: error: {error}", file=sys.stderr)
+    return 2
+
+
+def run_plan(planner, args):
+    """
+    Plan a single route and print it as text or JSON.
+    """
+    query = {"start": args.start}
+    if args.stops:
+        query["stops"] = args.stops
+    try:
+        route_data = solve_query(planner, query, args)
+    except (ValueError, KeyError, TypeError) as error:
+        return report_error(error)
+    bounds = planner.last_bounds if args.method == "branch_and_bound" else None
+    if args.format == "json":
+        result = route_result(query, route_data)
+        if bounds is not None:
+            result["optimality"] = bounds
+        print(json.dumps(result))
+    else:
+        print(planner.format_route(route_data))
+        if bounds is not None:
+            print(f"Optimality gap: {100 * bounds['gap']:.2f}% (lower bound {bounds['lower_bound']:.2f})")
+    if args.map:
+        planner.plot_graph(route_data, output_file=args.map)
+    return 0 if route_data else 1
+
+
+def run_batch(planner, args):
+    """
+    Plan every query in a JSON lines file and write one JSON result per line.
+    """
+    source = sys.stdin if args.queries == "-" else open(args.queries, mode="r", encoding="utf-8")
+    target = sys.stdout if args.output == "-" else open(args.output, mode="w", encoding="utf-8")
+    failures = 0
+    renderer = None
+    if args.map_dir:
+        os.makedirs(args.map_dir, exist_ok=True)
+        # One figure is reused for every map, only the route overlay changes
+        renderer = planner.make_renderer()
+    try:
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+                route_data = solve_query(planner, query, args)
+                result = route_result(query, route_data)
+                if renderer is not None:
+                    planner.plot_graph(
+                        route_data,
+                        output_file=os.path.join(args.map_dir, f"route_{line_number}.png"),
+                        renderer=renderer,
+                    )
+            except (ValueError, KeyError, TypeError) as error:
+                failures += 1
+                result = {"line": line_number, "error": str(error)}
+            target.write(json.dumps(result) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+    return 1 if failures else 0
+
+
+def run_sweep(planner, args):
+    """
+    Plan the route under every scenario of a parameter sweep and write the results table.
+    """
+    from .sweeps import format_sweep, parse_vary
+
+    try:
+        rows = planner.sweep(
+            args.start,
+            parse_vary(args.vary),
+            objective=args.objective,
+            method=args.method,
+            time_budget=args.time_budget,
+            workers=args.workers,
+            stops=args.stops,
+            use_shortest_paths=args.shortest_paths,
+        )
+    except (ValueError, KeyError, TypeError) as error:
+        return report_error(error)
+    target = sys.stdout if args.output == "-" else open(args.output, mode="w", encoding="utf-8", newline="")
+    try:
+        if args.format == "json":
+            for row in rows:
+                target.write(json.dumps(row) + "\n")
+        elif args.format == "csv":
+            columns = [name for name in rows[0] if name != "route"] if rows else []
+            writer = csv.DictWriter(target, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            target.write(format_sweep(rows) + "\n")
+    finally:
+        if target is not sys.stdout:
+            target.close()
+    return 0 if all(row["found"] for row in rows) else 1
+
+
+def run_serve(args):
+    """
+    Run the route query service until it is interrupted.
+    """
+    import asyncio
+    from .service import RouteService
+
+    service = RouteService(
+        (args.relatives, args.modes, args.links),
+        args,
+        workers=args.pool_workers,
+        cache_size=args.cache_size,
+        planner_options=planner_options(args),
+    )
+    try:
+        asyncio.run(service.serve_forever(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run(argv):
+    """
+    Parse the command line arguments and run the chosen subcommand.
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "serve":
+        return run_serve(args)
+    from .instrumentation import tracer
+    from .logger import start_logging, stop_logging
+    from .tarjan_planner import TarjanPlanner
+
+    if args.command != "batch" and not args.workers:
+        # Worker processes are forked, which should not happen while the log thread runs;
+        # batch queries may ask for workers of their own
+        start_logging()
+    if args.trace:
+        tracer.enable(trace_memory=args.trace_memory)
+    try:
+        planner = TarjanPlanner(args.relatives, args.modes, args.links, **planner_options(args))
+        planner.create_graph()
+        if args.command == "plan":
+            return run_plan(planner, args)
+        if args.command == "sweep":
+            return run_sweep(planner, args)
+        return run_batch(planner, args)
+    finally:
+        if args.trace:
+            tracer.disable()
+            tracer.export(args.trace, args.trace_format)
+        stop_logging()
@@ -0,0 +1,221 @@
+"""
+Module containing the geographic cluster decomposition for very large routes.
+
+The stops are split into clusters, by district or by k-means on their
+coordinates, and the clusters are put in visiting order. Consecutive
+clusters are joined by their cheapest link, which fixes where the path
+enters and leaves each cluster, so every cluster can be solved on its own,
+in parallel. The cluster paths are then stitched together and the joins are
+repaired with 2-opt and Or-opt over the whole route.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import numpy as np
+from .route_solvers import (
+    _finite_weights, held_karp, local_search, nearest_neighbour, neighbour_lists, or_opt,
+    path_cost, two_opt
+)
+
+# Largest cluster (plus its end marker) solved exactly
+EXACT_CLUSTER_SIZE = 12
+
+
+def planar(longitude, latitude):
+    """
+    Project coordinates onto a local plane where distances are roughly isotropic.
+    """
+    longitude = np.asarray(longitude, dtype=float)
+    latitude = np.asarray(latitude, dtype=float)
+    scale = math.cos(math.radians(latitude.mean())) if len(latitude) else 1.0
+    return np.column_stack([longitude * scale, latitude])
+
+
+def kmeans(points, k, seed=0, iterations=100):
+    """
+    Return a cluster label per point from k-means with k-means++ seeding.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    centres = [points[rng.integers(n)]]
+    nearest = ((points - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        index = rng.choice(n, p=nearest / total) if total > 0 else rng.integers(n)
+        centres.append(points[index])
+        nearest = np.minimum(nearest, ((points - points[index]) ** 2).sum(axis=1))
+    centres = np.array(centres)
+
+    labels = np.zeros(n, dtype=np.int64)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+        labels = np.argmin(distances, axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, points[:, d], minlength=k) for d in range(2)], axis=1)
+        moved = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centres)
+        if np.allclose(moved, centres):
+            break
+        centres = moved
+    return labels
+
+
+def group(labels):
+    """
+    Return the point indices of every label, in order of first appearance.
+    """
+    clusters = {}
+    for index, label in enumerate(labels):
+        clusters.setdefault(label, []).append(index)
+    return list(clusters.values())
+
+
+def order_clusters(weights, clusters, start_cluster, time_budget=0.1):
+    """
+    Return the visiting order of the clusters, beginning with 'start_cluster'.
+
+    Clusters are compared by the cheapest link between them.
+    """
+    k = len(clusters)
+    between = np.zeros((k, k))
+    for a in range(k):
+        for b in range(a + 1, k):
+            between[a, b] = between[b, a] = weights[np.ix_(clusters[a], clusters[b])].min()
+    if k <= EXACT_CLUSTER_SIZE:
+        order = held_karp(between, start_cluster)
+    else:
+        order = local_search(between, start_cluster, time_budget, patience=20)
+    if order is None:
+        # Some clusters are not directly linked; the repair step has to fix the joins
+        order = nearest_neighbour(_finite_weights(between)[0], start_cluster)
+    return order
+
+
+def connect(weights, clusters, order, start):
+    """
+    Return the (entry, exit) node of each cluster along the cluster order.
+
+    Each exit and the next entry are the cheapest link between the two
+    clusters; the exit differs from the entry unless the cluster has one
+    node. The last cluster has no exit.
+    """
+    ends = {order[0]: [start, None]}
+    for a, b in zip(order, order[1:]):
+        entry = ends[a][0]
+        exits = [node for node in clusters[a] if node != entry] or [entry]
+        block = weights[np.ix_(exits, clusters[b])]
+        i, j = np.unravel_index(np.argmin(block), block.shape)
+        ends[a][1] = exits[i]
+        ends[b] = [clusters[b][j], None]
+    return ends
+
+
+def solve_cluster(weights, entry, exit_node=None, time_budget=0.1):
+    """
+    Return a path over a cluster's weight matrix from 'entry', ending at 'exit_node' if given.
+
+    The end is fixed by adding a marker node linked only to the exit, which
+    any complete path has to visit last.
+    """
+    weights = np.asarray(weights, dtype=float)
+    m = len(weights)
+    if exit_node is not None and exit_node != entry:
+        extended = np.full((m + 1, m + 1), np.inf)
+        extended[:m, :m] = weights
+        extended[m, m] = 0.0
+        extended[exit_node, m] = extended[m, exit_node] = 0.0
+        weights = extended
+    if len(weights) <= EXACT_CLUSTER_SIZE:
+        order = held_karp(weights, entry)
+    else:
+        order = local_search(weights, entry, time_budget, patience=20)
+    if order is None:
+        order = nearest_neighbour(_finite_weights(weights)[0], entry)
+    return [node for node in order if node < m]
+
+
+def _solve_cluster_task(weights, entry, exit_node, time_budget):
+    """
+    Solve one cluster in a worker process.
+    """
+    return solve_cluster(weights, entry, exit_node, time_budget)
+
+
+def repair(weights, order, time_budget=0.5, neighbours=None):
+    """
+    Improve a stitched path in place with 2-opt and Or-opt over the whole route.
+
+    The moves read the NumPy weight matrix directly, so no nested-list copy
+    of the full matrix is made, and only moves towards each node's nearest
+    neighbours are tried. Missing links count as a large finite penalty, as
+    in local search, so a path that still has one can keep improving.
+    """
+    deadline = perf_counter() + time_budget
+    weights, _ = _finite_weights(weights)
+    if neighbours is None:
+        neighbours = neighbour_lists(weights)
+    previous = path_cost(weights, order)
+    while perf_counter() < deadline:
+        two_opt(weights, order, neighbours, deadline)
+        or_opt(weights, order, neighbours, deadline)
+        cost = path_cost(weights, order)
+        if not cost < previous - 1e-12:
+            break
+        previous = cost
+    return order
+
+
+def clustered_route(weights, start, clusters, time_budget=1.0, workers=None, neighbours=None):
+    """
+    Approximate route over every node by solving clusters separately and stitching them.
+
+    'clusters' lists the node indices of each cluster and must cover every
+    node once. Half of 'time_budget' is shared by the cluster solves and
+    half is used to repair the joins. With 'workers' the clusters are solved
+    on a process pool. 'neighbours' optionally gives the candidate lists
+    used by the repair, see route_solvers.neighbour_lists. Returns the
+    visiting order and a summary with the cluster sizes and the cost before
+    and after repair, or ``None`` for the order when no route visits every
+    node.
+    """
+    weights = np.asarray(weights, dtype=float)
+    start_cluster = next(c for c, cluster in enumerate(clusters) if start in cluster)
+    order = order_clusters(weights, clusters, start_cluster)
+    ends = connect(weights, clusters, order, start)
+
+    parallel = max(1, workers or 1)
+    cluster_budget = max(0.01, 0.5 * time_budget * parallel / len(clusters))
+    tasks = []
+    for c in order:
+        cluster = clusters[c]
+        position = {node: i for i, node in enumerate(cluster)}
+        entry, exit_node = ends[c]
+        tasks.append((
+            weights[np.ix_(cluster, cluster)],
+            position[entry],
+            None if exit_node is None else position[exit_node],
+            cluster_budget,
+        ))
+    if workers and workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            paths = list(pool.map(_solve_cluster_task, *zip(*tasks)))
+    else:
+        paths = [solve_cluster(*task) for task in tasks]
+
+    stitched = []
+    for c, path in zip(order, paths):
+        stitched.extend(clusters[c][i] for i in path)
+    summary = {
+        "clusters": len(clusters),
+        "sizes": [len(clusters[c]) for c in order],
+        "stitched_cost": path_cost(weights, stitched),
+    }
+
+    route = repair(weights, list(stitched), 0.5 * time_budget, neighbours)
+    summary["cost"] = path_cost(weights, route)
+    if not np.isfinite(summary["cost"]):
+        return None, summary
+    return route, summary
@@ -0,0 +1,157 @@
+"""
+Module containing the distance backends used to price transport links.
+
+Every backend takes arrays of coordinates in degrees and returns distances in
+kilometres, so a whole link list or coordinate matrix is computed in one
+batched call instead of one geopy call per pair.
+"""
+
+from time import perf_counter
+import numpy as np
+
+# Mean Earth radius (IUGG) used by the haversine backend
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84 ellipsoid used by the Vincenty backend
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance on a sphere, vectorised over NumPy arrays.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vincenty(lat1, lon1, lat2, lon2, iterations=200, tolerance=1e-12):
+    """
+    Vincenty's inverse formula on the WGS-84 ellipsoid, vectorised over NumPy arrays.
+
+    Pairs that have converged stop changing while the rest keep iterating.
+    Nearly antipodal pairs that never converge fall back to haversine.
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)))
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    big_l = np.radians(lon2 - lon1)
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = big_l.copy()
+    active = np.ones(lam.shape, dtype=bool)
+    for _ in range(iterations):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+        c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+        new_lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+            sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+        )
+        converged = np.abs(new_lam - lam) < tolerance
+        lam = np.where(active, new_lam, lam)
+        active &= ~converged
+        if not active.any():
+            break
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = big_b * sin_sigma * (
+        cos_2sigma_m + big_b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - big_b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        )
+    )
+    distance = WGS84_B * big_a * (sigma - delta_sigma)
+    if active.any():
+        distance = np.where(active, haversine(lat1, lon1, lat2, lon2), distance)
+    return distance
+
+
+def geodesic(lat1, lon1, lat2, lon2):
+    """
+    Reference geopy geodesic (Karney) distance, one call per pair.
+    """
+    from geopy.distance import geodesic as geopy_geodesic
+
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (lat1, lon1, lat2, lon2)))
+    distance = np.empty(lat1.shape)
+    for index in np.ndindex(lat1.shape):
+        distance[index] = geopy_geodesic(
+            (lat1[index], lon1[index]), (lat2[index], lon2[index])
+        ).km
+    return distance
+
+
+BACKENDS = {
+    "haversine": haversine,
+    "vincenty": vincenty,
+    "geodesic": geodesic,
+}
+
+
+def get_backend(name):
+    """
+    Return the distance function registered under a backend name.
+    """
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown distance backend '{name}'") from None
+
+
+def pairwise_distances(lat1, lon1, lat2, lon2, backend="vincenty"):
+    """
+    Distances between matching pairs of coordinates, e.g. the ends of each link.
+    """
+    return get_backend(backend)(lat1, lon1, lat2, lon2)
+
+
+def distance_matrix(lat, lon, backend="vincenty"):
+    """
+    Full distance matrix between every pair of coordinates.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    return get_backend(backend)(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def accuracy_report(lat, lon, backends=("haversine", "vincenty")):
+    """
+    Compare each backend against geopy over every pair of coordinates.
+
+    Returns a dict per backend with its run time, speedup over geopy and the
+    absolute (km) and relative errors, so the speed/precision trade-off can be chosen.
+    """
+    start = perf_counter()
+    reference = distance_matrix(lat, lon, "geodesic")
+    reference_time = perf_counter() - start
+    off_diagonal = ~np.eye(len(reference), dtype=bool)
+
+    report = {"geodesic": {"seconds": reference_time}}
+    for name in backends:
+        start = perf_counter()
+        result = distance_matrix(lat, lon, name)
+        seconds = perf_counter() - start
+        error = np.abs(result - reference)[off_diagonal]
+        relative = error / np.maximum(reference[off_diagonal], 1e-12)
+        report[name] = {
+            "seconds": seconds,
+            "speedup": reference_time / seconds if seconds else float("inf"),
+            "max_error_km": float(error.max()) if error.size else 0.0,
+            "mean_error_km": float(error.mean()) if error.size else 0.0,
+            "max_relative_error": float(relative.max()) if relative.size else 0.0,
+        }
+    return report
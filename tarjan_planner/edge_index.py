@@ -0,0 +1,350 @@
+"""
+Module containing the integer-indexed graph core used by the route solvers.
+
+Streets are numbered by their position in 'nodes'. Every transport link is
+stored as one row of flat option arrays, the adjacency is kept in CSR form
+(indptr/indices) and the cheapest option for each objective is precomputed
+into dense NumPy matrices. Solvers only touch these arrays; string-keyed
+dictionaries are built for the final route alone.
+"""
+
+import numpy as np
+
+# Route objectives and the edge attribute each one minimises
+OBJECTIVES = {
+    "time": "travel_time",
+    "cost": "cost",
+    "distance": "distance",
+}
+
+# Per-option arrays, in the order they are stored
+OPTION_ARRAYS = ("start", "end", "mode", "distance", "travel_time", "cost")
+
+
+class EdgeIndex:
+    """
+    Class keeping every transport option between each pair of streets.
+
+    Unlike a single networkx edge, which keeps only the last link added, the
+    index stores all modes per pair and precomputes dense matrices holding the
+    cheapest option for each objective, so solvers can look them up in O(1).
+    """
+
+    def __init__(self, nodes):
+        self.nodes = list(nodes)
+        self.position = {node: i for i, node in enumerate(self.nodes)}
+        self.modes = []
+        self._mode_ids = {}
+        self.arrays = {
+            "start": np.empty(0, dtype=np.int32),
+            "end": np.empty(0, dtype=np.int32),
+            "mode": np.empty(0, dtype=np.int16),
+            "distance": np.empty(0),
+            "travel_time": np.empty(0),
+            "cost": np.empty(0),
+        }
+        self._pending = []
+        self.weights = {}
+        self.choice = {}
+        self.indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        self.indices = np.empty(0, dtype=np.int32)
+        self.edge_option = np.empty(0, dtype=np.int64)
+
+    def mode_id(self, transport):
+        """
+        Return the integer id of a transport mode, registering it if it is new.
+        """
+        if transport not in self._mode_ids:
+            self._mode_ids[transport] = len(self.modes)
+            self.modes.append(transport)
+        return self._mode_ids[transport]
+
+    def add(self, start, end, transport, distance, travel_time, cost):
+        """
+        Add one transport option between two streets; call build() once all are added.
+        """
+        self._pending.append((
+            self.position[start], self.position[end], self.mode_id(transport),
+            distance, travel_time, cost,
+        ))
+
+    def add_many(self, start, end, transports, distance, travel_time, cost):
+        """
+        Add many options at once from node position and value arrays; call build() afterwards.
+
+        'transports' holds the transport mode name of each option.
+        """
+        self._flush_pending()
+        mode = np.array([self.mode_id(transport) for transport in transports], dtype=np.int16)
+        for name, column in zip(OPTION_ARRAYS, (start, end, mode, distance, travel_time, cost)):
+            self.arrays[name] = np.concatenate(
+                [self.arrays[name], np.asarray(column, dtype=self.arrays[name].dtype)]
+            )
+
+    def _flush_pending(self):
+        """
+        Move the options queued by add() into the option arrays.
+        """
+        if self._pending:
+            columns = list(zip(*self._pending))
+            for name, column in zip(OPTION_ARRAYS, columns):
+                self.arrays[name] = np.concatenate(
+                    [self.arrays[name], np.asarray(column, dtype=self.arrays[name].dtype)]
+                )
+            self._pending = []
+
+    def build(self):
+        """
+        Precompute the CSR adjacency and the weight and choice matrices for every objective.
+        """
+        self._flush_pending()
+
+        n = len(self.nodes)
+        start, end = self.arrays["start"], self.arrays["end"]
+        count = len(start)
+        self._build_csr()
+
+        pair_key = np.minimum(start, end).astype(np.int64) * n + np.maximum(start, end)
+        for objective, attribute in OBJECTIVES.items():
+            # Rank each pair's options by the objective, then travel time, then
+            # the order they were added, and keep the first one per pair
+            values = self.arrays[attribute]
+            ranking = np.lexsort((np.arange(count), self.arrays["travel_time"], values, pair_key))
+            first = np.ones(count, dtype=bool)
+            first[1:] = pair_key[ranking][1:] != pair_key[ranking][:-1]
+            best = ranking[first]
+            choice = np.full((n, n), -1, dtype=np.int64)
+            choice[start[best], end[best]] = best
+            choice[end[best], start[best]] = best
+            weights = np.full((n, n), np.inf)
+            linked = choice >= 0
+            weights[linked] = values[choice[linked]]
+            np.fill_diagonal(weights, 0.0)
+            self.weights[objective] = weights
+            self.choice[objective] = choice
+        return self
+
+    def _build_csr(self):
+        """
+        Rebuild the CSR adjacency over both directions of every option.
+        """
+        start, end = self.arrays["start"], self.arrays["end"]
+        count = len(start)
+        heads = np.concatenate([start, end])
+        tails = np.concatenate([end, start])
+        option_ids = np.concatenate([np.arange(count), np.arange(count)])
+        order = np.lexsort((option_ids, tails, heads))
+        self.indices = tails[order].astype(np.int32)
+        self.edge_option = option_ids[order]
+        self.indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(heads, minlength=len(self.nodes)), out=self.indptr[1:])
+
+    def _make_writable(self):
+        """
+        Copy any read-only (e.g. memory-mapped cache) arrays before patching them.
+        """
+        for name, array in self.arrays.items():
+            if not array.flags.writeable:
+                self.arrays[name] = np.array(array)
+        for table in (self.weights, self.choice):
+            for objective, array in table.items():
+                if not array.flags.writeable:
+                    table[objective] = np.array(array)
+
+    def refresh_pairs(self, pairs):
+        """
+        Recompute the chosen option and weights of the given pairs only.
+        """
+        self._make_writable()
+        for i, j in pairs:
+            indices, option_ids = self.neighbours(i)
+            candidates = option_ids[indices == j].tolist()
+            for objective, attribute in OBJECTIVES.items():
+                values = self.arrays[attribute]
+                times = self.arrays["travel_time"]
+                if candidates:
+                    best = min(candidates, key=lambda k: (values[k], times[k], k))
+                    weight = values[best]
+                else:
+                    best, weight = -1, np.inf
+                if i == j:
+                    # Staying put is free, as in build()
+                    weight = 0.0
+                self.choice[objective][i, j] = self.choice[objective][j, i] = best
+                self.weights[objective][i, j] = self.weights[objective][j, i] = weight
+
+    def add_node(self, node):
+        """
+        Add a street with no links, growing every matrix by one row and column.
+        """
+        if node in self.position:
+            raise ValueError(f"Street '{node}' already exists")
+        self.position[node] = len(self.nodes)
+        self.nodes.append(node)
+        for objective in OBJECTIVES:
+            self.weights[objective] = np.pad(
+                self.weights[objective], ((0, 1), (0, 1)), constant_values=np.inf
+            )
+            self.weights[objective][-1, -1] = 0.0
+            self.choice[objective] = np.pad(
+                self.choice[objective], ((0, 1), (0, 1)), constant_values=-1
+            )
+        self.indptr = np.append(self.indptr, self.indptr[-1])
+        return self.position[node]
+
+    def remove_node(self, node):
+        """
+        Remove a street and every option touching it, renumbering the rest.
+        """
+        i = self.position[node]
+        start, end = self.arrays["start"], self.arrays["end"]
+        self.remove_options(np.flatnonzero((start == i) | (end == i)))
+        del self.nodes[i]
+        self.position = {name: k for k, name in enumerate(self.nodes)}
+        for name in ("start", "end"):
+            self.arrays[name] = self.arrays[name] - (self.arrays[name] > i)
+        for objective in OBJECTIVES:
+            self.weights[objective] = np.delete(np.delete(self.weights[objective], i, 0), i, 1)
+            self.choice[objective] = np.delete(np.delete(self.choice[objective], i, 0), i, 1)
+        self._build_csr()
+
+    def add_option(self, start, end, transport, distance, travel_time, cost):
+        """
+        Add one transport option and update only the matrices of its pair.
+
+        The option is spliced into the CSR rows of its two streets instead of
+        rebuilding the adjacency.
+        """
+        self._make_writable()
+        i, j = self.position[start], self.position[end]
+        k = len(self.arrays["start"])
+        row = (i, j, self.mode_id(transport), distance, travel_time, cost)
+        for name, value in zip(OPTION_ARRAYS, row):
+            self.arrays[name] = np.append(self.arrays[name], np.asarray(value, dtype=self.arrays[name].dtype))
+
+        # Rows are sorted by neighbour, then option id, and k is the largest id
+        positions = []
+        for head, tail in ((i, j), (j, i)):
+            neighbours = self.indices[self.indptr[head]:self.indptr[head + 1]]
+            positions.append(self.indptr[head] + np.searchsorted(neighbours, tail, side="right"))
+        self.indices = np.insert(self.indices, positions, np.array([j, i], dtype=np.int32))
+        self.edge_option = np.insert(self.edge_option, positions, k)
+        shift = np.zeros(len(self.indptr), dtype=np.int64)
+        shift[i + 1:] += 1
+        shift[j + 1:] += 1
+        self.indptr = self.indptr + shift
+        self.refresh_pairs([(i, j)])
+
+    def remove_options(self, option_ids):
+        """
+        Remove options by id and update only the matrices of their pairs.
+        """
+        option_ids = np.asarray(option_ids, dtype=np.int64)
+        if not len(option_ids):
+            return
+        self._make_writable()
+        pairs = set(zip(self.arrays["start"][option_ids].tolist(), self.arrays["end"][option_ids].tolist()))
+        keep = np.ones(len(self.arrays["start"]), dtype=bool)
+        keep[option_ids] = False
+        for name in OPTION_ARRAYS:
+            self.arrays[name] = self.arrays[name][keep]
+        # Renumber the surviving option ids held in the choice matrices
+        renumber = np.cumsum(keep) - 1
+        for objective in OBJECTIVES:
+            choice = self.choice[objective]
+            linked = choice >= 0
+            choice[linked] = np.where(keep[choice[linked]], renumber[choice[linked]], -1)
+        self._build_csr()
+        self.refresh_pairs(pairs)
+
+    def update_options(self, option_ids, travel_time=None, cost=None):
+        """
+        Change the travel time and/or cost of options and update only their pairs.
+        """
+        option_ids = np.asarray(option_ids, dtype=np.int64)
+        self._make_writable()
+        if travel_time is not None:
+            self.arrays["travel_time"][option_ids] = travel_time
+        if cost is not None:
+            self.arrays["cost"][option_ids] = cost
+        self.refresh_pairs(set(zip(
+            self.arrays["start"][option_ids].tolist(), self.arrays["end"][option_ids].tolist()
+        )))
+
+    def to_arrays(self):
+        """
+        Return every array of the built index by name, e.g. for saving to disk.
+        """
+        arrays = {f"option_{name}": array for name, array in self.arrays.items()}
+        arrays.update(indptr=self.indptr, indices=self.indices, edge_option=self.edge_option)
+        for objective in OBJECTIVES:
+            arrays[f"weights_{objective}"] = self.weights[objective]
+            arrays[f"choice_{objective}"] = self.choice[objective]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, nodes, modes, arrays):
+        """
+        Rebuild an index from the output of to_arrays without recomputing anything.
+        """
+        edge_index = cls(nodes)
+        for mode in modes:
+            edge_index.mode_id(mode)
+        edge_index.arrays = {name: arrays[f"option_{name}"] for name in OPTION_ARRAYS}
+        edge_index.indptr = arrays["indptr"]
+        edge_index.indices = arrays["indices"]
+        edge_index.edge_option = arrays["edge_option"]
+        for objective in OBJECTIVES:
+            edge_index.weights[objective] = arrays[f"weights_{objective}"]
+            edge_index.choice[objective] = arrays[f"choice_{objective}"]
+        return edge_index
+
+    def matrix(self, objective="time"):
+        """
+        Return the dense weight matrix for an objective, inf where no link exists.
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'")
+        return self.weights[objective]
+
+    def option(self, k):
+        """
+        Return the details of option k as a dictionary.
+        """
+        return {
+            "transport": self.modes[self.arrays["mode"][k]],
+            "distance": float(self.arrays["distance"][k]),
+            "travel_time": float(self.arrays["travel_time"][k]),
+            "cost": float(self.arrays["cost"][k]),
+        }
+
+    def best_option(self, i, j, objective="time"):
+        """
+        Return the cheapest transport option between two node positions, or None.
+        """
+        k = self.choice[objective][i, j]
+        if k < 0 or i == j:
+            return None
+        return self.option(k)
+
+    def neighbours(self, i):
+        """
+        Return the neighbouring node positions and option ids of node i.
+        """
+        row = slice(self.indptr[i], self.indptr[i + 1])
+        return self.indices[row], self.edge_option[row]
+
+    def pairs(self):
+        """
+        Return each linked pair of node positions once, as an (m, 2) array with i < j.
+        """
+        ends = np.sort(np.stack([self.arrays["start"], self.arrays["end"]], axis=1), axis=1)
+        return np.unique(ends, axis=0).reshape(-1, 2)
+
+    def get_options(self, start, end):
+        """
+        Return every transport option between two streets.
+        """
+        indices, option_ids = self.neighbours(self.position[start])
+        j = self.position[end]
+        return [self.option(k) for k in option_ids[indices == j]]
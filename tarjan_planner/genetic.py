@@ -0,0 +1,162 @@
+"""
+Module containing the population-based route optimiser.
+
+A whole population of routes is held as one 2-D integer array, one route per
+row with the start in column 0, so every generation is a handful of NumPy
+operations instead of a Python loop per hop: all routes are scored with a
+single fancy-indexed lookup into the weight matrix, parents are picked by
+tournament, children are bred by order crossover (OX) and mutated by
+reversing a random segment, and the best routes survive unchanged. The
+final best route is polished with 2-opt and Or-opt.
+"""
+
+from time import perf_counter
+import numpy as np
+from .instrumentation import count
+from .route_solvers import _finite_weights, nearest_neighbour, neighbour_lists, or_opt, two_opt
+
+# Share of the time budget kept for polishing the best route
+POLISH_SHARE = 0.2
+
+# Most rounds of 2-opt and Or-opt run on the best route
+POLISH_ROUNDS = 10
+
+
+def tour_costs(weights, tours):
+    """
+    Return the cost of every route in a (P, n) array of node indices.
+    """
+    return weights[tours[:, :-1], tours[:, 1:]].sum(axis=1)
+
+
+def random_tours(n, size, start, rng):
+    """
+    Return 'size' random routes over n nodes, each beginning with 'start'.
+    """
+    others = np.array([node for node in range(n) if node != start], dtype=np.int64)
+    tours = np.empty((size, n), dtype=np.int64)
+    tours[:, 0] = start
+    tours[:, 1:] = rng.permuted(np.broadcast_to(others, (size, n - 1)), axis=1)
+    return tours
+
+
+def order_crossover(first, second, rng):
+    """
+    Breed one child per row of two parent arrays by order crossover.
+
+    Each child copies a random segment of its first parent, then fills the
+    other positions, from the end of the segment onwards and wrapping round,
+    with the second parent's remaining nodes in the order they appear after
+    that segment. Column 0, the start, is never moved.
+    """
+    size, n = first.shape
+    rows = np.arange(size)[:, None]
+    positions = np.arange(1, n)
+    cuts = np.sort(rng.integers(1, n + 1, size=(size, 2)), axis=1)
+    low, high = cuts[:, :1], cuts[:, 1:]
+    in_segment = (positions >= low) & (positions < high)
+
+    child = np.empty_like(first)
+    child[:, 0] = first[:, 0]
+    child[:, 1:] = np.where(in_segment, first[:, 1:], -1)
+    copied = np.zeros((size, n), dtype=bool)
+    copied[np.broadcast_to(rows, in_segment.shape)[in_segment], first[:, 1:][in_segment]] = True
+
+    # Walk the second parent and the free positions, both from the segment end
+    rotation = (high - 1 + np.arange(n - 1)) % (n - 1) + 1
+    genes = second[rows, rotation]
+    keep = ~copied[rows, genes]
+    genes = np.take_along_axis(genes, np.argsort(~keep, axis=1, kind="stable"), axis=1)
+    free = np.take_along_axis(
+        rotation, np.argsort(in_segment[rows, rotation - 1], axis=1, kind="stable"), axis=1
+    )
+    fill = np.arange(n - 1) < keep.sum(axis=1, keepdims=True)
+    child[np.broadcast_to(rows, fill.shape)[fill], free[fill]] = genes[fill]
+    return child
+
+
+def invert_segments(tours, rate, rng):
+    """
+    Reverse a random segment of about 'rate' of the routes, in place.
+    """
+    size, n = tours.shape
+    mutated = np.flatnonzero(rng.random(size) < rate)
+    if not len(mutated) or n < 3:
+        return tours
+    cuts = np.sort(rng.integers(1, n, size=(len(mutated), 2)), axis=1)
+    low, high = cuts[:, :1], cuts[:, 1:]
+    positions = np.arange(n)
+    inside = (positions >= low) & (positions <= high)
+    source = np.where(inside, low + high - positions, positions)
+    tours[mutated] = np.take_along_axis(tours[mutated], source, axis=1)
+    return tours
+
+
+def tournament(costs, size, rng, entrants=3):
+    """
+    Return the row of the cheapest of 'entrants' random routes, 'size' times.
+    """
+    picks = rng.integers(len(costs), size=(size, entrants))
+    return picks[np.arange(size), np.argmin(costs[picks], axis=1)]
+
+
+def genetic_route(weights, start=0, time_budget=1.0, generations=None, population=256,
+                  elite=8, mutation_rate=0.3, seed=0):
+    """
+    Approximate cheapest path from 'start' over every node by a genetic algorithm.
+
+    The search stops after 'generations' generations if given, otherwise
+    when 'time_budget' seconds have passed. The initial population is random
+    apart from one nearest neighbour route. The best route of the last
+    generation is then improved with 2-opt and Or-opt, for at most
+    POLISH_ROUNDS rounds and until a round finds nothing cheaper, within the
+    last part of the time budget. For a given 'seed'
+    a run over a fixed number of generations always returns the same route.
+    Returns the visiting order, or ``None`` if every route found relies on a
+    missing link.
+    """
+    weights, penalty = _finite_weights(weights)
+    n = len(weights)
+    if n <= 2:
+        order = [start] + [i for i in range(n) if i != start]
+        return order if tour_costs(weights, np.array([order]))[0] < penalty else None
+
+    started = perf_counter()
+    deadline = started + (1 - POLISH_SHARE) * time_budget
+    rng = np.random.default_rng(seed)
+    tours = random_tours(n, population, start, rng)
+    tours[0] = nearest_neighbour(weights, start)
+    costs = tour_costs(weights, tours)
+    evaluated = population
+    generation = 0
+    while perf_counter() < deadline if generations is None else generation < generations:
+        survivors = np.argsort(costs, kind="stable")[:elite]
+        first = tours[tournament(costs, population - elite, rng)]
+        second = tours[tournament(costs, population - elite, rng)]
+        children = invert_segments(order_crossover(first, second, rng), mutation_rate, rng)
+        tours = np.concatenate([tours[survivors], children])
+        costs = np.concatenate([costs[survivors], tour_costs(weights, children)])
+        evaluated += len(children)
+        generation += 1
+
+    count("candidates_evaluated", evaluated)
+    order = tours[int(np.argmin(costs))].tolist()
+    # Runs over a fixed number of generations polish to the end, so they stay reproducible
+    polish_deadline = started + time_budget if generations is None else np.inf
+    # The 2-opt and Or-opt deltas assume a reversed segment costs the same, so
+    # they run on symmetrised weights and a round is kept only if it is cheaper
+    symmetric = np.minimum(weights, weights.T)
+    w = symmetric.tolist()
+    neighbours = neighbour_lists(symmetric)
+    cost = tour_costs(weights, np.array([order]))[0]
+    for _ in range(POLISH_ROUNDS):
+        candidate = list(order)
+        two_opt(w, candidate, neighbours, polish_deadline)
+        or_opt(w, candidate, neighbours, polish_deadline)
+        candidate_cost = tour_costs(weights, np.array([candidate]))[0]
+        if not candidate_cost < cost - 1e-12:
+            break
+        order, cost = candidate, candidate_cost
+    if cost >= penalty:
+        return None
+    return order
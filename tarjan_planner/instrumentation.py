@@ -0,0 +1,218 @@
+"""
+Module containing the hot-path instrumentation used to profile planning runs.
+
+Code marks its stages with nested spans and bumps named counters:
+
+    with span("create_graph"):
+        ...
+    count("route_cache_hits")
+
+Both are no-ops until tracing is enabled, so they can stay in the planner
+permanently. Once enabled, every span records its perf_counter_ns start and
+duration (and optionally its tracemalloc peak), and the results can be saved
+as JSON or as a Chrome trace-event file for chrome://tracing or Perfetto.
+"""
+
+import json
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from time import perf_counter_ns
+
+# Shared context returned by span() while tracing is disabled
+_DISABLED = nullcontext()
+
+
+class Tracer:
+    """
+    Class collecting nested timing spans and counters for one process.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.spans = []
+        self.counters = {}
+        self._local = threading.local()
+        self._started_memory = False
+
+    def enable(self, trace_memory=False):
+        """
+        Start recording spans and counters, optionally with tracemalloc peaks.
+        """
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_memory = True
+        self.enabled = True
+
+    def disable(self):
+        """
+        Stop recording; spans and counters collected so far are kept.
+        """
+        self.enabled = False
+        if self._started_memory:
+            tracemalloc.stop()
+            self._started_memory = False
+        self.trace_memory = False
+
+    def reset(self):
+        """
+        Drop every recorded span and counter.
+        """
+        self.spans = []
+        self.counters = {}
+
+    def _stack(self):
+        """
+        Return the stack of open spans of the current thread.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+        Record the duration of the enclosed block as a span nested in the open one.
+        """
+        stack = self._stack()
+        record = {
+            "name": name,
+            "args": args,
+            "depth": len(stack),
+            "parent": stack[-1]["name"] if stack else None,
+            "thread": threading.get_ident(),
+            "peak_bytes": 0,
+        }
+        if self.trace_memory:
+            # The peak is reset for each span, so hand the parent its peak so far
+            if stack:
+                stack[-1]["peak_bytes"] = max(stack[-1]["peak_bytes"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        stack.append(record)
+        record["start_ns"] = perf_counter_ns()
+        try:
+            yield record
+        finally:
+            record["duration_ns"] = perf_counter_ns() - record["start_ns"]
+            stack.pop()
+            if self.trace_memory:
+                record["peak_bytes"] = max(record["peak_bytes"], tracemalloc.get_traced_memory()[1])
+                if stack:
+                    stack[-1]["peak_bytes"] = max(stack[-1]["peak_bytes"], record["peak_bytes"])
+            else:
+                del record["peak_bytes"]
+            self.spans.append(record)
+
+    def count(self, name, value=1):
+        """
+        Add 'value' to a named counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        """
+        Return the total time, calls and slowest call per span name, slowest first.
+        """
+        totals = {}
+        for record in self.spans:
+            total = totals.setdefault(record["name"], {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+            milliseconds = record["duration_ns"] / 1e6
+            total["calls"] += 1
+            total["total_ms"] += milliseconds
+            total["max_ms"] = max(total["max_ms"], milliseconds)
+        return dict(sorted(totals.items(), key=lambda item: -item[1]["total_ms"]))
+
+    def to_dict(self):
+        """
+        Return every span, the counters and the per-name summary.
+        """
+        return {
+            "spans": sorted(self.spans, key=lambda record: record["start_ns"]),
+            "counters": dict(self.counters),
+            "summary": self.summary(),
+        }
+
+    def chrome_trace(self):
+        """
+        Return the spans and counters as Chrome trace events.
+        """
+        pid = os.getpid()
+        events = []
+        end_us = 0.0
+        for record in sorted(self.spans, key=lambda record: record["start_ns"]):
+            args = {key: str(value) for key, value in record["args"].items()}
+            if "peak_bytes" in record:
+                args["peak_bytes"] = record["peak_bytes"]
+            events.append({
+                "name": record["name"],
+                "cat": "tarjan_planner",
+                "ph": "X",
+                "ts": record["start_ns"] / 1000,
+                "dur": record["duration_ns"] / 1000,
+                "pid": pid,
+                "tid": record["thread"],
+                "args": args,
+            })
+            end_us = max(end_us, (record["start_ns"] + record["duration_ns"]) / 1000)
+        for name, value in self.counters.items():
+            events.append({"name": name, "ph": "C", "ts": end_us, "pid": pid, "args": {name: value}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path, trace_format="json"):
+        """
+        Save the trace to a file as 'json' or 'chrome' trace events.
+        """
+        if trace_format == "json":
+            data = self.to_dict()
+        elif trace_format == "chrome":
+            data = self.chrome_trace()
+        else:
+            raise ValueError(f"Unknown trace format '{trace_format}'")
+        with open(path, mode="w", encoding="utf-8") as file:
+            json.dump(data, file, indent=1, default=str)
+
+
+# Process-wide tracer used by the planner
+tracer = Tracer()
+
+
+def span(name, **args):
+    """
+    Return a span context for 'name', or a shared no-op context while tracing is off.
+    """
+    if not tracer.enabled:
+        return _DISABLED
+    return tracer.span(name, **args)
+
+
+def count(name, value=1):
+    """
+    Add to a named counter while tracing is on.
+    """
+    if tracer.enabled:
+        tracer.count(name, value)
+
+
+def traced(name=None):
+    """
+    Decorator recording every call of a function as a span.
+    """
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -3,19 +3,32 @@ Module containing all functions related to menu.
 """
 
 import time as tm
-from geopy.distance import geodesic
+from functools import lru_cache
 from .relatives_manager import RelativesManager
 from .transport_manager import TransportManager, TransportLinkManager
-from .tarjan_planner import TarjanPlanner
 from .logger import logger, clear_log_file
 
 RELATIVES_FILE = "tarjan_planner/relatives.csv"
 TRANSPORT_FILE = "tarjan_planner/transport_modes.csv"
 LINKS_FILE = "tarjan_planner/transport_links.csv"
+CACHE_DIR = "tarjan_planner/cache"
 
-relatives_manager = RelativesManager(RELATIVES_FILE)
-#transport_manager = TransportManager(TRANSPORT_FILE)
-transport_manager = TransportLinkManager(TRANSPORT_FILE, LINKS_FILE)
+
+@lru_cache(maxsize=None)
+def get_relatives_manager():
+    """
+    Return the shared relatives manager, constructed on first use.
+    """
+    return RelativesManager(RELATIVES_FILE)
+
+
+@lru_cache(maxsize=None)
+def get_transport_manager():
+    """
+    Return the shared transport manager, constructed on first use.
+    """
+    #return TransportManager(TRANSPORT_FILE)
+    return TransportLinkManager(TRANSPORT_FILE, LINKS_FILE)
 
 
 # Menu #
@@ -44,7 +57,7 @@ def print_relatives():
     Lists relatives and location data.
     """
     logger.info("User selected Option 1: List Relatives")
-    relatives_manager.list_relatives()
+    get_relatives_manager().list_relatives()
     logger.info("Returning to Menu...")
     tm.sleep(1)
 
@@ -55,7 +68,7 @@ def print_transport():
     Lists transport data.
     """
     logger.info("User selected Option 2: List Modes of Transport")
-    transport_manager.list_transport()
+    get_transport_manager().list_transport()
     logger.info("Returning to Menu...")
     tm.sleep(1)
 
@@ -65,7 +78,7 @@ def print_links():
     Lists possible transport links
     """
     logger.info("User selected Option 3: List Transport Links")
-    transport_manager.list_links()
+    get_transport_manager().list_links()
     logger.info("Returning to Menu...")
     tm.sleep(1)
 
@@ -75,7 +88,9 @@ def route_planner():
     Runs the route planner to calculate the most efficient route through Seoul.
     """
     logger.info("User selected Option 4: Execute Route Planner")
-    planner = TarjanPlanner(RELATIVES_FILE, TRANSPORT_FILE, LINKS_FILE)
+    from .tarjan_planner import TarjanPlanner
+
+    planner = TarjanPlanner(RELATIVES_FILE, TRANSPORT_FILE, LINKS_FILE, cache_dir=CACHE_DIR)
     planner.create_graph()
 
     # Start at Tarjan's House
@@ -83,7 +98,8 @@ def route_planner():
     
     best_route = []
     best_route = planner.find_best_route(
-        start_node=start_node
+        start_node=start_node,
+        use_shortest_paths=True,
     )
     planner.plot_graph(best_route)
     formatted_route = planner.format_route(best_route)
@@ -99,6 +115,9 @@ def compare_transport_methods():
     Compares different transport methods between two selected relatives based on both time and cost.
     """
     logger.info("User selected Option 5: Compare Transport Methods")
+    from .distances import pairwise_distances
+    from .tarjan_planner import TarjanPlanner
+
     planner = TarjanPlanner(RELATIVES_FILE, TRANSPORT_FILE, LINKS_FILE)
     planner.create_graph()
 
@@ -133,17 +152,14 @@ def compare_transport_methods():
 
     # Calculate and display the comparison of different transport methods
     print(f"Comparison of transport methods between {relative1} ({relative1_street}) and {relative2} ({relative2_street}):")
+    distance = float(pairwise_distances(
+        float(relatives[relative1_index - 1]["Latitude"]),
+        float(relatives[relative1_index - 1]["Longitude"]),
+        float(relatives[relative2_index - 1]["Latitude"]),
+        float(relatives[relative2_index - 1]["Longitude"]),
+        backend=planner.distance_backend,
+    ))
     for transport in planner.transport_manager.get_transport():
-        distance = geodesic(
-            (
-                float(relatives[relative1_index - 1]["Latitude"]),
-                float(relatives[relative1_index - 1]["Longitude"]),
-            ),
-            (
-                float(relatives[relative2_index - 1]["Latitude"]),
-                float(relatives[relative2_index - 1]["Longitude"]),
-            ),
-        ).km
         speed = float(transport["Speed_kmh"])
         cost = float(transport["Cost_per_km"]) * distance
         time = distance / speed + float(transport["Transfer_Time_min"]) / 60
@@ -172,6 +188,8 @@ def clear_log():
 def make_map():
 
     print("You selected Option 7: Make Map")
+    from .tarjan_planner import TarjanPlanner
+
     planner = TarjanPlanner(RELATIVES_FILE, TRANSPORT_FILE, LINKS_FILE)
     planner.create_graph()
     planner.plot_graph()
@@ -1,23 +1,215 @@
 """
 Module containing all logging functions.
+
+The file handler buffers log lines and writes them in batches instead of one
+write per record. Entry points that do not fork worker processes call
+start_logging(), after which log calls only put the record on a queue and a
+listener thread formats and writes it; no thread is started on import. The
+logger's level is the lowest handler level, so disabled levels are dropped
+before their message is formatted. The file level can be set with the
+TARJAN_PLANNER_LOG_LEVEL environment variable, e.g. INFO to leave out the
+per-edge DEBUG lines.
 """
 
+import atexit
 import logging
+import os
+import queue
 import time
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
+from .instrumentation import span
+
+LOG_FILE = "tarjan_planner/tarjan_planner.log"
+
+# Lines buffered by the file handler before they are written
+BATCH_SIZE = 100
+
+# Longest time in seconds a logged line waits before it is written
+FLUSH_INTERVAL = 1.0
+
+
+class BatchFileHandler(logging.FileHandler):
+    """
+    Class writing log lines to a file in batches.
+
+    Lines are buffered until 'batch_size' of them are waiting, 'flush_interval'
+    seconds have passed since the last write, or an error is logged. The file
+    is only opened when the first batch is written.
+    """
+
+    def __init__(self, filename, mode="a", batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 encoding="utf-8"):
+        super().__init__(filename, mode, encoding=encoding, delay=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self._pid = os.getpid()
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            # A forked child: the parent writes the lines it had buffered, and the
+            # child writes its own at once since it may exit without flushing
+            self._pid = os.getpid()
+            self.buffer = []
+            self.batch_size = 1
+        try:
+            self.buffer.append(self.format(record) + self.terminator)
+            if (
+                len(self.buffer) >= self.batch_size
+                or record.levelno >= logging.ERROR
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self.flush()
+        except Exception:
+            # Reported like any handler error, so the listener thread keeps running
+            self.buffer = []
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write("".join(self.buffer))
+                self.buffer = []
+            super().flush()
+            self.last_flush = time.monotonic()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class FlushingQueueListener(QueueListener):
+    """
+    Class containing a queue listener that flushes its handlers while the queue is idle.
+    """
+
+    def __init__(self, log_queue, *handlers, flush_interval=FLUSH_INTERVAL):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, self.flush_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    try:
+                        handler.flush()
+                    except (OSError, ValueError):
+                        # e.g. the console stream was closed; keep the listener running
+                        pass
+
+
+class ForkAwareQueueHandler(QueueHandler):
+    """
+    Class queueing records for a listener thread, or handling them directly in a forked child.
+
+    A child forked while the listener runs has a copy of the queue but no
+    thread reading it, so its records go straight to the handlers.
+    """
+
+    def __init__(self, log_queue, handlers):
+        super().__init__(log_queue)
+        self.handlers = list(handlers)
+        self.pid = os.getpid()
+
+    def emit(self, record):
+        if os.getpid() == self.pid:
+            super().emit(record)
+            return
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
 
+class LogPipeline:
+    """
+    Class connecting a logger to its handlers, directly or through a queue listener thread.
+    """
+
+    def __init__(self, target_logger, handlers, flush_interval=FLUSH_INTERVAL):
+        self.logger = target_logger
+        self.handlers = list(handlers)
+        self.flush_interval = flush_interval
+        self.listener = None
+        self.queue_handler = None
+        for handler in self.handlers:
+            target_logger.addHandler(handler)
+        target_logger.setLevel(min(handler.level for handler in self.handlers))
+
+    def start(self):
+        """
+        Move the handlers behind a queue read by a listener thread.
+        """
+        if self.listener is not None:
+            return
+        log_queue = queue.Queue()
+        self.listener = FlushingQueueListener(log_queue, *self.handlers, flush_interval=self.flush_interval)
+        self.queue_handler = ForkAwareQueueHandler(log_queue, self.handlers)
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+        self.logger.addHandler(self.queue_handler)
+        self.listener.start()
+
+    def flush(self):
+        """
+        Block until every queued record is handled and written out.
+        """
+        if self.listener is not None and self.queue_handler.pid == os.getpid():
+            self.listener.queue.join()
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                pass
+
+    def stop(self):
+        """
+        Hand every queued record to the handlers, stop the listener and attach the handlers directly.
+        """
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.logger.removeHandler(self.queue_handler)
+        for handler in self.handlers:
+            self.logger.addHandler(handler)
+        self.listener = self.queue_handler = None
+
+    def close(self):
+        """
+        Stop the pipeline and close its handlers.
+        """
+        self.stop()
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+            handler.close()
 
-def setup_logger():
+
+def setup_logger(console_level=logging.INFO, file_level=None, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, log_file=LOG_FILE):
     """
     Sets up the logger for the application.
+
+    Returns the pipeline connecting the logger to its handlers.
     """
+    if file_level is None:
+        file_level = os.environ.get("TARJAN_PLANNER_LOG_LEVEL", "DEBUG").upper()
     tarjan_logger = logging.getLogger("tarjan_planner_logger")
-    tarjan_logger.setLevel(logging.DEBUG)
 
     # Create handlers
     c_handler = logging.StreamHandler()
-    f_handler = logging.FileHandler("tarjan_planner/tarjan_planner.log")
-    c_handler.setLevel(logging.INFO)
-    f_handler.setLevel(logging.DEBUG)
+    f_handler = BatchFileHandler(log_file, batch_size=batch_size, flush_interval=flush_interval)
+    c_handler.setLevel(console_level)
+    f_handler.setLevel(file_level)
 
     # Create formatters and add them to handlers
     c_format = logging.Formatter("%(name)s - %(levelname)s - %(message)s")
@@ -25,24 +217,52 @@ def setup_logger():
     c_handler.setFormatter(c_format)
     f_handler.setFormatter(f_format)
 
-    # Add handlers to the logger
-    tarjan_logger.addHandler(c_handler)
-    tarjan_logger.addHandler(f_handler)
-
-    return tarjan_logger
+    return LogPipeline(tarjan_logger, [c_handler, f_handler], flush_interval)
 
 
 # Initialize the logger
-logger = setup_logger()
+pipeline = setup_logger()
+logger = pipeline.logger
+
+
+def start_logging():
+    """
+    Log through the listener thread from now on.
+
+    Called by entry points that do not fork worker processes, so no process
+    is forked while the thread runs.
+    """
+    pipeline.start()
+
+
+def flush_logs():
+    """
+    Write out every record logged so far.
+    """
+    pipeline.flush()
+
+
+def stop_logging():
+    """
+    Hand every queued record to the handlers and stop the listener thread.
+
+    Registered with atexit to run before logging.shutdown, which then
+    flushes and closes the handlers.
+    """
+    pipeline.stop()
+
+
+atexit.register(stop_logging)
 
 
 def clear_log_file():
     """
     Clears all data in the logger file.
     """
-    log_file_path = "tarjan_planner/tarjan_planner.log"
+    log_file_path = LOG_FILE
 
-    # Clear the log file
+    # Write out pending lines first so they do not reappear after clearing
+    flush_logs()
     with open(log_file_path, "w", encoding="utf-8"):
         pass
 
@@ -53,12 +273,16 @@ def clear_log_file():
 def log_execution_time(func):
     """
     Decorator to log the execution time of a function.
+
+    The call is also recorded as an instrumentation span when tracing is on.
     """
 
+    @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.time()
-        result = func(*args, **kwargs)
-        end_time = time.time()
+        start_time = time.perf_counter()
+        with span(func.__name__):
+            result = func(*args, **kwargs)
+        end_time = time.perf_counter()
         execution_time = end_time - start_time
         logger.info("Executed %s in %.4f seconds", func.__name__, execution_time)
         return result
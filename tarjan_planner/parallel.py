@@ -0,0 +1,170 @@
+"""
+Module containing the multi-core versions of the exact route solvers.
+
+The weight matrix and solver tables live in shared memory, so worker
+processes read them directly instead of receiving a pickled graph. Both
+solvers return exactly the same visiting order as their serial versions.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+from multiprocessing import shared_memory
+import numpy as np
+from .route_solvers import held_karp_init, held_karp_order, held_karp_step, popcount_layers
+
+# Shared arrays attached by each worker process, keyed by name
+_shared = {}
+
+
+class SharedArrays:
+    """
+    Class owning a set of NumPy arrays placed in shared memory
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.arrays = {}
+        self.specs = {}
+
+    def add(self, name, array):
+        """
+        Copy an array into a new shared memory block and return the shared view.
+        """
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        self.blocks.append(block)
+        self.arrays[name] = shared
+        self.specs[name] = (block.name, array.shape, array.dtype.str)
+        return shared
+
+    def close(self):
+        """
+        Release and unlink every shared memory block.
+        """
+        self.arrays.clear()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _attach(specs):
+    """
+    Worker initializer attaching the shared arrays described by 'specs'.
+    """
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared[name] = (block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf))
+
+
+def _array(name):
+    """
+    Return a shared array attached in this worker.
+    """
+    return _shared[name][1]
+
+
+def default_workers():
+    """
+    Return the number of worker processes to use when none is given.
+    """
+    return os.cpu_count() or 1
+
+
+def _held_karp_task(k, columns):
+    """
+    Fill the Held-Karp table for one popcount layer and a slice of end nodes.
+    """
+    masks, bounds = _array("masks"), _array("bounds")
+    layer = masks[bounds[k]:bounds[k + 1]]
+    for j in columns:
+        held_karp_step(_array("dp"), _array("parent"), _array("w"), layer, j)
+
+
+def parallel_held_karp(weights, start=0, workers=None):
+    """
+    Held-Karp with each popcount layer split across a process pool by end node.
+
+    Every (layer, end node) update writes its own column of the shared table,
+    so workers never write to the same cells.
+    """
+    weights = np.asarray(weights, dtype=float)
+    others, w = held_karp_init(weights, start)
+    m = len(others)
+    if m == 0:
+        return [start]
+    workers = min(workers or default_workers(), m)
+    masks, bounds = popcount_layers(m)
+
+    with SharedArrays() as shared:
+        shared.add("w", w)
+        shared.add("masks", masks)
+        shared.add("bounds", bounds)
+        dp = shared.add("dp", np.full((1 << m, m), np.inf))
+        parent = shared.add("parent", np.full((1 << m, m), -1, dtype=np.int16))
+        for j in range(m):
+            dp[1 << j, j] = weights[start, others[j]]
+
+        columns = [list(range(m))[i::workers] for i in range(workers)]
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(shared.specs,)) as pool:
+            for k in range(2, m + 1):
+                # Each layer only depends on the one before, so wait for it to finish
+                list(pool.map(_held_karp_task, [k] * workers, columns))
+        return held_karp_order(dp, parent, others, start)
+
+
+def _brute_force_task(prefix, remaining):
+    """
+    Enumerate every route beginning with 'prefix' and return the best one.
+    """
+    rows = _array("weights").tolist()
+    best_total, best_route = float("inf"), None
+    for tail in permutations(remaining):
+        route = prefix + tail
+        total = 0
+        for i in range(len(route) - 1):
+            weight = rows[route[i]][route[i + 1]]
+            if weight == float("inf"):
+                break
+            total += weight
+        else:
+            if total < best_total:
+                best_total, best_route = total, route
+    return best_total, best_route
+
+
+def parallel_brute_force(weights, start=0, workers=None):
+    """
+    Permutation search with the first hops of each route split across a process pool.
+
+    Prefixes are merged in the serial enumeration order, keeping the first
+    of any equally cheap routes, so the result matches the serial search.
+    """
+    weights = np.asarray(weights, dtype=float)
+    nodes = [i for i in range(len(weights)) if i != start]
+    if not nodes:
+        return [start]
+    depth = 2 if len(nodes) > 2 else 1
+    prefixes = [(start,) + prefix for prefix in permutations(nodes, depth)]
+    remaining = [tuple(i for i in nodes if i not in prefix) for prefix in prefixes]
+
+    with SharedArrays() as shared:
+        shared.add("weights", weights)
+        with ProcessPoolExecutor(workers or default_workers(), initializer=_attach,
+                                 initargs=(shared.specs,)) as pool:
+            results = list(pool.map(_brute_force_task, prefixes, remaining))
+
+    best_total, best_route = float("inf"), None
+    for total, route in results:
+        if total < best_total:
+            best_total, best_route = total, route
+    return list(best_route) if best_route is not None else None
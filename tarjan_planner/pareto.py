@@ -0,0 +1,81 @@
+"""
+Module containing the multi-objective route search over travel time and cost.
+"""
+
+from .instrumentation import count
+
+
+def _insert_label(labels, time, cost, parent, option):
+    """
+    Add a label to a non-dominated set, dropping labels it dominates.
+
+    Returns False if an existing label already dominates the new one.
+    """
+    for other in labels:
+        if other[0] <= time and other[1] <= cost:
+            return False
+    labels[:] = [other for other in labels if not (time <= other[0] and cost <= other[1])]
+    labels.append((time, cost, parent, option))
+    return True
+
+
+def pareto_front(edge_index, start):
+    """
+    Label-setting search for every Pareto-optimal route over (time, cost).
+
+    A label is a partial route, stored per (visited set, last node). Each hop
+    may use any transport mode between the two streets, and labels dominated
+    in both time and cost by another label of the same state are pruned.
+    Returns a list of (time, cost, path) sorted by time, where path is a list
+    of (node, option) pairs and option is the id of the edge index option
+    used to reach that node (None for the start).
+    """
+    n = len(edge_index.nodes)
+    times = edge_index.arrays["travel_time"].tolist()
+    costs = edge_index.arrays["cost"].tolist()
+    adjacent = []
+    for i in range(n):
+        indices, option_ids = edge_index.neighbours(i)
+        adjacent.append(list(zip(indices.tolist(), option_ids.tolist())))
+
+    full = (1 << n) - 1
+    layer = {(1 << start, start): [(0.0, 0.0, None, None)]}
+    evaluated = kept = 0
+    for _ in range(n - 1):
+        following = {}
+        for (mask, j), labels in layer.items():
+            for index, (time, cost, _, _) in enumerate(labels):
+                for k, option in adjacent[j]:
+                    if mask >> k & 1:
+                        continue
+                    state = (mask | 1 << k, k)
+                    evaluated += 1
+                    kept += _insert_label(
+                        following.setdefault(state, []),
+                        time + times[option],
+                        cost + costs[option],
+                        ((mask, j), index, layer),
+                        option,
+                    )
+        layer = following
+    count("candidates_evaluated", evaluated)
+    count("candidates_pruned", evaluated - kept)
+
+    # Merge the end states into a single non-dominated front
+    front = []
+    for (mask, j), labels in layer.items():
+        if mask == full:
+            for index, (time, cost, _, _) in enumerate(labels):
+                _insert_label(front, time, cost, ((mask, j), index, layer), None)
+
+    routes = []
+    for time, cost, parent, _ in sorted(front, key=lambda label: (label[0], label[1])):
+        # Follow the parent references back to the start label
+        path = []
+        while parent is not None:
+            state, index, states = parent
+            _, _, parent, option = states[state][index]
+            path.append((state[1], option))
+        path.reverse()
+        routes.append((time, cost, path))
+    return routes
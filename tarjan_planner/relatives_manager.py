@@ -2,7 +2,7 @@
 Module containing all functions related to relatives.
 """
 
-import csv
+from .instrumentation import span
 
 
 class RelativesManager:
@@ -12,16 +12,47 @@ class RelativesManager:
 
     def __init__(self, relatives_file):
         self.relatives_file = relatives_file
-        self.relatives = self.load_relatives()
+        self._relatives = None
+        self._table = None
+
+    @property
+    def table(self):
+        """
+        Relatives as typed columns with a street name index, parsed once from file
+        """
+        # Imported here so the menu starts without loading NumPy
+        from .tables import RelativesTable
+
+        if self._table is None:
+            if self._relatives is not None:
+                # The rows were edited in memory since the file was read
+                self._table = RelativesTable.from_rows(self._relatives)
+            else:
+                with span("load_csv", file=self.relatives_file):
+                    self._table = RelativesTable.from_csv(self.relatives_file)
+        return self._table
+
+    @property
+    def relatives(self):
+        """
+        Relatives list, loaded from file on first use
+        """
+        if self._relatives is None:
+            self._relatives = self.load_relatives()
+        return self._relatives
 
     def load_relatives(self):
         """
         Function to load relatives data from file
         """
         # Load relatives from CSV file
-        with open(self.relatives_file, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            return list(reader)
+        return self.table.rows()
+
+    def relatives_changed(self):
+        """
+        Mark the relatives list as edited, so the table is rebuilt from it on next use
+        """
+        self._table = None
 
     def get_relatives(self):
         """
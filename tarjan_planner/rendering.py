@@ -0,0 +1,153 @@
+"""
+Module containing the batched map renderer used by plot_graph.
+
+The static map (links, streets, legend and labels) is drawn once; each call
+to render only swaps the route overlay, so one figure can be reused to save
+many routes. Figures are drawn with the Agg canvas unless an existing figure
+is supplied, so no display is needed on headless servers.
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.patches as mpatches
+from matplotlib.lines import Line2D
+from .instrumentation import span, traced
+
+# Colors for each transport mode
+TRANSPORT_COLORS = {
+    "Bus": "blue",
+    "Train": "green",
+    "Bicycle": "red",
+    "Walking": "orange",
+}
+DEFAULT_COLOR = "grey"
+
+
+def thin_labels(points, limit):
+    """
+    Return the indices of at most roughly 'limit' points spread over the map.
+
+    Points are binned into a grid of about 'limit' cells and the first point
+    in each cell is kept, so dense areas lose labels before sparse ones.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(points) <= limit:
+        return list(range(len(points)))
+    side = max(int(np.sqrt(limit)), 1)
+    low, high = points.min(axis=0), points.max(axis=0)
+    extent = np.where(high > low, high - low, 1.0)
+    cells = np.minimum(((points - low) / extent * side).astype(int), side - 1)
+    _, first = np.unique(cells[:, 0] * side + cells[:, 1], return_index=True)
+    return sorted(first.tolist())
+
+
+class MapRenderer:
+    """
+    Class drawing the planner map and route overlays with batched artists
+    """
+
+    def __init__(self, planner, home_node="Yeoui-daero", figure=None, figsize=(12, 8),
+                 max_node_labels=60, max_edge_labels=60):
+        self.planner = planner
+        self.home_node = home_node
+        if figure is None:
+            figure = Figure(figsize=figsize)
+            FigureCanvasAgg(figure)
+        self.figure = figure
+        self.ax = figure.add_subplot()
+        self.max_node_labels = max_node_labels
+        self.max_edge_labels = max_edge_labels
+        self._overlay = []
+        self._draw_base()
+
+    @traced("draw_map")
+    def _draw_base(self):
+        """
+        Draw the links, streets, labels and legend that every route shares.
+        """
+        ax = self.ax
+        edge_index = self.planner.edge_index
+        nodes = edge_index.nodes
+        pos = np.array([self.planner.positions[node] for node in nodes]).reshape(-1, 2)
+        ax.set_title("Tarjan's Route Planner")
+
+        # One line collection per transport mode, using the fastest mode per pair
+        segments = {}
+        midpoints, distances = [], []
+        for i, j in edge_index.pairs().tolist():
+            fastest = edge_index.best_option(i, j, "time")
+            segments.setdefault(fastest["transport"], []).append((pos[i], pos[j]))
+            midpoints.append((pos[i] + pos[j]) / 2)
+            distances.append(fastest["distance"])
+        for transport, lines in segments.items():
+            ax.add_collection(LineCollection(
+                lines, colors=TRANSPORT_COLORS.get(transport, DEFAULT_COLOR),
+                linestyles="dashed", linewidths=1, zorder=1,
+            ))
+
+        # Tarjan's home as a green square, every other street as a blue circle
+        home = np.array([node == self.home_node for node in nodes], dtype=bool)
+        ax.scatter(pos[~home, 0], pos[~home, 1], s=500, c="lightblue", marker="o", zorder=2)
+        ax.scatter(pos[home, 0], pos[home, 1], s=500, c="lightgreen", marker="s", zorder=2)
+
+        # Thin out labels on dense maps so they stay readable and cheap to draw
+        for i in thin_labels(pos, self.max_node_labels):
+            ax.text(pos[i, 0], pos[i, 1], nodes[i], fontsize=6, ha="center", va="center", zorder=4)
+        for i in thin_labels(midpoints, self.max_edge_labels):
+            ax.text(
+                midpoints[i][0], midpoints[i][1], f"{distances[i]:.2f}km", fontsize=5,
+                ha="center", va="center", zorder=3,
+                bbox={"boxstyle": "round", "fc": "white", "ec": "none", "alpha": 0.8},
+            )
+
+        transport_handles = [
+            mpatches.Patch(color=color, label=mode)
+            for mode, color in TRANSPORT_COLORS.items()
+        ]
+        location_handles = [
+            mpatches.Patch(facecolor='lightgreen', label="Tarjan's Home"),
+            mpatches.Patch(facecolor='lightblue', label="Residential Districts")
+        ]
+        separator = Line2D([0], [0], color='grey', lw=0.5, linestyle='--')
+        ax.legend(
+            handles=transport_handles + [separator] + location_handles,
+            title="Transport Modes & Locations", loc="upper right",
+        )
+
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        ax.grid(True)
+        ax.autoscale_view()
+        ax.margins(0.05)
+        self.figure.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.05)
+
+    def draw_route(self, route_data=None):
+        """
+        Replace the route overlay with the given route, drawn as batched arrows.
+        """
+        for artist in self._overlay:
+            artist.remove()
+        self._overlay = []
+        if not route_data:
+            return
+
+        positions = self.planner.positions
+        starts = np.array([positions[segment["start"]] for segment in route_data])
+        ends = np.array([positions[segment["end"]] for segment in route_data])
+        colors = [TRANSPORT_COLORS.get(segment["transport"], DEFAULT_COLOR) for segment in route_data]
+        self._overlay.append(self.ax.quiver(
+            starts[:, 0], starts[:, 1], ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1],
+            color=colors, angles="xy", scale_units="xy", scale=1, width=0.003, zorder=3,
+        ))
+
+    def render(self, route_data=None, output_file=None, **savefig_kwargs):
+        """
+        Draw a route over the map and optionally save it; the format follows the file extension.
+        """
+        with span("render", output_file=output_file):
+            self.draw_route(route_data)
+            if output_file is not None:
+                self.figure.savefig(output_file, **savefig_kwargs)
+        return self.figure
@@ -0,0 +1,377 @@
+"""
+Module containing the road network distance backend built from an OpenStreetMap extract.
+
+A local .osm (or .osm.gz) XML file is streamed once to collect the highway
+ways, which become an undirected graph of road nodes weighted by their
+length in kilometres. A contraction hierarchy is then preprocessed: nodes
+are contracted one at a time, least important first, adding a shortcut
+wherever a shortest path ran through the removed node. Every shortest path
+then climbs the hierarchy from both ends, so a query only searches the few
+nodes above its endpoints, and many-to-many tables are answered with one
+upward search per source and target.
+
+The hierarchy is stored in the planner cache format beside the extract,
+keyed by a hash of the file, so it is only built once per extract.
+"""
+
+import gzip
+import heapq
+import os
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+from .cache import PlannerCache
+from .distances import haversine
+from .instrumentation import span
+from .logger import logger
+from .spatial import GridIndex
+
+# Bumped whenever the stored hierarchy format changes
+HIERARCHY_VERSION = 1
+
+# Highway values that are not usable roads or paths
+EXCLUDED_HIGHWAYS = frozenset({"proposed", "construction", "abandoned", "platform", "raceway", "razed"})
+
+# Nodes settled by each witness search before a shortcut is added anyway
+WITNESS_SETTLE_LIMIT = 60
+
+_INFINITY = float("inf")
+
+# Arrays making up a stored road network
+_ARRAYS = ("latitude", "longitude", "rank", "up_indptr", "up_indices", "up_weights")
+
+
+def read_osm(path):
+    """
+    Stream an OSM XML file and return its road graph.
+
+    Returns (latitude, longitude, first, second): the coordinates of every
+    node on a highway way, and the consecutive node pairs along the ways.
+    Only the largest connected part of the network is kept, so that every
+    snapped point can reach every other. Way direction (oneway) is ignored.
+    """
+    if path.endswith(".pbf"):
+        raise ValueError(f"'{path}' is a PBF extract; convert it to .osm XML first, e.g. with osmium")
+    opener = gzip.open if path.endswith(".gz") else open
+    coordinates = {}
+    ways = []
+    with opener(path, "rb") as file:
+        for _, element in ElementTree.iterparse(file, events=("end",)):
+            if element.tag == "node":
+                coordinates[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+            elif element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                highway = tags.get("highway")
+                if highway is not None and highway not in EXCLUDED_HIGHWAYS:
+                    ways.append([nd.get("ref") for nd in element.iter("nd")])
+            else:
+                continue
+            element.clear()
+
+    ids = {}
+    first, second = [], []
+    for refs in ways:
+        refs = [ref for ref in refs if ref in coordinates]
+        for a, b in zip(refs, refs[1:]):
+            if a != b:
+                first.append(ids.setdefault(a, len(ids)))
+                second.append(ids.setdefault(b, len(ids)))
+    if not ids:
+        raise ValueError(f"No highway ways found in '{path}'")
+    latitude, longitude = np.array([coordinates[ref] for ref in ids], dtype=float).T
+    first = np.array(first, dtype=np.int64)
+    second = np.array(second, dtype=np.int64)
+
+    # Keep the largest connected component
+    components = _components(len(ids), first, second)
+    largest = np.argmax(np.bincount(components))
+    keep = components == largest
+    renumber = np.cumsum(keep) - 1
+    edges = keep[first]
+    logger.info(
+        "Road network from %s: %d of %d nodes in the largest component, %d edges",
+        path, int(keep.sum()), len(ids), int(edges.sum()),
+    )
+    return latitude[keep], longitude[keep], renumber[first[edges]], renumber[second[edges]]
+
+
+def _components(n, first, second):
+    """
+    Return a connected component label per node, by union-find.
+    """
+    parent = list(range(n))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in zip(first.tolist(), second.tolist()):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_a] = root_b
+    return np.array([find(node) for node in range(n)], dtype=np.int64)
+
+
+def _witness_distances(adjacency, source, skipped, targets):
+    """
+    Return tentative distances from 'source' that avoid 'skipped'.
+
+    'targets' maps each node of interest to the length of the path through
+    'skipped'; the search stops once every target is settled or nothing
+    closer than the longest of those lengths is left.
+    """
+    limit = max(targets.values())
+    remaining = len(targets)
+    distances = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap and settled < WITNESS_SETTLE_LIMIT:
+        distance, node = heapq.heappop(heap)
+        if distance > limit:
+            break
+        if distance > distances[node]:
+            continue
+        if node in targets:
+            remaining -= 1
+            if not remaining:
+                break
+        settled += 1
+        for neighbour, weight in adjacency[node].items():
+            if neighbour == skipped:
+                continue
+            candidate = distance + weight
+            if candidate < distances.get(neighbour, _INFINITY):
+                distances[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+    return distances
+
+
+def _shortcuts(adjacency, node):
+    """
+    Return the shortcuts (a, b, length) needed to contract 'node'.
+    """
+    items = list(adjacency[node].items())
+    needed = []
+    for k, (a, weight_a) in enumerate(items[:-1]):
+        through = {b: weight_a + weight_b for b, weight_b in items[k + 1:]}
+        witnesses = _witness_distances(adjacency, a, node, through)
+        for b, length in through.items():
+            if witnesses.get(b, _INFINITY) > length:
+                needed.append((a, b, length))
+    return needed
+
+
+class ContractionHierarchy:
+    """
+    Class containing a contraction hierarchy over an undirected weighted graph.
+
+    Each node keeps the edges, original or shortcut, that lead to nodes
+    contracted after it, stored as CSR arrays.
+    """
+
+    def __init__(self, rank, up_indptr, up_indices, up_weights):
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.up_indptr = np.asarray(up_indptr, dtype=np.int64)
+        self.up_indices = np.asarray(up_indices, dtype=np.int64)
+        self.up_weights = np.asarray(up_weights, dtype=float)
+        # Python lists are much faster to walk in the searches
+        self._indptr = self.up_indptr.tolist()
+        self._indices = self.up_indices.tolist()
+        self._weights = self.up_weights.tolist()
+
+    def __len__(self):
+        return len(self.rank)
+
+    @classmethod
+    def build(cls, n, first, second, length):
+        """
+        Contract every node of a graph given by its edge arrays.
+
+        Nodes are ordered by edge difference (shortcuts added minus edges
+        removed) plus their number of contracted neighbours, with lazy
+        updates: a node's priority is recomputed when it reaches the front
+        of the queue and it is put back if it is no longer the smallest.
+        """
+        adjacency = [{} for _ in range(n)]
+        for a, b, weight in zip(first.tolist(), second.tolist(), length.tolist()):
+            if a != b and weight < adjacency[a].get(b, np.inf):
+                adjacency[a][b] = adjacency[b][a] = weight
+        contracted_neighbours = [0] * n
+        depth = [0] * n
+
+        def priority(node):
+            return (
+                2 * (len(_shortcuts(adjacency, node)) - len(adjacency[node]))
+                + contracted_neighbours[node] + depth[node]
+            )
+
+        queue = [(priority(node), node) for node in range(n)]
+        heapq.heapify(queue)
+        rank = np.empty(n, dtype=np.int64)
+        upward = [None] * n
+        shortcuts_added = 0
+        level = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            if upward[node] is not None:
+                continue
+            current = priority(node)
+            if queue and current > queue[0][0]:
+                heapq.heappush(queue, (current, node))
+                continue
+            for a, b, weight in _shortcuts(adjacency, node):
+                if weight < adjacency[a].get(b, np.inf):
+                    adjacency[a][b] = adjacency[b][a] = weight
+                    shortcuts_added += 1
+            # Every remaining neighbour is contracted later, so these edges lead upwards
+            upward[node] = adjacency[node]
+            for neighbour in upward[node]:
+                del adjacency[neighbour][node]
+                contracted_neighbours[neighbour] += 1
+                depth[neighbour] = max(depth[neighbour], depth[node] + 1)
+            adjacency[node] = {}
+            rank[node] = level
+            level += 1
+
+        logger.info("Contraction hierarchy over %d nodes added %d shortcuts", n, shortcuts_added)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(edges) for edges in upward])
+        indices = np.fromiter((b for edges in upward for b in edges), dtype=np.int64, count=indptr[-1])
+        weights = np.fromiter((w for edges in upward for w in edges.values()), dtype=float, count=indptr[-1])
+        return cls(rank, indptr, indices, weights)
+
+    def upward_search(self, source):
+        """
+        Return the distances from 'source' to every node reachable by climbing the hierarchy.
+        """
+        indptr, indices, weights = self._indptr, self._indices, self._weights
+        distances = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > distances[node]:
+                continue
+            for k in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[k]
+                candidate = distance + weights[k]
+                if candidate < distances.get(neighbour, np.inf):
+                    distances[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+        return distances
+
+    def many_to_many(self, sources, targets):
+        """
+        Return the shortest distance from every source to every target node.
+
+        Each target's upward search leaves (target, distance) entries in a
+        bucket at every node it reaches; each source's upward search then
+        meets those buckets, and the best meeting point is the shortest path.
+        """
+        buckets = {}
+        for j, target in enumerate(targets):
+            for node, distance in self.upward_search(int(target)).items():
+                buckets.setdefault(node, []).append((j, distance))
+        result = np.full((len(sources), len(targets)), np.inf)
+        for i, source in enumerate(sources):
+            row = result[i]
+            for node, distance in self.upward_search(int(source)).items():
+                for j, remaining in buckets.get(node, ()):
+                    if distance + remaining < row[j]:
+                        row[j] = distance + remaining
+        return result
+
+    def distance(self, source, target):
+        """
+        Return the shortest distance between two nodes.
+        """
+        return float(self.many_to_many([source], [target])[0, 0])
+
+
+class RoadNetwork:
+    """
+    Class answering road distances between coordinates over a contraction hierarchy.
+
+    Coordinates are snapped to their nearest road node, and the straight
+    distance to that node is added at both ends of every road distance.
+    """
+
+    def __init__(self, latitude, longitude, hierarchy):
+        self.latitude = np.asarray(latitude, dtype=float)
+        self.longitude = np.asarray(longitude, dtype=float)
+        self.hierarchy = hierarchy
+        self.index = GridIndex(self.latitude, self.longitude)
+
+    def __len__(self):
+        return len(self.latitude)
+
+    @classmethod
+    def from_osm(cls, path, cache_dir=None):
+        """
+        Load the road network of an OSM extract, building its hierarchy if it is not cached.
+
+        The hierarchy is cached in 'cache_dir', by default a .road_cache
+        directory beside the extract.
+        """
+        cache = PlannerCache(cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), ".road_cache"))
+        key = cache.key([path], {"road_network": HIERARCHY_VERSION})
+        arrays = {name: cache.load_array(key, name) for name in _ARRAYS}
+        if all(array is not None for array in arrays.values()):
+            logger.info("Loaded road network of %s from cache %s", path, key)
+        else:
+            with span("road_network", file=path):
+                latitude, longitude, first, second = read_osm(path)
+                length = haversine(latitude[first], longitude[first], latitude[second], longitude[second])
+                hierarchy = ContractionHierarchy.build(len(latitude), first, second, length)
+            arrays = {
+                "latitude": latitude,
+                "longitude": longitude,
+                "rank": hierarchy.rank,
+                "up_indptr": hierarchy.up_indptr,
+                "up_indices": hierarchy.up_indices,
+                "up_weights": hierarchy.up_weights,
+            }
+            for name, array in arrays.items():
+                cache.store_array(key, name, array)
+        hierarchy = ContractionHierarchy(
+            arrays["rank"], arrays["up_indptr"], arrays["up_indices"], arrays["up_weights"]
+        )
+        return cls(arrays["latitude"], arrays["longitude"], hierarchy)
+
+    def snap(self, latitude, longitude):
+        """
+        Return the nearest road node of each coordinate and the distance to it in kilometres.
+        """
+        latitude = np.atleast_1d(np.asarray(latitude, dtype=float))
+        longitude = np.atleast_1d(np.asarray(longitude, dtype=float))
+        nodes = self.index.query(latitude, longitude)
+        return nodes, haversine(latitude, longitude, self.latitude[nodes], self.longitude[nodes])
+
+    def distance_matrix(self, lat1, lon1, lat2, lon2):
+        """
+        Road distances from every first coordinate to every second coordinate.
+        """
+        sources, source_offsets = self.snap(lat1, lon1)
+        targets, target_offsets = self.snap(lat2, lon2)
+        unique_sources, source_rows = np.unique(sources, return_inverse=True)
+        unique_targets, target_rows = np.unique(targets, return_inverse=True)
+        with span("road_distances", sources=len(unique_sources), targets=len(unique_targets)):
+            table = self.hierarchy.many_to_many(unique_sources, unique_targets)
+        return (
+            table[np.ix_(source_rows, target_rows)]
+            + source_offsets[:, None] + target_offsets[None, :]
+        )
+
+    def distances(self, lat1, lon1, lat2, lon2):
+        """
+        Road distances between matching pairs of coordinates, e.g. the ends of each link.
+
+        Each distinct endpoint is searched once, however many links share it.
+        """
+        sources, source_offsets = self.snap(lat1, lon1)
+        targets, target_offsets = self.snap(lat2, lon2)
+        unique_sources, source_rows = np.unique(sources, return_inverse=True)
+        unique_targets, target_rows = np.unique(targets, return_inverse=True)
+        with span("road_distances", sources=len(unique_sources), targets=len(unique_targets)):
+            table = self.hierarchy.many_to_many(unique_sources, unique_targets)
+        return table[source_rows, target_rows] + source_offsets + target_offsets
@@ -0,0 +1,427 @@
+"""
+Module containing the route solving algorithms used by the planner.
+
+Solvers work on a dense weight matrix indexed by node position, where a
+missing link is stored as ``inf``. They return the visiting order as a list
+of node indices beginning with the start node, or ``None`` when no route
+visits every node.
+"""
+
+from time import perf_counter
+import numpy as np
+from .instrumentation import count
+
+
+def held_karp(weights, start=0):
+    """
+    Exact Held-Karp bitmask dynamic programming solver, O(n^2 * 2^n).
+
+    Finds the cheapest path that starts at ``start`` and visits every other
+    node exactly once. The subsets are processed one popcount layer at a time
+    so that each (layer, end node) step is a single vectorised NumPy update.
+    """
+    weights = np.asarray(weights, dtype=float)
+    others, w = held_karp_init(weights, start)
+    m = len(others)
+    if m == 0:
+        return [start]
+    size = 1 << m
+
+    # dp[mask, j] is the cheapest path from start over 'mask' ending at j
+    dp = np.full((size, m), np.inf)
+    parent = np.full((size, m), -1, dtype=np.int16)
+    for j in range(m):
+        dp[1 << j, j] = weights[start, others[j]]
+
+    masks, bounds = popcount_layers(m)
+    for k in range(2, m + 1):
+        layer = masks[bounds[k]:bounds[k + 1]]
+        for j in range(m):
+            held_karp_step(dp, parent, w, layer, j)
+    # Every (mask, end) state compares one candidate per previous end node
+    count("candidates_evaluated", m * (1 << (m - 1)) * m)
+
+    return held_karp_order(dp, parent, others, start)
+
+
+def popcount_layers(m):
+    """
+    Return every m-bit mask sorted by popcount, and where each popcount layer starts.
+
+    Layer k is masks[bounds[k]:bounds[k + 1]], in ascending mask order.
+    """
+    masks = np.arange(1 << m)
+    popcount = np.zeros(1 << m, dtype=np.int8)
+    for bit in range(m):
+        popcount += (masks >> bit) & 1
+    masks = masks[np.argsort(popcount, kind="stable")]
+    bounds = np.searchsorted(np.sort(popcount), np.arange(m + 2))
+    return masks, bounds
+
+
+def held_karp_step(dp, parent, w, layer, j):
+    """
+    Fill dp[mask, j] for every mask of one popcount layer that contains j.
+    """
+    selected = layer[(layer >> j) & 1 == 1]
+    previous = selected ^ (1 << j)
+    # Nodes outside 'previous' already hold inf, so they never win
+    candidates = dp[previous] + w[:, j]
+    best = np.argmin(candidates, axis=1)
+    dp[selected, j] = candidates[np.arange(len(selected)), best]
+    parent[selected, j] = best
+
+
+def held_karp_init(weights, start):
+    """
+    Return the non-start nodes and the sub-matrix between them for Held-Karp.
+    """
+    weights = np.asarray(weights, dtype=float)
+    others = [i for i in range(len(weights)) if i != start]
+    return others, weights[np.ix_(others, others)]
+
+
+def held_karp_order(dp, parent, others, start):
+    """
+    Rebuild the best visiting order from a filled Held-Karp table.
+    """
+    m = len(others)
+    full = (1 << m) - 1
+    last = int(np.argmin(dp[full]))
+    if not np.isfinite(dp[full, last]):
+        return None
+
+    # Walk the parent pointers back from the final node
+    order = []
+    mask = full
+    while last != -1:
+        order.append(others[last])
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous
+    order.append(start)
+    order.reverse()
+    return order
+
+
+def path_cost(weights, order):
+    """
+    Return the total weight of a visiting order.
+    """
+    weights = np.asarray(weights, dtype=float)
+    return float(weights[order[:-1], order[1:]].sum())
+
+
+def _finite_weights(weights):
+    """
+    Replace missing links with a large penalty so local search can compare moves.
+    """
+    weights = np.asarray(weights, dtype=float)
+    finite = np.isfinite(weights)
+    largest = weights[finite].max() if finite.any() else 1.0
+    penalty = (abs(largest) + 1.0) * len(weights) * 10
+    return np.where(finite, weights, penalty), penalty
+
+
+def neighbour_lists(weights, k=10):
+    """
+    Return the k cheapest neighbours of every node, nearest first.
+    """
+    weights = np.array(weights, dtype=float)
+    n = len(weights)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    np.fill_diagonal(weights, np.inf)
+    nearest = np.argpartition(weights, k - 1, axis=1)[:, :k]
+    rows = np.arange(n)[:, None]
+    nearest = np.take_along_axis(
+        nearest, np.argsort(weights[rows, nearest], axis=1), axis=1
+    )
+    return nearest.tolist()
+
+
+def nearest_neighbour(weights, start=0):
+    """
+    Build a path by always travelling to the cheapest unvisited node.
+    """
+    weights = np.asarray(weights, dtype=float)
+    unvisited = np.ones(len(weights), dtype=bool)
+    unvisited[start] = False
+    order = [start]
+    current = start
+    for _ in range(len(weights) - 1):
+        row = np.where(unvisited, weights[current], np.inf)
+        current = int(np.argmin(row))
+        unvisited[current] = False
+        order.append(current)
+    return order
+
+
+def greedy_edge(weights, start=0):
+    """
+    Build a path by adding the cheapest edges that keep it a single open path.
+    """
+    weights = np.asarray(weights, dtype=float)
+    n = len(weights)
+    if n == 1:
+        return [start]
+    upper = np.triu_indices(n, k=1)
+    edge_order = np.argsort(weights[upper], kind="stable")
+
+    degree = [0] * n
+    group = list(range(n))
+    adjacent = [[] for _ in range(n)]
+
+    def find(node):
+        while group[node] != node:
+            group[node] = group[group[node]]
+            node = group[node]
+        return node
+
+    added = 0
+    for e in edge_order:
+        if added == n - 1:
+            break
+        u, v = int(upper[0][e]), int(upper[1][e])
+        limit_u = 1 if u == start else 2
+        limit_v = 1 if v == start else 2
+        if degree[u] >= limit_u or degree[v] >= limit_v or find(u) == find(v):
+            continue
+        degree[u] += 1
+        degree[v] += 1
+        adjacent[u].append(v)
+        adjacent[v].append(u)
+        group[find(u)] = find(v)
+        added += 1
+
+    # Walk the fragments from the start, hopping to the nearest fragment end
+    order = []
+    visited = [False] * n
+    current = start
+    while True:
+        previous = None
+        while True:
+            order.append(current)
+            visited[current] = True
+            following = [v for v in adjacent[current] if v != previous and not visited[v]]
+            if not following:
+                break
+            previous, current = current, following[0]
+        if len(order) == n:
+            return order
+        ends = [v for v in range(n) if not visited[v] and degree[v] < 2]
+        current = min(ends, key=lambda v: weights[order[-1], v])
+
+
+def two_opt(w, order, neighbours, deadline):
+    """
+    Improve an open path in place with 2-opt segment reversals.
+
+    Only moves that connect a node to one of its neighbours are tried, and
+    each is scored by its delta without recomputing the path cost.
+    """
+    n = len(order)
+    position = [0] * len(w)
+    for i, node in enumerate(order):
+        position[node] = i
+
+    improved = True
+    while improved and perf_counter() < deadline:
+        improved = False
+        for i in range(n - 1):
+            a = order[i]
+            b = order[i + 1]
+            w_ab = w[a][b]
+            for c in neighbours[a]:
+                w_ac = w[a][c]
+                if w_ac >= w_ab:
+                    break
+                j = position[c]
+                if j == i + 1:
+                    continue
+                # Reversing order[low + 1 .. high] adds the edge (a, c)
+                low, high = (i, j) if j > i else (j, i)
+                first, second = order[low], order[low + 1]
+                last = order[high]
+                delta = w[first][last] - w[first][second]
+                if high + 1 < n:
+                    after = order[high + 1]
+                    delta += w[second][after] - w[last][after]
+                if delta < -1e-12:
+                    order[low + 1:high + 1] = order[low + 1:high + 1][::-1]
+                    for k in range(low + 1, high + 1):
+                        position[order[k]] = k
+                    improved = True
+                    break
+    return order
+
+
+def or_opt(w, order, neighbours, deadline, max_segment=3):
+    """
+    Improve an open path in place by moving short segments elsewhere.
+
+    Segments of up to 'max_segment' nodes are reinserted, possibly reversed,
+    next to one of the neighbours of their end nodes.
+    """
+    n = len(order)
+    position = [0] * len(w)
+
+    improved = True
+    while improved and perf_counter() < deadline:
+        improved = False
+        for i, node in enumerate(order):
+            position[node] = i
+        for length in range(1, max_segment + 1):
+            for p in range(1, n - length + 1):
+                s, e = order[p], order[p + length - 1]
+                before = order[p - 1]
+                after = order[p + length] if p + length < n else None
+                gain = w[before][s]
+                if after is not None:
+                    gain += w[e][after] - w[before][after]
+                best = None
+                for c in set(neighbours[s]) | set(neighbours[e]):
+                    q = position[c]
+                    if p - 1 <= q < p + length:
+                        continue
+                    d = order[q + 1] if q + 1 < n else None
+                    if d is None:
+                        costs = (w[c][s], w[c][e])
+                    else:
+                        w_cd = w[c][d]
+                        costs = (w[c][s] + w[e][d] - w_cd, w[c][e] + w[s][d] - w_cd)
+                    for reverse, cost in enumerate(costs):
+                        delta = cost - gain
+                        if delta < -1e-12 and (best is None or delta < best[0]):
+                            best = (delta, q, reverse)
+                if best is not None:
+                    _, q, reverse = best
+                    segment = order[p:p + length]
+                    if reverse:
+                        segment.reverse()
+                    del order[p:p + length]
+                    insert_at = q + 1 if q < p else q + 1 - length
+                    order[insert_at:insert_at] = segment
+                    improved = True
+                    break
+            if improved:
+                break
+    return order
+
+
+def insert_missing(weights, order):
+    """
+    Add every node missing from a partial path at its cheapest insertion point.
+
+    Used to warm-start local search from a previous path after nodes were
+    added; the first node of the path stays first.
+    """
+    weights, _ = _finite_weights(weights)
+    order = list(order)
+    present = set(order)
+    for node in range(len(weights)):
+        if node in present:
+            continue
+        # Inserting after position p replaces edge (p, p + 1), or extends the end
+        costs = weights[order, node].copy()
+        costs[:-1] += weights[node, order[1:]] - weights[order[:-1], order[1:]]
+        p = int(np.argmin(costs))
+        order.insert(p + 1, node)
+        present.add(node)
+    return order
+
+
+def _perturb(order, rng):
+    """
+    Apply a random double-bridge style kick to escape a local optimum.
+    """
+    n = len(order)
+    if n < 8:
+        i, j = sorted(rng.choice(np.arange(1, n), size=2, replace=False))
+        return order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+    a, b, c = sorted(rng.choice(np.arange(1, n), size=3, replace=False))
+    return order[:a] + order[b:c] + order[a:b] + order[c:]
+
+
+def local_search(weights, start=0, time_budget=1.0, construction="nearest_neighbour",
+                 neighbours=None, seed=0, initial=None, patience=None):
+    """
+    Anytime heuristic: construct a path, then improve it with 2-opt and Or-opt.
+
+    While time remains the best path is perturbed and re-optimised, stopping
+    early after 'patience' perturbations in a row fail to improve it. The best
+    path found before 'time_budget' seconds elapse is returned, or ``None`` if
+    every path found relies on a missing link. Passing 'initial' warm-starts
+    the search from an existing path instead of constructing one.
+    """
+    deadline = perf_counter() + time_budget
+    weights, penalty = _finite_weights(weights)
+    if len(weights) <= 2:
+        order = [start] + [i for i in range(len(weights)) if i != start]
+        return order if path_cost(weights, order) < penalty else None
+
+    if neighbours is None:
+        neighbours = neighbour_lists(weights)
+    if initial is not None:
+        order = list(initial)
+    elif construction == "nearest_neighbour":
+        order = nearest_neighbour(weights, start)
+    elif construction == "greedy":
+        order = greedy_edge(weights, start)
+    else:
+        raise ValueError(f"Unknown construction '{construction}'")
+
+    w = weights.tolist()
+    rng = np.random.default_rng(seed)
+    best, best_cost = None, np.inf
+    stale = 0
+    while True:
+        two_opt(w, order, neighbours, deadline)
+        or_opt(w, order, neighbours, deadline)
+        cost = path_cost(weights, order)
+        count("local_search_rounds")
+        if cost < best_cost - 1e-12:
+            best, best_cost = list(order), cost
+            stale = 0
+        else:
+            stale += 1
+        if perf_counter() >= deadline or patience is not None and stale > patience:
+            break
+        order = _perturb(best, rng)
+
+    if best_cost >= penalty:
+        return None
+    return best
+
+
+def shortest_path_closure(weights):
+    """
+    All-pairs shortest paths by vectorised Floyd-Warshall.
+
+    Returns the complete distance matrix and a next-hop matrix where
+    next_hop[i, j] is the node following i on the shortest path to j, or -1
+    when j cannot be reached from i.
+    """
+    distances = np.array(weights, dtype=float)
+    n = len(distances)
+    next_hop = np.where(np.isfinite(distances), np.arange(n)[None, :], -1)
+    for k in range(n):
+        via = distances[:, k, None] + distances[None, k, :]
+        shorter = via < distances
+        distances = np.where(shorter, via, distances)
+        next_hop = np.where(shorter, next_hop[:, k, None], next_hop)
+    return distances, next_hop
+
+
+def expand_path(next_hop, order):
+    """
+    Expand a visiting order over the closure back into the real sequence of legs.
+    """
+    expanded = [order[0]]
+    for target in order[1:]:
+        node = expanded[-1]
+        while node != target:
+            node = int(next_hop[node, target])
+            expanded.append(node)
+    return expanded
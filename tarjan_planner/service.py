@@ -0,0 +1,283 @@
+"""
+Module containing the long-running route query service.
+
+The service listens on a Unix socket or a localhost TCP port and speaks JSON
+lines: each request line is a query in the batch file format, e.g.
+{"start": "Yeoui-daero", "stops": ["Gangnam-daero"], "objective": "cost"},
+and each response line is the matching result. {"command": "stats"} returns
+the cache statistics.
+
+Every worker process loads the data files and builds the graph once, then
+keeps it in memory for all the queries it solves. Solved queries are kept in
+an LRU cache, which is emptied and the workers restarted as soon as any of
+the data files changes on disk. A worker pool that breaks, e.g. because a
+worker was killed, is replaced on the next query.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import stat
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .cli import route_result, solve_query
+from .logger import logger
+from .parallel import default_workers
+
+# Planner kept warm in each worker process
+_planner = None
+
+
+def _load_planner(files, planner_options):
+    """
+    Build the planner of a worker process once, when the worker starts.
+    """
+    global _planner
+    from .tarjan_planner import TarjanPlanner
+
+    _planner = TarjanPlanner(*files, **planner_options)
+    _planner.create_graph()
+
+
+def _solve(query, defaults):
+    """
+    Solve one query on the worker's planner and return its result.
+    """
+    return route_result(query, solve_query(_planner, query, defaults))
+
+
+class LRUCache:
+    """
+    Class containing a bounded least-recently-used mapping with hit statistics.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Return the value for a key and mark it recently used, or None.
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        self.entries.clear()
+
+
+class RouteService:
+    """
+    Class answering route queries from warm worker processes with a result cache.
+
+    'defaults' is an argparse namespace holding the solver settings used for
+    anything a query omits, as for the batch subcommand, and
+    'planner_options' the keyword arguments each worker's TarjanPlanner is
+    created with.
+    """
+
+    def __init__(self, files, defaults, workers=None, cache_size=256, planner_options=None):
+        self.files = tuple(files)
+        self.defaults = defaults
+        self.workers = workers or default_workers()
+        self.planner_options = dict(planner_options or {})
+        self.cache = LRUCache(cache_size)
+        self.reloads = 0
+        self.pool = None
+        self._signature = None
+        self._pending = {}
+
+    def _file_signature(self):
+        """
+        Return the modification time and size of every data file.
+
+        The OpenStreetMap extract given as 'road_network' counts as a data
+        file too.
+        """
+        signature = []
+        paths = list(self.files)
+        if self.planner_options.get("road_network"):
+            paths.append(self.planner_options["road_network"])
+        for path in paths:
+            status = os.stat(path)
+            signature.append((status.st_mtime_ns, status.st_size))
+        return tuple(signature)
+
+    def _refresh(self):
+        """
+        Start the worker pool, restarting it and emptying the cache if a data file changed.
+        """
+        signature = self._file_signature()
+        if signature == self._signature and self.pool is not None:
+            return
+        if self.pool is not None:
+            logger.info("Data files changed, reloading the route service")
+            self.pool.shutdown(wait=False)
+            self.reloads += 1
+        if signature != self._signature:
+            self.cache.clear()
+        self._pending = {}
+        self._signature = signature
+        self.pool = ProcessPoolExecutor(
+            self.workers, initializer=_load_planner, initargs=(self.files, self.planner_options)
+        )
+
+    def _drop_pool(self, pool):
+        """
+        Shut down a broken worker pool so the next query starts a new one.
+
+        The cached results stay valid, since the data files did not change.
+        """
+        if self.pool is pool:
+            logger.error("A route service worker died, restarting the workers")
+            pool.shutdown(wait=False)
+            self.pool = None
+            self._pending = {}
+
+    def stats(self):
+        """
+        Return the cache and reload statistics.
+        """
+        return {
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_entries": len(self.cache.entries),
+            "reloads": self.reloads,
+            "workers": self.workers,
+        }
+
+    async def query(self, query):
+        """
+        Return the result of one query, from the cache when it was solved before.
+        """
+        if query.get("command") == "stats":
+            return self.stats()
+        if "start" not in query:
+            raise ValueError("Query needs a 'start' street")
+        self._refresh()
+        key = json.dumps(query, sort_keys=True)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+
+        # Identical queries arriving together share a single solve
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            pool = self.pool
+            try:
+                future = loop.run_in_executor(pool, _solve, query, self.defaults)
+                self._pending[key] = future
+                try:
+                    result = await future
+                finally:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+            except BrokenProcessPool:
+                self._drop_pool(pool)
+                raise
+            # Only cache results solved against the current data files
+            if self._signature == self._file_signature():
+                self.cache.put(key, result)
+            return result
+        return await asyncio.shield(future)
+
+    async def handle_client(self, reader, writer):
+        """
+        Answer every JSON line sent by a client until it disconnects.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    result = await self.query(json.loads(line))
+                except (ValueError, KeyError, TypeError, OSError, BrokenProcessPool) as error:
+                    # OSError covers a data file that was removed while serving
+                    result = {"error": str(error)}
+                writer.write((json.dumps(result) + "\n").encode("utf-8"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, socket_path=None, host="127.0.0.1", port=8765):
+        """
+        Start listening on a Unix socket, or on a localhost TCP port, and return the server.
+        """
+        self._refresh()
+        if socket_path:
+            try:
+                mode = os.stat(socket_path).st_mode
+            except FileNotFoundError:
+                mode = None
+            if mode is not None:
+                # Only a stale socket is removed, never some other file
+                if not stat.S_ISSOCK(mode):
+                    raise ValueError(f"'{socket_path}' exists and is not a socket")
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_client, path=socket_path)
+            logger.info("Route service listening on %s", socket_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host=host, port=port)
+            logger.info("Route service listening on %s:%d", host, port)
+        return server
+
+    async def serve_forever(self, socket_path=None, host="127.0.0.1", port=8765):
+        """
+        Serve queries until the process is stopped.
+        """
+        server = await self.start(socket_path, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+
+def request(queries, socket_path=None, host="127.0.0.1", port=8765):
+    """
+    Send queries to a running route service and return its results, in order.
+    """
+    if socket_path:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile("rwb") as stream:
+        results = []
+        for query in queries:
+            stream.write((json.dumps(query) + "\n").encode("utf-8"))
+            stream.flush()
+            results.append(json.loads(stream.readline()))
+        return results
@@ -0,0 +1,179 @@
+"""
+Module containing the uniform grid index used for proximity queries over streets.
+
+Coordinates are projected onto a local plane in kilometres and bucketed into
+square cells, so finding every pair within a radius or the k nearest
+streets only compares points in neighbouring cells instead of scanning all
+n^2 pairs.
+"""
+
+import math
+import numpy as np
+from .distances import EARTH_RADIUS_KM, pairwise_distances
+
+# Cells examined around a cell when looking for pairs, each cell pair once
+_FORWARD_CELLS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class GridIndex:
+    """
+    Class bucketing coordinates into a uniform grid of square cells.
+
+    Planar distances are an equirectangular approximation, accurate to well
+    under 1% over a city; pairs_within confirms candidates with an exact
+    distance backend.
+    """
+
+    def __init__(self, latitude, longitude, cell_km=None):
+        self.latitude = np.asarray(latitude, dtype=float)
+        self.longitude = np.asarray(longitude, dtype=float)
+        n = len(self.latitude)
+        self.points = self.project(self.latitude, self.longitude)
+        if cell_km is None:
+            # About two points per cell on average
+            extent = np.ptp(self.points, axis=0) if n else np.zeros(2)
+            cell_km = math.sqrt(max(extent[0] * extent[1], 1e-6) * 2 / max(n, 1)) or 1.0
+        self.cell_km = cell_km
+
+        cells = np.floor(self.points / cell_km).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        self.order = order
+        sorted_cells = cells[order]
+        changes = np.flatnonzero(np.any(np.diff(sorted_cells, axis=0) != 0, axis=1)) + 1
+        bounds = np.concatenate([[0], changes, [n]]) if n else np.zeros(1, dtype=np.int64)
+        self.cells = {
+            (int(sorted_cells[lo, 0]), int(sorted_cells[lo, 1])): (int(lo), int(hi))
+            for lo, hi in zip(bounds[:-1], bounds[1:])
+        }
+
+    def __len__(self):
+        return len(self.points)
+
+    def cell_points(self, cell):
+        """
+        Return the indices of the points in a cell.
+        """
+        bounds = self.cells.get(cell)
+        if bounds is None:
+            return self.order[:0]
+        return self.order[bounds[0]:bounds[1]]
+
+    def pairs_within(self, radius_km, backend="vincenty"):
+        """
+        Return every pair of points within 'radius_km' as arrays (i, j, distance) with i < j.
+
+        Candidates are found on a grid with cells of at least 'radius_km' and
+        their distances computed with the given backend.
+        """
+        if self.cell_km < radius_km:
+            return GridIndex(self.latitude, self.longitude, radius_km).pairs_within(radius_km, backend)
+        firsts, seconds = [], []
+        # Keep planar candidates with a margin, the exact distance decides
+        limit = (radius_km * 1.01) ** 2
+        for (cx, cy) in self.cells:
+            here = self.cell_points((cx, cy))
+            for dx, dy in _FORWARD_CELLS:
+                there = self.cell_points((cx + dx, cy + dy))
+                if not len(there):
+                    continue
+                offsets = self.points[here][:, None, :] - self.points[there][None, :, :]
+                close = (offsets ** 2).sum(axis=2) <= limit
+                if (dx, dy) == (0, 0):
+                    close &= here[:, None] < there[None, :]
+                a, b = np.nonzero(close)
+                firsts.append(here[a])
+                seconds.append(there[b])
+        if not firsts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+        i = np.concatenate(firsts)
+        j = np.concatenate(seconds)
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        distances = np.asarray(pairwise_distances(
+            self.latitude[i], self.longitude[i], self.latitude[j], self.longitude[j], backend=backend
+        ), dtype=float).reshape(-1)
+        keep = distances <= radius_km
+        order = np.lexsort((j[keep], i[keep]))
+        return i[keep][order], j[keep][order], distances[keep][order]
+
+    def project(self, latitude, longitude):
+        """
+        Project coordinates onto this index's plane, in kilometres.
+        """
+        origin = math.radians(self.latitude.mean()) if len(self.latitude) else 0.0
+        return EARTH_RADIUS_KM * np.column_stack([
+            np.radians(np.asarray(longitude, dtype=float)) * math.cos(origin),
+            np.radians(np.asarray(latitude, dtype=float)),
+        ]).reshape(-1, 2)
+
+    def query(self, latitude, longitude):
+        """
+        Return the index of the nearest indexed point to each of the given coordinates.
+        """
+        targets = self.project(latitude, longitude)
+        result = np.empty(len(targets), dtype=np.int64)
+        for q, target in enumerate(targets):
+            cx, cy = (int(c) for c in np.floor(target / self.cell_km))
+            ring = 0
+            while True:
+                if (2 * ring + 1) ** 2 > 4 * len(self.cells):
+                    candidates = self.order
+                else:
+                    candidates = np.concatenate([
+                        self.cell_points((cx + dx, cy + dy))
+                        for dx in range(-ring, ring + 1)
+                        for dy in range(-ring, ring + 1)
+                    ])
+                if len(candidates):
+                    distances = ((self.points[candidates] - target) ** 2).sum(axis=1)
+                    best = int(np.argmin(distances))
+                    if len(candidates) == len(self.points) or distances[best] <= (ring * self.cell_km) ** 2:
+                        result[q] = candidates[best]
+                        break
+                ring += 1
+        return result
+
+    def nearest(self, k):
+        """
+        Return the k nearest other points of every point, nearest first, as an (n, k) array.
+
+        Each cell searches growing rings of cells until the k-th candidate is
+        closer than anything outside the rings could be.
+        """
+        n = len(self.points)
+        k = min(k, n - 1)
+        result = np.empty((n, max(k, 0)), dtype=np.int64)
+        if k <= 0:
+            return result
+        occupancy = n / len(self.cells)
+        if occupancy < k / 2:
+            # Coarser cells holding about k/2 points each mean fewer rings per cell
+            coarser = self.cell_km * math.sqrt(k / (2 * occupancy))
+            return GridIndex(self.latitude, self.longitude, coarser).nearest(k)
+        for (cx, cy) in self.cells:
+            here = self.cell_points((cx, cy))
+            ring = 1
+            while True:
+                if (2 * ring + 1) ** 2 > 4 * len(self.cells):
+                    # Far from everything: scanning every point is cheaper than more rings
+                    candidates = self.order
+                else:
+                    candidates = np.concatenate([
+                        self.cell_points((cx + dx, cy + dy))
+                        for dx in range(-ring, ring + 1)
+                        for dy in range(-ring, ring + 1)
+                    ])
+                searched_all = len(candidates) == n
+                if len(candidates) > k:
+                    offsets = self.points[here][:, None, :] - self.points[candidates][None, :, :]
+                    distances = (offsets ** 2).sum(axis=2)
+                    distances[here[:, None] == candidates[None, :]] = np.inf
+                    best = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                    best_distances = np.take_along_axis(distances, best, axis=1)
+                    # Points outside the rings are at least 'ring' cells away
+                    if searched_all or best_distances.max() <= (ring * self.cell_km) ** 2:
+                        by_distance = np.argsort(best_distances, axis=1, kind="stable")
+                        result[here] = candidates[np.take_along_axis(best, by_distance, axis=1)]
+                        break
+                ring += 1
+        return result
@@ -0,0 +1,202 @@
+"""
+Module containing the memoised Held-Karp solver for routes over subsets of relatives.
+
+Held-Karp's partial solutions only depend on the visited set S, not on the
+query that needed them: the cheapest path from the start over S ending at
+j is the same whether S was asked for on its own or as part of a bigger
+subset. Each solved query keeps its whole dp[S, j] table in a bounded LRU
+cache, so a later query over the same stops or any subset of them is
+answered from the table, and a query that only overlaps copies the states
+it shares instead of recomputing them.
+"""
+
+from collections import OrderedDict
+import numpy as np
+from .route_solvers import held_karp_step, popcount_layers
+
+
+class SubsetRouteCache:
+    """
+    Class containing a memory-bounded LRU cache of Held-Karp tables.
+
+    Entries are keyed by a context (start node and weights) and the sorted
+    stops they cover, and hold the dp and parent tables of that query.
+    """
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.states_reused = 0
+        self.states_computed = 0
+        self.evictions = 0
+
+    def lookup(self, context, members):
+        """
+        Return the cached table that covers the most of 'members', or None.
+
+        A table covering every member is preferred, the smallest first;
+        otherwise the one sharing the most members, if it shares at least two.
+        """
+        wanted = set(members)
+        best, best_key = None, None
+        for key, entry in self.entries.items():
+            if key[0] != context:
+                continue
+            shared = len(wanted.intersection(key[1]))
+            covers = shared == len(wanted)
+            rank = (covers, shared if not covers else -len(key[1]))
+            if best is None or rank > best:
+                best, best_key = rank, key
+        if best_key is None or not best[0] and best[1] < 2:
+            return None
+        self.entries.move_to_end(best_key)
+        return best_key[1], *self.entries[best_key][:2]
+
+    def put(self, context, members, dp, parent):
+        """
+        Store a table, evicting the least recently used ones above the memory bound.
+        """
+        size = dp.nbytes + parent.nbytes
+        if size > self.max_bytes:
+            return
+        key = (context, tuple(members))
+        if key in self.entries:
+            self.bytes -= self.entries.pop(key)[2]
+        self.entries[key] = (dp, parent, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Drop every table, e.g. after the graph changed; the statistics are kept.
+        """
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        """
+        Return the hit rates, size and memory use of the cache.
+        """
+        queries = self.hits + self.partial_hits + self.misses
+        states = self.states_reused + self.states_computed
+        return {
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / queries if queries else 0.0,
+            "state_hit_rate": self.states_reused / states if states else 0.0,
+            "entries": len(self.entries),
+            "memory_mb": self.bytes / 2 ** 20,
+            "max_memory_mb": self.max_bytes / 2 ** 20,
+            "evictions": self.evictions,
+        }
+
+
+def _states(k):
+    """
+    Return the number of (S, j) states of a Held-Karp table over k stops.
+    """
+    return k * (1 << (k - 1)) if k else 0
+
+
+def _bits_to_masks(bits):
+    """
+    Return, for every subset of the given bit positions, its mask.
+
+    Subset s (a mask over positions in 'bits') maps to the mask setting
+    bits[b] for every bit b of s.
+    """
+    subsets = np.arange(1 << len(bits))
+    masks = np.zeros(len(subsets), dtype=np.int64)
+    for b, bit in enumerate(bits):
+        masks |= ((subsets >> b) & 1) << bit
+    return masks
+
+
+def _walk(dp, parent, members, mask, ends, start):
+    """
+    Rebuild the best order over 'mask' from a table, ending at one of 'ends'.
+    """
+    last = min(ends, key=lambda j: dp[mask, j])
+    if not np.isfinite(dp[mask, last]):
+        return None
+    order = []
+    while last != -1:
+        order.append(members[last])
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous
+    order.append(start)
+    order.reverse()
+    return order
+
+
+def subset_held_karp(weights, start, stops, cache, context=None):
+    """
+    Exact cheapest path from 'start' over every node in 'stops', reusing cached tables.
+
+    Tables are stored in 'cache' under 'context', which must identify the
+    start node and weights they were computed for. Returns the visiting order
+    as node indices beginning with the start, or ``None`` when no path visits
+    every stop.
+    """
+    members = sorted(set(stops) - {start})
+    m = len(members)
+    if m == 0:
+        return [start]
+
+    found = cache.lookup(context, members)
+    if found is not None and set(members) <= set(found[0]):
+        # Every subset of a cached query is already in its table
+        cached_members, dp, parent = found
+        position = {node: j for j, node in enumerate(cached_members)}
+        ends = [position[node] for node in members]
+        cache.hits += 1
+        cache.states_reused += _states(m)
+        return _walk(dp, parent, cached_members, int(sum(1 << j for j in ends)), ends, start)
+
+    weights = np.asarray(weights, dtype=float)
+    w = weights[np.ix_(members, members)]
+    dp = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=np.int16)
+    for j in range(m):
+        dp[1 << j, j] = weights[start, members[j]]
+
+    known = 0
+    if found is not None:
+        # Copy the states of the subsets both queries share
+        cached_members, cached_dp, cached_parent = found
+        position = {node: j for j, node in enumerate(cached_members)}
+        shared = [j for j, node in enumerate(members) if node in position]
+        cached_shared = [position[members[j]] for j in shared]
+        rows = _bits_to_masks(shared)
+        cached_rows = _bits_to_masks(cached_shared)
+        # The extra slot maps the -1 "no parent" marker to itself
+        remap = np.full(len(cached_members) + 1, -1, dtype=np.int16)
+        remap[cached_shared] = shared
+        dp[np.ix_(rows, shared)] = cached_dp[np.ix_(cached_rows, cached_shared)]
+        parent[np.ix_(rows, shared)] = remap[cached_parent[np.ix_(cached_rows, cached_shared)]]
+        known = int(sum(1 << j for j in shared))
+        cache.partial_hits += 1
+        cache.states_reused += _states(len(shared))
+    else:
+        cache.misses += 1
+    cache.states_computed += _states(m) - (_states(bin(known).count("1")) if known else 0)
+
+    masks, bounds = popcount_layers(m)
+    for k in range(2, m + 1):
+        layer = masks[bounds[k]:bounds[k + 1]]
+        if known:
+            layer = layer[(layer & ~known) != 0]
+        for j in range(m):
+            held_karp_step(dp, parent, w, layer, j)
+    cache.put(context, members, dp, parent)
+    full = (1 << m) - 1
+    return _walk(dp, parent, members, full, range(m), start)
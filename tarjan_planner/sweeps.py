@@ -0,0 +1,210 @@
+"""
+Module containing what-if sweeps over the transport mode parameters.
+
+Every link's travel time is distance / Speed_kmh + Transfer_Time_min / 60
+and its cost Cost_per_km * distance, so they are linear in the mode
+parameters. A sweep takes a grid of parameter values, prices every link for
+every scenario in one NumPy broadcast over the link distances already in the
+edge index, reduces them to one weight matrix per scenario, and solves the
+scenarios on a process pool with the matrices in shared memory.
+"""
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .edge_index import OBJECTIVES
+from .parallel import SharedArrays, _array, _attach
+from .route_solvers import expand_path, held_karp, local_search, shortest_path_closure
+
+# Mode parameters a sweep can vary, in transport table order
+PARAMETERS = ("Speed_kmh", "Cost_per_km", "Transfer_Time_min")
+
+# Largest number of stops solved exactly by the 'held_karp' method
+EXACT_SWEEP_SIZE = 16
+
+
+def parse_vary(texts):
+    """
+    Parse "MODE:PARAMETER=v1,v2,..." strings into a sweep grid.
+
+    A value written as "x1.2" scales the mode's current parameter instead
+    of replacing it.
+    """
+    grid = {}
+    for text in texts:
+        try:
+            target, values = text.split("=", 1)
+            mode, parameter = target.rsplit(":", 1)
+        except ValueError:
+            raise ValueError(f"Expected MODE:PARAMETER=v1,v2,... but got '{text}'") from None
+        grid.setdefault(mode, {})[parameter] = [value.strip() for value in values.split(",") if value.strip()]
+    return grid
+
+
+def scenario_grid(transport_table, grid):
+    """
+    Expand a sweep grid into the parameters of every scenario.
+
+    'grid' maps a transport mode to {parameter: [values]}; values are
+    numbers or "x<factor>" strings scaling the current value. Returns an
+    (S, modes, 3) array of Speed_kmh, Cost_per_km and Transfer_Time_min for
+    every combination, and a label per scenario naming the values it uses.
+    """
+    base = np.column_stack([transport_table.floats[name] for name in PARAMETERS])
+    axes = []
+    for mode, parameters in grid.items():
+        row = transport_table.index.get(mode)
+        if row is None:
+            raise ValueError(f"Unknown transport mode '{mode}'")
+        for parameter, values in parameters.items():
+            if parameter not in PARAMETERS:
+                raise ValueError(f"Unknown parameter '{parameter}', expected one of {', '.join(PARAMETERS)}")
+            column = PARAMETERS.index(parameter)
+            resolved = []
+            for value in values:
+                if isinstance(value, str) and value.startswith("x"):
+                    resolved.append(base[row, column] * float(value[1:]))
+                else:
+                    resolved.append(float(value))
+            if not resolved:
+                raise ValueError(f"No values given for {mode}:{parameter}")
+            axes.append((f"{mode}:{parameter}", row, column, resolved))
+
+    combinations = list(itertools.product(*(axis[3] for axis in axes)))
+    params = np.repeat(base[None], len(combinations), axis=0)
+    labels = []
+    for s, values in enumerate(combinations):
+        for (name, row, column, _), value in zip(axes, values):
+            params[s, row, column] = value
+        labels.append({axis[0]: value for axis, value in zip(axes, values)})
+    if (params[:, :, 0] <= 0).any():
+        raise ValueError("Speed_kmh must be positive in every scenario")
+    return params, labels
+
+
+def price_options(edge_index, transport_table, params):
+    """
+    Return the (S, options) travel times and costs of every option under every scenario.
+    """
+    rows = np.array([transport_table.index.get(mode, -1) for mode in edge_index.modes], dtype=np.int64)
+    option_rows = rows[edge_index.arrays["mode"]]
+    if (option_rows < 0).any():
+        raise ValueError("Some links use a transport mode missing from the transport table")
+    distance = np.asarray(edge_index.arrays["distance"], dtype=float)
+    speed, cost_per_km, transfer = (params[:, option_rows, k] for k in range(3))
+    travel_time = distance[None, :] / speed + transfer / 60
+    cost = cost_per_km * distance[None, :]
+    return travel_time, cost
+
+
+def scenario_weights(edge_index, values, ids=None):
+    """
+    Reduce (S, options) values to one weight matrix per scenario, over node positions 'ids'.
+
+    Each pair keeps its cheapest option, as EdgeIndex.build does for the
+    planner's own matrices.
+    """
+    n = len(edge_index.nodes)
+    scenarios = len(values)
+    start = edge_index.arrays["start"].astype(np.int64)
+    end = edge_index.arrays["end"].astype(np.int64)
+    weights = np.full((scenarios, n * n), np.inf)
+    offsets = np.arange(scenarios)[:, None] * (n * n)
+    flat = weights.reshape(-1)
+    for a, b in ((start, end), (end, start)):
+        np.minimum.at(flat, (offsets + (a * n + b)[None, :]).reshape(-1), values.reshape(-1))
+    weights = weights.reshape(scenarios, n, n)
+    weights[:, np.arange(n), np.arange(n)] = 0.0
+    if ids is not None:
+        weights = weights[:, ids][:, :, ids]
+    return np.ascontiguousarray(weights)
+
+
+def solve_scenario(weights, start, method="held_karp", time_budget=1.0, use_shortest_paths=False):
+    """
+    Return the visiting order of one scenario's weight matrix, or None.
+
+    With 'use_shortest_paths' the order is expanded into real legs over the
+    scenario's own shortest path closure.
+    """
+    next_hop = None
+    if use_shortest_paths:
+        weights, next_hop = shortest_path_closure(weights)
+    if method == "held_karp" and len(weights) <= EXACT_SWEEP_SIZE:
+        order = held_karp(weights, start)
+    elif method in ("held_karp", "heuristic"):
+        order = local_search(weights, start, time_budget)
+    else:
+        raise ValueError(f"Unknown sweep method '{method}'")
+    if order is not None and next_hop is not None:
+        order = expand_path(next_hop, order)
+    return order
+
+
+def _solve_shared(scenario, start, method, time_budget, use_shortest_paths):
+    """
+    Solve one scenario in a worker process from the shared weight tensor.
+    """
+    return solve_scenario(
+        np.array(_array("weights")[scenario]), start, method, time_budget, use_shortest_paths
+    )
+
+
+def solve_scenarios(weights, start, method="held_karp", time_budget=1.0, workers=None,
+                    use_shortest_paths=False):
+    """
+    Solve every scenario of an (S, n, n) weight tensor, on 'workers' processes if given.
+    """
+    scenarios = len(weights)
+    if not workers or workers <= 1 or scenarios <= 1:
+        return [
+            solve_scenario(weights[s], start, method, time_budget, use_shortest_paths)
+            for s in range(scenarios)
+        ]
+    with SharedArrays() as shared:
+        shared.add("weights", weights)
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(shared.specs,)) as pool:
+            arguments = [(s, start, method, time_budget, use_shortest_paths) for s in range(scenarios)]
+            return list(pool.map(_solve_shared, *zip(*arguments), chunksize=max(1, scenarios // (4 * workers))))
+
+
+def route_totals(edge_index, order, objective, travel_time, cost):
+    """
+    Return the total travel time and cost of a route over node positions.
+
+    Each hop takes the option that is cheapest for the objective under the
+    scenario's own values, ties broken by travel time.
+    """
+    values = {"travel_time": travel_time, "cost": cost, "distance": edge_index.arrays["distance"]}
+    ranking = values[OBJECTIVES[objective]]
+    total_time = total_cost = 0.0
+    for a, b in zip(order, order[1:]):
+        indices, option_ids = edge_index.neighbours(a)
+        candidates = option_ids[indices == b].tolist()
+        best = min(candidates, key=lambda k: (ranking[k], travel_time[k], k))
+        total_time += travel_time[best]
+        total_cost += cost[best]
+    return float(total_time), float(total_cost)
+
+
+def format_sweep(rows):
+    """
+    Format sweep results as an aligned text table.
+    """
+    if not rows:
+        return "No scenarios"
+    varied = [name for name in rows[0] if ":" in name]
+    header = ["#"] + varied + ["Duration (min)", "Cost (KRW)"]
+    lines = []
+    for row in rows:
+        cells = [str(row["scenario"])] + [f"{row[name]:g}" for name in varied]
+        if row["found"]:
+            cells += [f"{row['total_duration'] * 60:.2f}", f"{row['total_cost']:.2f}"]
+        else:
+            cells += ["no route", "-"]
+        lines.append(cells)
+    widths = [max(len(line[k]) for line in [header] + lines) for k in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.rjust(width) for cell, width in zip(line, widths))
+        for line in [header] + lines
+    )
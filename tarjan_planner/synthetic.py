@@ -0,0 +1,98 @@
+"""
+Module containing the synthetic city generator used by the benchmarks.
+
+Generates relatives, transport modes and transport links CSV files of any
+size around Seoul, in the same format as the bundled data files.
+"""
+
+import csv
+import os
+import numpy as np
+from .distances import haversine
+
+# Centre of Seoul and the rough radius of the city in degrees
+SEOUL_CENTRE = (37.5665, 126.9780)
+SEOUL_RADIUS = 0.12
+
+DISTRICTS = (
+    "Gangnam-gu", "Gangdong-gu", "Gangbuk-gu", "Gangseo-gu", "Gwanak-gu",
+    "Gwangjin-gu", "Guro-gu", "Geumcheon-gu", "Nowon-gu", "Dobong-gu",
+    "Dongdaemun-gu", "Dongjak-gu", "Mapo-gu", "Seodaemun-gu", "Seocho-gu",
+    "Seongdong-gu", "Seongbuk-gu", "Songpa-gu", "Yangcheon-gu", "Yeongdeungpo-gu",
+    "Yongsan-gu", "Eunpyeong-gu", "Jongno-gu", "Jung-gu", "Jungnang-gu",
+)
+
+TRANSPORT_MODES = (
+    ("Bus", 40, 2, 5),
+    ("Train", 80, 5, 2),
+    ("Bicycle", 15, 0, 1),
+    ("Walking", 5, 0, 0),
+)
+
+
+def _mode_for(distance):
+    """
+    Pick a plausible transport mode for a link of the given length in km.
+    """
+    if distance < 1:
+        return "Walking"
+    if distance < 4:
+        return "Bicycle"
+    if distance < 8:
+        return "Bus"
+    return "Train"
+
+
+def generate_city(directory, n_relatives, links_per_relative=3, seed=0):
+    """
+    Write a synthetic city to 'directory' and return the three CSV file paths.
+
+    Relatives are scattered around Seoul and each is linked to its nearest
+    neighbours, 'links_per_relative' on average, with a chain through every
+    relative so the graph is always connected. The first relative is Tarjan.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    radius = SEOUL_RADIUS * np.sqrt(rng.random(n_relatives))
+    angle = rng.random(n_relatives) * 2 * np.pi
+    lat = SEOUL_CENTRE[0] + radius * np.sin(angle)
+    lon = SEOUL_CENTRE[1] + radius * np.cos(angle) * 1.25
+    streets = [f"Street_{i}" for i in range(n_relatives)]
+
+    relatives_file = os.path.join(directory, "relatives.csv")
+    with open(relatives_file, mode="w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Relative", "Street Name", "District (Gu)", "Longitude", "Latitude"])
+        for i in range(n_relatives):
+            writer.writerow([
+                "Tarjan" if i == 0 else f"Relative_{i}", streets[i],
+                DISTRICTS[rng.integers(len(DISTRICTS))], f"{lon[i]:.6f}", f"{lat[i]:.6f}",
+            ])
+
+    transport_file = os.path.join(directory, "transport_modes.csv")
+    with open(transport_file, mode="w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Mode of Transport", "Speed_kmh", "Cost_per_km", "Transfer_Time_min"])
+        writer.writerows(TRANSPORT_MODES)
+
+    # Link each relative to its nearest neighbours, processed in blocks of rows
+    pairs = set()
+    k = max(1, min(links_per_relative, n_relatives - 1))
+    for block in range(0, n_relatives, 512):
+        rows = np.arange(block, min(block + 512, n_relatives))
+        distances = haversine(lat[rows, None], lon[rows, None], lat[None, :], lon[None, :])
+        distances[np.arange(len(rows)), rows] = np.inf
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k] if n_relatives > 1 else []
+        for i, neighbours in zip(rows.tolist(), np.asarray(nearest).tolist()):
+            pairs.update((min(i, j), max(i, j)) for j in neighbours)
+    pairs.update((i, i + 1) for i in range(n_relatives - 1))
+
+    links_file = os.path.join(directory, "transport_links.csv")
+    with open(links_file, mode="w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Transport Type", "Start", "End"])
+        for i, j in sorted(pairs):
+            distance = float(haversine(lat[i], lon[i], lat[j], lon[j]))
+            writer.writerow([_mode_for(distance), streets[i], streets[j]])
+
+    return relatives_file, transport_file, links_file
@@ -0,0 +1,227 @@
+"""
+Module containing the typed columnar tables the planner builds its graph from.
+
+Each CSV file is parsed once, in chunks, into one list per column. Repeated
+strings such as street and transport names are interned, coordinates and
+transport parameters are held in NumPy arrays, and names are looked up
+through a hash index instead of scanning the rows.
+"""
+
+import csv
+import sys
+import numpy as np
+
+# Rows parsed per chunk when streaming a CSV file
+CHUNK_ROWS = 50000
+
+
+def read_chunks(path, chunk_size=CHUNK_ROWS):
+    """
+    Yield the header of a CSV file, then its rows in lists of up to 'chunk_size'.
+    """
+    with open(path, mode="r", encoding="utf-8", newline="") as file:
+        reader = csv.reader(file)
+        yield next(reader, [])
+        chunk = []
+        for row in reader:
+            if not row:
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def read_columns(path, float_columns=(), chunk_size=CHUNK_ROWS):
+    """
+    Parse a CSV file into text columns plus float arrays for 'float_columns'.
+
+    Returns (columns, floats): every column as a list of interned strings, and
+    the requested columns converted chunk by chunk into float arrays.
+    """
+    chunks = read_chunks(path, chunk_size)
+    header = next(chunks)
+    columns = {name: [] for name in header}
+    parts = {name: [] for name in float_columns}
+    for chunk in chunks:
+        for name, values in zip(header, zip(*chunk)):
+            columns[name].extend(map(sys.intern, values))
+            if name in parts:
+                parts[name].append(np.array(values, dtype=float))
+    floats = {
+        name: np.concatenate(arrays) if arrays else np.empty(0)
+        for name, arrays in parts.items()
+    }
+    return columns, floats
+
+
+def columns_from_rows(rows, header):
+    """
+    Convert a list of row dictionaries into text columns.
+    """
+    return {name: [sys.intern(str(row[name])) for row in rows] for name in header}
+
+
+def first_index(names):
+    """
+    Return a name to row id index, keeping the first row for repeated names.
+    """
+    index = {}
+    for i, name in enumerate(names):
+        index.setdefault(name, i)
+    return index
+
+
+class Table:
+    """
+    Class containing the text columns of a CSV file and its typed float columns.
+    """
+
+    HEADER = ()
+    FLOAT_COLUMNS = ()
+    KEY = None
+
+    def __init__(self, columns, floats=None):
+        self.columns = columns
+        if floats is None:
+            floats = {name: np.array(columns[name], dtype=float) for name in self.FLOAT_COLUMNS}
+        self.floats = floats
+        self.index = first_index(columns[self.KEY]) if self.KEY else {}
+
+    @classmethod
+    def from_csv(cls, path, chunk_size=CHUNK_ROWS):
+        """
+        Load a table by streaming its CSV file in chunks.
+        """
+        return cls(*read_columns(path, cls.FLOAT_COLUMNS, chunk_size))
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a table from row dictionaries, e.g. after in-memory edits.
+        """
+        header = list(rows[0]) if rows else list(cls.HEADER)
+        return cls(columns_from_rows(rows, header))
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def rows(self):
+        """
+        Return the table as a list of row dictionaries of strings.
+        """
+        names = list(self.columns)
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+
+class RelativesTable(Table):
+    """
+    Class containing the relatives with their coordinates as float arrays.
+    """
+
+    HEADER = ("Relative", "Street Name", "District (Gu)", "Latitude", "Longitude")
+    FLOAT_COLUMNS = ("Latitude", "Longitude")
+    KEY = "Street Name"
+
+    @property
+    def streets(self):
+        """
+        Street names in file order
+        """
+        return self.columns["Street Name"]
+
+    @property
+    def latitude(self):
+        """
+        Latitudes as a float array
+        """
+        return self.floats["Latitude"]
+
+    @property
+    def longitude(self):
+        """
+        Longitudes as a float array
+        """
+        return self.floats["Longitude"]
+
+
+class TransportTable(Table):
+    """
+    Class containing the transport modes with their parameters as float arrays.
+    """
+
+    HEADER = ("Mode of Transport", "Speed_kmh", "Cost_per_km", "Transfer_Time_min")
+    FLOAT_COLUMNS = ("Speed_kmh", "Cost_per_km", "Transfer_Time_min")
+    KEY = "Mode of Transport"
+
+    @property
+    def modes(self):
+        """
+        Transport mode names in file order
+        """
+        return self.columns["Mode of Transport"]
+
+    def price(self, distances, rows):
+        """
+        Return the travel times (hours) and costs of distances by the modes in 'rows'.
+        """
+        distances = np.asarray(distances, dtype=float)
+        travel_time = (
+            distances / self.floats["Speed_kmh"][rows]
+            + self.floats["Transfer_Time_min"][rows] / 60
+        )
+        return travel_time, self.floats["Cost_per_km"][rows] * distances
+
+
+class LinksTable(Table):
+    """
+    Class containing the transport links between streets.
+    """
+
+    HEADER = ("Transport Type", "Start", "End")
+
+    def resolve(self, streets, modes):
+        """
+        Map every link to street and transport mode row ids through their indexes.
+
+        Returns (link_rows, start, end, mode, unknown) for the links whose
+        names all resolve, where 'unknown' lists a dictionary with the file
+        line, column, name and 'reason' of every skipped link: 'unknown' for
+        each name missing from an index, or 'self-loop' for a link whose
+        start and end are the same street.
+        """
+        link_rows, start, end, mode, unknown = [], [], [], [], []
+        columns = (
+            ("Start", self.columns["Start"], streets),
+            ("End", self.columns["End"], streets),
+            ("Transport Type", self.columns["Transport Type"], modes),
+        )
+        for row, ids in enumerate(zip(*(
+            [index.get(name) for name in names] for _, names, index in columns
+        ))):
+            if None in ids:
+                for (column, names, _), found in zip(columns, ids):
+                    if found is None:
+                        # Line 1 is the header
+                        unknown.append({
+                            "line": row + 2, "column": column, "name": names[row], "reason": "unknown",
+                        })
+                continue
+            if ids[0] == ids[1]:
+                unknown.append({
+                    "line": row + 2, "column": "End", "name": self.columns["End"][row], "reason": "self-loop",
+                })
+                continue
+            link_rows.append(row)
+            start.append(ids[0])
+            end.append(ids[1])
+            mode.append(ids[2])
+        return (
+            np.array(link_rows, dtype=np.int64),
+            np.array(start, dtype=np.int64),
+            np.array(end, dtype=np.int64),
+            np.array(mode, dtype=np.int64),
+            unknown,
+        )
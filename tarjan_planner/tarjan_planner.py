@@ -2,253 +2,894 @@
 Module containing all functions related to route planning.
 """
 
-import networkx as nx
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from matplotlib.lines import Line2D
+import logging
+import numpy as np
 from itertools import permutations
-from geopy.distance import geodesic
 from .relatives_manager import RelativesManager
+from .branch_and_bound import branch_and_bound
+from .cache import PlannerCache
+from .clusters import clustered_route, group, kmeans, planar
+from .distances import pairwise_distances
+from .edge_index import OBJECTIVES, EdgeIndex
+from .genetic import genetic_route
+from .instrumentation import count, span
+from .parallel import parallel_brute_force, parallel_held_karp
+from .pareto import pareto_front
+from .road_network import RoadNetwork
+from .spatial import GridIndex
+from .route_solvers import (
+    expand_path, held_karp, insert_missing, local_search, shortest_path_closure
+)
+from .subset_cache import SubsetRouteCache, subset_held_karp
+from .sweeps import price_options, route_totals, scenario_grid, scenario_weights, solve_scenarios
 from .transport_manager import TransportLinkManager
 from .logger import logger, log_execution_time
 
 
+# Above this many stops, heuristic neighbour lists come from the spatial index
+SPATIAL_NEIGHBOURS_MIN = 500
+
+# Memory allowed for the weight matrices of one batch of sweep scenarios
+SWEEP_BATCH_BYTES = 256 * 2 ** 20
+
+
 class TarjanPlanner:
     '''
     Class Containing all functions related to calculating the best route for Tarjan.
     '''
-    def __init__(self, relatives_file, transport_file, links_file):
+    def __init__(self, relatives_file, transport_file, links_file, distance_backend="vincenty",
+                 cache_dir=None, subset_cache_bytes=64 * 2 ** 20, proximity_radius_km=None,
+                 proximity_modes=("Walking", "Bicycle"), road_network=None):
+        self.distance_backend = distance_backend
+        self.road_network_file = road_network
+        self._road_network = None
+        self.proximity_radius_km = proximity_radius_km
+        self.proximity_modes = tuple(proximity_modes)
         self.relatives_manager = RelativesManager(relatives_file)
         self.transport_manager = TransportLinkManager(transport_file, links_file)
-        self.route_map = nx.Graph()
+        self.positions = {}
+        self._route_map = None
+        self.edge_index = EdgeIndex([])
+        self._closures = {}
+        self.cache = PlannerCache(cache_dir) if cache_dir else None
+        self._cache_key = None
+        self._edited = False
+        self.last_tour = None
+        self.unknown_links = []
+        self.subset_cache = SubsetRouteCache(subset_cache_bytes)
+        self.last_decomposition = None
+        self.last_bounds = None
 
     def create_graph(self):
         """
         Create a graph with relatives as nodes and edges based on transport modes.
+
+        When a cache directory is set and the data files are unchanged, the
+        edge index is loaded from disk instead of being rebuilt. Once the
+        graph has been edited in memory, e.g. by add_link, it is always
+        rebuilt from the edited data.
+
+        With 'proximity_radius_km' set, every pair of streets within that
+        distance is also linked by each of 'proximity_modes' (Walking and
+        Bicycle by default), found through a spatial grid index instead of
+        checking all pairs.
+
+        With 'road_network' set to an OpenStreetMap extract, links are priced
+        by their distance along the roads instead of the straight-line
+        distance backend, see road_network.RoadNetwork.
         """
-        relatives = self.relatives_manager.get_relatives()
-        transport_modes = self.transport_manager.get_transport()
-        transport_links = self.transport_manager.get_links()
+        with span("create_graph"):
+            self._create_graph()
 
-        # Add nodes for each relative
-        for relative in relatives:
-            self.route_map.add_node(
-                relative["Street Name"],
-                pos=(float(relative["Longitude"]), float(relative["Latitude"])),
+    def _create_graph(self):
+        """
+        Load or build the edge index for create_graph.
+        """
+        self._closures = {}
+        self.subset_cache.clear()
+        self._cache_key = None
+        # After in-memory edits the data no longer matches the files, so the disk cache is skipped
+        if self.cache is not None and not self._edited:
+            files = [
+                self.relatives_manager.relatives_file,
+                self.transport_manager.transport_file,
+                self.transport_manager.links_file,
+            ]
+            if self.road_network_file:
+                files.append(self.road_network_file)
+            self._cache_key = self.cache.key(
+                files,
+                {
+                    "distance_backend": self.distance_backend,
+                    "road_network": bool(self.road_network_file),
+                    "proximity_radius_km": self.proximity_radius_km,
+                    "proximity_modes": self.proximity_modes,
+                },
             )
+            cached = self.cache.load_graph(self._cache_key)
+            if cached is not None:
+                count("graph_cache_hits")
+                logger.info("Loaded graph from cache %s", self._cache_key)
+                self.edge_index, self.positions, self.unknown_links = cached
+                self._route_map = None
+                return
 
-        # Add edges based on transport links
-        for link in transport_links:
-            start = link["Start"]
-            end = link["End"]
-            transport_type = link["Transport Type"]
+        relatives = self.relatives_manager.table
+        transport_modes = self.transport_manager.transport_table
+        transport_links = self.transport_manager.links_table
 
-            relative1 = next((r for r in relatives if r["Street Name"] == start), None)
-            relative2 = next((r for r in relatives if r["Street Name"] == end), None)
-            
-            # Debug: Print matching results
-            # if relative1 is None:
-            #     print(f"Error: Start node '{start}' not found in relatives")
-            # if relative2 is None:
-            #     print(f"Error: End node '{end}' not found in relatives")
-
-            if relative1 and relative2:
-                distance = geodesic(
-                    (float(relative1["Latitude"]), float(relative1["Longitude"])),
-                    (float(relative2["Latitude"]), float(relative2["Longitude"])),
-                ).km
-
-                transport = next((t for t in transport_modes if t["Mode of Transport"] == transport_type), None)
-
-                if transport:
-                    speed = float(transport["Speed_kmh"])
-                    cost = float(transport["Cost_per_km"]) * distance
-                    travel_time = (
-                        distance / speed
-                        + float(transport["Transfer_Time_min"]) / 60
-                    )
-                    self.route_map.add_edge(
-                        start,
-                        end,
-                        distance=distance,
-                        travel_time=travel_time,
-                        cost=cost,
-                        transport=transport_type,
-                    )
+        # Add a node for each street, keeping the first relative listed at it
+        streets = list(relatives.index)
+        rows = list(relatives.index.values())
+        self.positions = dict(zip(
+            streets, zip(relatives.longitude[rows].tolist(), relatives.latitude[rows].tolist())
+        ))
+        self.edge_index = EdgeIndex(streets)
+        self._route_map = None
+
+        # Match each transport link to its relatives and transport mode by name
+        with span("match_links", links=len(transport_links)):
+            link_rows, start, end, mode, unknown = transport_links.resolve(
+                relatives.index, transport_modes.index
+            )
+        self.unknown_links = unknown
+        for report in unknown:
+            logger.warning(
+                "Skipping link on line %d of %s: %s %s '%s'",
+                report["line"],
+                self.transport_manager.links_file,
+                report["reason"],
+                report["column"],
+                report["name"],
+            )
+
+        # Compute every link distance in one batched call
+        with span("distances", backend=self.distance_backend, pairs=len(link_rows)):
+            distances = self.link_distances(
+                relatives.latitude[start],
+                relatives.longitude[start],
+                relatives.latitude[end],
+                relatives.longitude[end],
+            )
+
+        # Add every transport link to the index, keeping all modes per pair
+        with span("build_index"):
+            distances = np.asarray(distances, dtype=float).reshape(-1)
+            travel_time, cost = transport_modes.price(distances, mode)
+            node_ids = np.array([self.edge_index.position[street] for street in relatives.streets])
+            transport_types = [transport_modes.modes[k] for k in mode.tolist()]
+            self.edge_index.add_many(
+                node_ids[start], node_ids[end], transport_types, distances, travel_time, cost
+            )
+            if logger.isEnabledFor(logging.DEBUG):
+                for k, row in enumerate(link_rows.tolist()):
                     logger.debug(
                         "Edge from %s to %s by %s: time=%.2f, cost=%.2f",
-                        start,
-                        end,
-                        transport_type,
-                        travel_time,
-                        cost
+                        transport_links.columns["Start"][row],
+                        transport_links.columns["End"][row],
+                        transport_types[k],
+                        travel_time[k],
+                        cost[k]
                     )
-                    # Debug: Print edge creation
-                    # print(f"Edge created: {start} -> {end} by {transport_type}, time={travel_time}, cost={cost}")
+            if self.proximity_radius_km:
+                self._add_proximity_links(
+                    relatives.latitude[rows], relatives.longitude[rows], transport_modes,
+                    node_ids[start], node_ids[end], mode,
+                )
+            self.edge_index.build()
+
+        if self._cache_key is not None:
+            self.cache.store_graph(self._cache_key, self.edge_index, self.positions, self.unknown_links)
+
+    @property
+    def road_network(self):
+        """
+        Road network of the OpenStreetMap extract, loaded on first use, or None
+        """
+        if self._road_network is None and self.road_network_file:
+            cache_dir = self.cache.cache_dir if self.cache is not None else None
+            self._road_network = RoadNetwork.from_osm(self.road_network_file, cache_dir)
+        return self._road_network
+
+    def link_distances(self, lat1, lon1, lat2, lon2):
+        """
+        Distances in kilometres between matching pairs of coordinates.
+
+        They are measured along the roads when a road network is set, and
+        with the distance backend otherwise.
+        """
+        if self.road_network is not None:
+            return self.road_network.distances(lat1, lon1, lat2, lon2)
+        return pairwise_distances(lat1, lon1, lat2, lon2, backend=self.distance_backend)
+
+    def _add_proximity_links(self, latitude, longitude, transport_modes, start, end, mode):
+        """
+        Link every pair of streets within the proximity radius by each proximity mode.
+
+        'latitude' and 'longitude' are in node order; pairs already linked by
+        a mode in the links file are not added again.
+        """
+        with span("proximity_links", radius_km=self.proximity_radius_km):
+            index = GridIndex(latitude, longitude)
+            first, second, distances = index.pairs_within(
+                self.proximity_radius_km, backend=self.distance_backend
+            )
+            if self.road_network is not None:
+                # The radius is straight-line; the links are priced along the roads
+                distances = self.link_distances(
+                    latitude[first], longitude[first], latitude[second], longitude[second]
+                )
+            n = len(self.edge_index.nodes)
+            listed = (np.minimum(start, end) * n + np.maximum(start, end)) * len(transport_modes) + mode
+            for transport_type in self.proximity_modes:
+                row = transport_modes.index.get(transport_type)
+                if row is None:
+                    logger.warning("Skipping proximity links: unknown transport mode '%s'", transport_type)
+                    continue
+                new = ~np.isin((first * n + second) * len(transport_modes) + row, listed)
+                travel_time, cost = transport_modes.price(distances[new], row)
+                self.edge_index.add_many(
+                    first[new], second[new], [transport_type] * int(new.sum()),
+                    distances[new], travel_time, cost,
+                )
+                logger.info(
+                    "Added %d %s links within %.2f km", int(new.sum()), transport_type,
+                    self.proximity_radius_km,
+                )
+
+    def spatial_neighbours(self, ids, weights, k=10):
+        """
+        Return the k nearest of 'ids' to each of them, as lists of indices into 'ids'.
+
+        Candidates come from a spatial grid index over the coordinates, then
+        each list is ordered by 'weights' as the local search moves expect.
+        """
+        longitude, latitude = np.array([self.positions[self.edge_index.nodes[i]] for i in ids]).T
+        nearest = GridIndex(latitude, longitude).nearest(k)
+        rows = np.arange(len(ids))[:, None]
+        by_weight = np.argsort(np.asarray(weights)[rows, nearest], axis=1, kind="stable")
+        return np.take_along_axis(nearest, by_weight, axis=1).tolist()
+
+    @staticmethod
+    def _price(distance, transport):
+        """
+        Return the travel time (hours) and cost of a distance by a transport mode.
+        """
+        speed = float(transport["Speed_kmh"])
+        cost = float(transport["Cost_per_km"]) * distance
+        travel_time = (
+            distance / speed
+            + float(transport["Transfer_Time_min"]) / 60
+        )
+        return travel_time, cost
+
+    @property
+    def route_map(self):
+        """
+        networkx view of the graph, built on first use, keeping the fastest mode per pair.
+        """
+        if self._route_map is None:
+            import networkx as nx
+
+            self._route_map = nx.Graph()
+            self._build_route_map()
+        return self._route_map
+
+    def _build_route_map(self):
+        """
+        Add the nodes and fastest edges of the edge index to the networkx view.
+        """
+        for node in self.edge_index.nodes:
+            self._route_map.add_node(node, pos=self.positions[node])
+        for i, j in self.edge_index.pairs().tolist():
+            start, end = self.edge_index.nodes[i], self.edge_index.nodes[j]
+            self._route_map.add_edge(
+                start,
+                end,
+                modes=[option["transport"] for option in self.edge_index.get_options(start, end)],
+                **self.edge_index.best_option(i, j, "time"),
+            )
+
+    def shortest_path_closure(self, objective="time"):
+        """
+        Return the all-pairs shortest-path matrix and next-hops for an objective.
+
+        Computed once per objective and reused until the graph is rebuilt.
+        """
+        if objective not in self._closures:
+            closure = None
+            if self._cache_key is not None:
+                distances = self.cache.load_array(self._cache_key, f"closure_{objective}")
+                next_hop = self.cache.load_array(self._cache_key, f"next_hop_{objective}")
+                if distances is not None and next_hop is not None:
+                    count("closure_cache_hits")
+                    closure = (distances, next_hop)
+            if closure is None:
+                with span("shortest_path_closure", objective=objective):
+                    closure = shortest_path_closure(self.edge_index.matrix(objective))
+                if self._cache_key is not None:
+                    self.cache.store_array(self._cache_key, f"closure_{objective}", closure[0])
+                    self.cache.store_array(self._cache_key, f"next_hop_{objective}", closure[1])
+            self._closures[objective] = closure
+        return self._closures[objective]
+
+    def build_route_data(self, route, objective="time"):
+        """
+        Convert an ordered list of node positions into the route data used for display.
+        """
+        route_data = []
+        for i in range(len(route) - 1):
+            edge_data = self.edge_index.best_option(route[i], route[i + 1], objective)
+            route_data.append({
+                "start": self.edge_index.nodes[route[i]],
+                "end": self.edge_index.nodes[route[i + 1]],
+                "transport": edge_data["transport"],
+                "duration": edge_data["travel_time"],
+                "cost": edge_data["cost"]
+            })
+        return route_data
 
     @log_execution_time
-    def find_best_route(self, start_node):
+    def find_best_route(self, start_node, method="held_karp", time_budget=1.0,
+                        construction="nearest_neighbour", use_shortest_paths=False,
+                        objective="time", workers=None, stops=None, clustering="kmeans",
+                        cluster_size=50, seed=0, generations=None):
+        """
+        Find the best route for an objective: 'time', 'cost' or 'distance'.
+
+        Every hop uses the transport mode that is cheapest for the objective.
+        When 'stops' lists street names, only those (and the start) are
+        visited; otherwise the route covers every relative.
+
+        The default 'held_karp' method is an exact dynamic programming solver
+        that scales to 20+ stops. 'heuristic' builds a route by nearest
+        neighbour or greedy construction and improves it with 2-opt and Or-opt
+        until 'time_budget' seconds have passed, for rounds far too large for
+        an exact method. 'brute_force' keeps the original permutation search
+        so results can be cross-checked.
+
+        'branch_and_bound' is an exact depth-first search that prunes partial
+        routes with lower bounds, starting from a heuristic route. It stops
+        after 'time_budget' seconds if the route is not proven optimal by
+        then, and keeps the certified optimality gap of the last run in
+        'last_bounds'.
+
+        'genetic' evolves a population of routes for 'time_budget' seconds,
+        or for 'generations' generations if given, scoring the whole
+        population with one NumPy lookup per generation. Only a fixed number
+        of generations makes the route depend on 'seed' alone.
+
+        'clustered' is meant for thousands of stops: it splits them into
+        geographic clusters of about 'cluster_size' stops, by k-means on the
+        coordinates or by 'district', solves each cluster separately (on
+        'workers' processes if given) within 'time_budget' and stitches the
+        cluster paths into one route. The clusters and costs of the last run
+        are kept in 'last_decomposition'.
+
+        With 'use_shortest_paths' the solver works on the all-pairs shortest
+        path closure of the graph, so a hop between two relatives may pass
+        through streets that were already visited. Each hop is expanded back
+        into its real legs in the returned route data.
+
+        Setting 'workers' runs 'held_karp' or 'brute_force' on a process pool
+        with the weight matrix in shared memory; the result is identical to the
+        serial run.
+
+        With a cache directory set, routes already solved for the same data and
+        settings are returned from the cache. Only routes that do not depend on
+        how much search fitted in 'time_budget' are cached: those of
+        'held_karp', 'brute_force', 'genetic' with 'generations' given, and
+        'branch_and_bound' when the route was proven optimal. 'heuristic',
+        'clustered' and time-budgeted 'genetic' routes are always solved again.
         """
-        Find the best route based on travel time using a naive tree search algorithm.
+        query = {
+            "start_node": start_node,
+            "method": method,
+            "objective": objective,
+            "use_shortest_paths": use_shortest_paths,
+        }
+        if stops is not None:
+            query["stops"] = sorted(set(stops) - {start_node})
+        if method == "genetic":
+            query.update(seed=seed, generations=generations)
+        # The time budget is left out of the query, as cached routes do not depend on it
+        cacheable = self._cache_key is not None and (
+            method in ("held_karp", "brute_force", "branch_and_bound")
+            or method == "genetic" and generations is not None
+        )
+        if cacheable:
+            entry = self.cache.load_route_entry(self._cache_key, query)
+            if entry is not None:
+                count("route_cache_hits")
+                logger.info("Loaded route from cache %s", self._cache_key)
+                route_data, state = entry
+                for name, value in state.items():
+                    setattr(self, name, value)
+                return route_data
+
+        with span("solve", method=method, objective=objective):
+            route_data = self._solve_route(
+                start_node, method, time_budget, construction, use_shortest_paths, objective, workers,
+                stops, (clustering, cluster_size), seed, generations
+            )
+        if cacheable and (method != "branch_and_bound" or self.last_bounds["optimal"]):
+            # The attributes this solve set, restored on a cache hit
+            state = {}
+            if stops is None and route_data:
+                state["last_tour"] = self.last_tour
+            if method == "branch_and_bound":
+                state["last_bounds"] = self.last_bounds
+            if method == "clustered":
+                state["last_decomposition"] = self.last_decomposition
+            self.cache.store_route(self._cache_key, query, route_data, state)
+        return route_data
+
+    def _solve_route(self, start_node, method, time_budget, construction, use_shortest_paths,
+                     objective, workers=None, stops=None, clusters=("kmeans", 50), seed=0,
+                     generations=None):
+        """
+        Run the chosen solver and return its route data.
+        """
+        if method == "brute_force":
+            if use_shortest_paths:
+                raise ValueError("brute_force does not support use_shortest_paths")
+            if not workers:
+                return self._find_best_route_brute_force(start_node, objective, stops)
+
+        ids = self._stop_ids(start_node, stops)
+        start = ids.index(self.edge_index.position[start_node])
+        if use_shortest_paths:
+            weights, next_hop = self.shortest_path_closure(objective)
+        else:
+            weights = self.edge_index.matrix(objective)
+        if stops is not None:
+            weights = weights[np.ix_(ids, ids)]
+        if method == "held_karp":
+            if workers:
+                order = parallel_held_karp(weights, start, workers)
+            else:
+                order = held_karp(weights, start)
+        elif method == "brute_force":
+            order = parallel_brute_force(weights, start, workers)
+        elif method == "heuristic":
+            neighbours = None
+            if len(ids) > SPATIAL_NEIGHBOURS_MIN:
+                neighbours = self.spatial_neighbours(ids, weights)
+            order = local_search(weights, start, time_budget, construction, neighbours)
+        elif method == "genetic":
+            order = genetic_route(weights, start, time_budget, generations, seed=seed)
+        elif method == "branch_and_bound":
+            order, self.last_bounds = branch_and_bound(weights, start, time_budget)
+            logger.info(
+                "Branch and bound %s: cost %.4f, lower bound %.4f, gap %.2f%%",
+                "proved the route optimal" if self.last_bounds["optimal"] else "stopped early",
+                self.last_bounds["cost"], self.last_bounds["lower_bound"], 100 * self.last_bounds["gap"],
+            )
+        elif method == "clustered":
+            groups = self.cluster_stops(ids, *clusters)
+            neighbours = None
+            if len(ids) > SPATIAL_NEIGHBOURS_MIN:
+                neighbours = self.spatial_neighbours(ids, weights)
+            order, self.last_decomposition = clustered_route(
+                weights, start, groups, time_budget, workers, neighbours
+            )
+        else:
+            raise ValueError(f"Unknown route method '{method}'")
+        if order is None:
+            logger.warning("No route from %s visits every relative.", start_node)
+            return []
+        order = [ids[i] for i in order]
+        if stops is None:
+            # Remember the visiting order so replan can warm-start from it
+            self.last_tour = {
+                "objective": objective,
+                "use_shortest_paths": use_shortest_paths,
+                "order": [self.edge_index.nodes[i] for i in order],
+            }
+        if use_shortest_paths:
+            order = expand_path(next_hop, order)
+        return self.build_route_data(order, objective)
+
+    def cluster_stops(self, ids, clustering="kmeans", cluster_size=50, seed=0):
+        """
+        Split node positions into geographic clusters, as lists of indices into 'ids'.
+
+        'district' groups the streets by the District (Gu) of their relative;
+        'kmeans' groups them by k-means on their coordinates into clusters of
+        about 'cluster_size' streets.
         """
-        weight = "travel_time"
+        nodes = [self.edge_index.nodes[i] for i in ids]
+        if clustering == "district":
+            districts = {}
+            for relative in self.relatives_manager.relatives:
+                districts.setdefault(relative["Street Name"], relative["District (Gu)"])
+            return group([districts.get(node) for node in nodes])
+        if clustering == "kmeans":
+            longitude, latitude = zip(*(self.positions[node] for node in nodes))
+            k = max(1, round(len(nodes) / cluster_size))
+            return group(kmeans(planar(longitude, latitude), k, seed))
+        raise ValueError(f"Unknown clustering '{clustering}'")
+
+    def _stop_ids(self, start_node, stops=None):
+        """
+        Return the node positions a route must visit, starting with the start node.
+        """
+        position = self.edge_index.position
+        if start_node not in position:
+            raise ValueError(f"Unknown street '{start_node}'")
+        if stops is None:
+            return list(range(len(self.edge_index.nodes)))
+        unknown = [stop for stop in stops if stop not in position]
+        if unknown:
+            raise ValueError(f"Unknown streets: {', '.join(unknown)}")
+        ids = [position[start_node]]
+        for stop in stops:
+            if position[stop] not in ids:
+                ids.append(position[stop])
+        return ids
+
+    def _find_best_route_brute_force(self, start_node, objective="time", stops=None):
+        """
+        Find the best route using a naive tree search algorithm.
+        """
+        start = self.edge_index.position[start_node]
 
         # Generate all possible routes starting from the specified node
-        nodes = list(self.route_map.nodes)
-        nodes.remove(start_node)
+        nodes = self._stop_ids(start_node, stops)
+        nodes.remove(start)
         all_routes = permutations(nodes)
 
-        min_travel_time = float('inf')
+        # Score candidates on plain float rows, keeping only the best order
+        rows = self.edge_index.matrix(objective).tolist()
+        inf = float('inf')
+        min_total = inf
+        best_route = None
+        evaluated = pruned = 0
 
         for route in all_routes:
-            route = [start_node] + list(route)
-            route_data = []
-            total_travel_time = 0
+            route = (start,) + route
+            total = 0
+            evaluated += 1
 
-            valid_route = True
             for i in range(len(route) - 1):
-                edge_data = self.route_map.get_edge_data(route[i], route[i + 1])
-                if edge_data is None:
-                    # Try the reverse direction
-                    edge_data = self.route_map.get_edge_data(route[i + 1], route[i])
-                    if edge_data is None:
-                        valid_route = False
-                        break
-                route_data.append({
-                    "start": route[i],
-                    "end": route[i + 1],
-                    "transport": edge_data["transport"],
-                    "duration": edge_data[weight],
-                    "cost": edge_data["cost"]
-                })
-                total_travel_time += edge_data[weight]
-
-            if valid_route and total_travel_time < min_travel_time:
-                min_travel_time = total_travel_time
-                best_route_data = route_data
+                weight = rows[route[i]][route[i + 1]]
+                if weight == inf:
+                    pruned += 1
+                    break
+                total += weight
+            else:
+                if total < min_total:
+                    min_total = total
+                    best_route = route
 
-        # Debug: Print lengths of lists
-        # print(f"Path length: {len(best_route)}")
-        # print(f"Transport methods length: {len(best_transport_methods)}")
-        # print(f"Durations length: {len(best_durations)}")
-        # print(f"Costs length: {len(best_costs)}")
+        count("candidates_evaluated", evaluated)
+        count("candidates_pruned", pruned)
+        if best_route is None:
+            return []
+        return self.build_route_data(list(best_route), objective)
 
-        return best_route_data
+    def select_stops(self, districts=None, relatives=None, exclude=()):
+        """
+        Return the streets of the relatives matching the given districts or names.
 
-    def plot_graph(self, best_route_data=None):
+        For example select_stops(districts=["Gangnam-gu"], exclude=["Relative_3"])
+        selects everyone in Gangnam-gu except Relative_3. With neither
+        'districts' nor 'relatives' every relative is selected.
         """
-        Plot the graph using matplotlib, coloring edges based on the mode of transport.
+        streets = []
+        for relative in self.relatives_manager.relatives:
+            if districts is not None and relative["District (Gu)"] not in districts:
+                continue
+            if relatives is not None and relative["Relative"] not in relatives:
+                continue
+            if relative["Relative"] in exclude or relative["Street Name"] in exclude:
+                continue
+            streets.append(relative["Street Name"])
+        return streets
+
+    @log_execution_time
+    def find_subset_route(self, start_node, stops, objective="time", use_shortest_paths=False):
         """
-        pos = nx.get_node_attributes(self.route_map, "pos")
-        edges = self.route_map.edges(data=True)
+        Find the exact best route over a subset of streets, reusing earlier subset queries.
 
-        # Define colors for each transport mode
-        transport_colors = {
-            "Bus": "blue",
-            "Train": "green",
-            "Bicycle": "red",
-            "Walking": "orange",
-        }
-        
-        # Create a figure and axes
-        fig, ax = plt.subplots(figsize=(12, 8))
-        ax.set_title("Tarjan's Route Planner")
-
-        # Determine edge colors based on the transport mode
-        edge_colors = [transport_colors[data["transport"]] for u, v, data in edges]
-
-        # Separate nodes based on their attributes
-        tarjan_nodes = [node for node, data in self.route_map.nodes(data=True) if node == 'Yeoui-daero']
-        other_nodes = [node for node in self.route_map.nodes() if node != 'Yeoui-daero']
-
-        # Draw Tarjan's node as a green square
-        nx.draw(
-            self.route_map,
-            pos,
-            with_labels=True,
-            nodelist=tarjan_nodes,
-            edge_color=edge_colors,
-            style='dashed',
-            node_color='lightgreen',
-            node_shape='s',
-            node_size=500,
-            font_size=6,
-            ax=ax
+        Held-Karp tables are memoised in 'subset_cache', so a query over the
+        same stops as an earlier one with the same start and objective, or
+        over a subset of them, is answered without solving, and a query that
+        overlaps one only solves the subsets it has not seen. See
+        subset_cache_stats for the hit rates and memory use.
+        """
+        ids = self._stop_ids(start_node, stops)
+        if use_shortest_paths:
+            weights = self.shortest_path_closure(objective)[0]
+        else:
+            weights = self.edge_index.matrix(objective)
+        order = subset_held_karp(
+            weights, ids[0], ids[1:], self.subset_cache,
+            context=(ids[0], objective, use_shortest_paths),
         )
+        logger.debug("Subset route cache: %s", self.subset_cache.stats())
+        if order is None:
+            logger.warning("No route from %s visits every stop.", start_node)
+            return []
+        if use_shortest_paths:
+            order = expand_path(self.shortest_path_closure(objective)[1], order)
+        return self.build_route_data(order, objective)
+
+    def subset_cache_stats(self):
+        """
+        Return the hit rate, entries and memory use of the subset route cache.
+        """
+        return self.subset_cache.stats()
+
+    @log_execution_time
+    def sweep(self, start_node, grid, objective="time", method="held_karp", time_budget=1.0,
+              workers=None, stops=None, use_shortest_paths=False):
+        """
+        Solve the best route under every combination of transport mode parameters.
+
+        'grid' maps a transport mode to {parameter: [values]} for any of
+        Speed_kmh, Cost_per_km and Transfer_Time_min, e.g.
+        {"Bus": {"Speed_kmh": [40, 48]}, "Train": {"Transfer_Time_min": [2, 5]}};
+        a value "x1.2" scales the current one. The links are repriced for all
+        scenarios at once from their stored distances, without touching the
+        graph, and the scenarios are solved on 'workers' processes if given.
+        'method' is 'held_karp' (local search above 16 stops) or 'heuristic'.
 
-        # Draw other nodes as blue circles
-        nx.draw(
-            self.route_map,
-            pos,
-            with_labels=True,
-            nodelist=other_nodes,
-            edge_color=edge_colors,
-            style='dashed',
-            node_color='lightblue',
-            node_shape='o',
-            node_size=500,
-            font_size=6,
-            ax=ax
+        Returns one row per scenario with its parameter values, the total
+        duration and cost of its best route, and the route's streets.
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}'")
+        if method not in ("held_karp", "heuristic"):
+            raise ValueError(f"Unknown sweep method '{method}', expected 'held_karp' or 'heuristic'")
+        transport_table = self.transport_manager.transport_table
+        params, labels = scenario_grid(transport_table, grid)
+        ids = self._stop_ids(start_node, stops)
+        start = ids.index(self.edge_index.position[start_node])
+        subset = ids if stops is not None else None
+
+        with span("sweep", scenarios=len(labels), method=method):
+            travel_time, cost = price_options(self.edge_index, transport_table, params)
+            values = {
+                "time": travel_time,
+                "cost": cost,
+                "distance": np.broadcast_to(self.edge_index.arrays["distance"], travel_time.shape),
+            }[objective]
+            n = len(self.edge_index.nodes)
+            batch = max(1, SWEEP_BATCH_BYTES // (8 * n * n))
+            orders = []
+            for first in range(0, len(labels), batch):
+                weights = scenario_weights(self.edge_index, values[first:first + batch], subset)
+                orders.extend(solve_scenarios(
+                    weights, start, method, time_budget, workers, use_shortest_paths
+                ))
+
+        rows = []
+        for s, (label, order) in enumerate(zip(labels, orders)):
+            row = {"scenario": s, **label, "found": order is not None}
+            if order is not None:
+                nodes = [ids[i] for i in order]
+                row["total_duration"], row["total_cost"] = route_totals(
+                    self.edge_index, nodes, objective, travel_time[s], cost[s]
+                )
+                row["route"] = [self.edge_index.nodes[i] for i in nodes]
+            rows.append(row)
+        logger.info("Solved %d sweep scenarios from %s", len(rows), start_node)
+        return rows
+
+    def _graph_changed(self):
+        """
+        Drop everything derived from the old graph after an incremental update.
+        """
+        self._closures = {}
+        self.subset_cache.clear()
+        self._route_map = None
+        # The in-memory data no longer matches the files the cache key was hashed from
+        self._cache_key = None
+        self._edited = True
+
+    def add_relative(self, relative, street, district, longitude, latitude):
+        """
+        Add a relative's street to the graph without rebuilding it.
+        """
+        self.edge_index.add_node(street)
+        self.positions[street] = (float(longitude), float(latitude))
+        self.relatives_manager.relatives.append({
+            "Relative": relative,
+            "Street Name": street,
+            "District (Gu)": district,
+            "Longitude": str(longitude),
+            "Latitude": str(latitude),
+        })
+        self.relatives_manager.relatives_changed()
+        self._graph_changed()
+        logger.info("Added relative %s at %s", relative, street)
+
+    def remove_relative(self, street):
+        """
+        Remove a relative's street and every link touching it.
+        """
+        self.edge_index.remove_node(street)
+        del self.positions[street]
+        relatives = self.relatives_manager.relatives
+        relatives[:] = [r for r in relatives if r["Street Name"] != street]
+        links = self.transport_manager.links
+        links[:] = [link for link in links if street not in (link["Start"], link["End"])]
+        self.relatives_manager.relatives_changed()
+        self.transport_manager.links_changed()
+        self._graph_changed()
+        logger.info("Removed relative at %s", street)
+
+    def add_link(self, transport_type, start, end):
+        """
+        Add a transport link, pricing and patching only that pair.
+        """
+        if start == end:
+            raise ValueError(f"A link from '{start}' to itself is not allowed")
+        transport = self.transport_manager.get_transport_by_mode(transport_type)
+        (lon1, lat1), (lon2, lat2) = self.positions[start], self.positions[end]
+        distance = float(np.asarray(self.link_distances(lat1, lon1, lat2, lon2)).reshape(-1)[0])
+        travel_time, cost = self._price(distance, transport)
+        self.edge_index.add_option(start, end, transport_type, distance, travel_time, cost)
+        self.transport_manager.links.append(
+            {"Transport Type": transport_type, "Start": start, "End": end}
         )
+        self.transport_manager.links_changed()
+        self._graph_changed()
+        logger.info("Added %s link from %s to %s", transport_type, start, end)
 
-        # Create custom legend handles
-        transport_handles = [
-            mpatches.Patch(color=color, label=mode)
-            for mode, color in transport_colors.items()
-        ]
-        
-        # Create custom legend handles for Tarjan's home and residential districts
-        location_handles = [
-            mpatches.Patch(facecolor='lightgreen', label="Tarjan's Home"),
-            mpatches.Patch(facecolor='lightblue', label="Residential Districts")
+    def remove_link(self, transport_type, start, end):
+        """
+        Remove a transport link between two streets, patching only that pair.
+        """
+        edge_index = self.edge_index
+        i, j = edge_index.position[start], edge_index.position[end]
+        indices, option_ids = edge_index.neighbours(i)
+        mode = edge_index.modes.index(transport_type) if transport_type in edge_index.modes else -1
+        matching = [k for k in option_ids[indices == j] if edge_index.arrays["mode"][k] == mode]
+        if not matching:
+            raise ValueError(f"No {transport_type} link between '{start}' and '{end}'")
+        edge_index.remove_options(matching)
+        links = self.transport_manager.links
+        links[:] = [
+            link for link in links
+            if not (link["Transport Type"] == transport_type and {link["Start"], link["End"]} == {start, end})
         ]
+        self.transport_manager.links_changed()
+        self._graph_changed()
+        logger.info("Removed %s link from %s to %s", transport_type, start, end)
 
-        # Create a faint grey line separator
-        separator = Line2D([0], [0], color='grey', lw=0.5, linestyle='--')
+    def update_transport_mode(self, transport_type, speed_kmh=None, cost_per_km=None,
+                              transfer_time_min=None):
+        """
+        Change a transport mode's parameters and reprice only the links using it.
+        """
+        transport = self.transport_manager.get_transport_by_mode(transport_type)
+        for key, value in (
+            ("Speed_kmh", speed_kmh),
+            ("Cost_per_km", cost_per_km),
+            ("Transfer_Time_min", transfer_time_min),
+        ):
+            if value is not None:
+                transport[key] = str(value)
+        self.transport_manager.transport_changed()
 
+        edge_index = self.edge_index
+        if transport_type in edge_index.modes:
+            option_ids = np.flatnonzero(edge_index.arrays["mode"] == edge_index.modes.index(transport_type))
+            travel_time, cost = self._price(edge_index.arrays["distance"][option_ids], transport)
+            edge_index.update_options(option_ids, travel_time=travel_time, cost=cost)
+        self._graph_changed()
+        logger.info("Updated transport mode %s", transport_type)
 
-        # Add the legend to the plot
-        legend_handles = transport_handles + [separator] + location_handles
-        ax.legend(handles=legend_handles, title="Transport Modes & Locations", loc="upper right")
+    def replan(self, start_node, objective="time", time_budget=0.2, use_shortest_paths=False):
+        """
+        Re-optimise the last route after incremental updates.
 
-        # Add axis labels and grid
-        ax.set_xlabel("Longitude")
-        ax.set_ylabel("Latitude")
-        ax.set_axis_on()
-        ax.grid(True)
-        
-        # Highlight the best route if provided
-        if best_route_data:
-            best_route_edges = [(segment['start'], segment['end']) for segment in best_route_data]
-            nx.draw_networkx_edges(
-                self.route_map,
-                pos,
-                edgelist=best_route_edges,
-                edge_color=edge_colors,
-                arrows=True,
-                arrowstyle="-|>",
-                width=2,
+        The previous visiting order is kept for streets that still exist, new
+        streets are added at their cheapest insertion point, and the result is
+        improved by local search instead of solving again from scratch.
+        """
+        previous = self.last_tour
+        if (
+            previous is None
+            or previous["order"][0] != start_node
+            or previous["objective"] != objective
+            or previous["use_shortest_paths"] != use_shortest_paths
+        ):
+            return self.find_best_route(
+                start_node, method="heuristic", time_budget=time_budget,
+                use_shortest_paths=use_shortest_paths, objective=objective,
             )
-        
-        # Create edge labels
-        edge_labels = {
-            (u, v): f"{data['distance']:.2f}km"
-            for u, v, data in edges
+
+        position = self.edge_index.position
+        if use_shortest_paths:
+            weights, next_hop = self.shortest_path_closure(objective)
+        else:
+            weights = self.edge_index.matrix(objective)
+        order = [position[node] for node in previous["order"] if node in position]
+        order = insert_missing(weights, order)
+        order = local_search(weights, order[0], time_budget, initial=order, patience=20)
+        if order is None:
+            logger.warning("No route from %s visits every relative.", start_node)
+            return []
+        self.last_tour = {
+            "objective": objective,
+            "use_shortest_paths": use_shortest_paths,
+            "order": [self.edge_index.nodes[i] for i in order],
         }
+        if use_shortest_paths:
+            order = expand_path(next_hop, order)
+        return self.build_route_data(order, objective)
 
-        # Draw edge labels
-        nx.draw_networkx_edge_labels(
-            self.route_map,
-            pos,
-            edge_labels=edge_labels,
-            font_size=5,
-            ax=ax
-        )
-        
-        plt.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.05)
+    @log_execution_time
+    def find_pareto_routes(self, start_node):
+        """
+        Find every Pareto-optimal route over travel time and cost in a single search.
 
+        Returns a list of route data sorted from fastest to cheapest; any of
+        them can be passed to format_route.
+        """
+        start = self.edge_index.position[start_node]
+        front = []
+        for _, _, path in pareto_front(self.edge_index, start):
+            route_data = []
+            for (previous, _), (node, k) in zip(path, path[1:]):
+                option = self.edge_index.option(k)
+                route_data.append({
+                    "start": self.edge_index.nodes[previous],
+                    "end": self.edge_index.nodes[node],
+                    "transport": option["transport"],
+                    "duration": option["travel_time"],
+                    "cost": option["cost"]
+                })
+            front.append(route_data)
+        if not front:
+            logger.warning("No route from %s visits every relative.", start_node)
+        return front
+
+    def format_pareto_front(self, front):
+        """
+        Format a summary of each route on a Pareto front for display.
+        """
+        formatted_front = []
+        for i, route_data in enumerate(front):
+            total_duration = sum(segment['duration'] for segment in route_data)
+            total_cost = sum(segment['cost'] for segment in route_data)
+            formatted_front.append(
+                f"{i+1}: {total_duration * 60:.2f} min, KRW {total_cost:.2f}"
+            )
+        return "\n".join(formatted_front)
+
+    def plot_graph(self, best_route_data=None, output_file=None, renderer=None):
+        """
+        Plot the graph using matplotlib, coloring edges based on the mode of transport.
+
+        With 'output_file' the map is rendered off-screen and saved as PNG,
+        SVG or any format matplotlib supports, without needing a display.
+        Passing a MapRenderer from make_renderer reuses its figure, so batch
+        jobs can save many routes without redrawing the map each time.
+        """
+        if output_file is not None or renderer is not None:
+            renderer = renderer or self.make_renderer()
+            return renderer.render(best_route_data, output_file)
+
+        import matplotlib.pyplot as plt
+        from .rendering import MapRenderer
+
+        figure = plt.figure(figsize=(12, 8))
+        MapRenderer(self, figure=figure).render(best_route_data)
         plt.show(block=False)
-        
+        return figure
+
+    def make_renderer(self, **kwargs):
+        """
+        Return an off-screen map renderer for this planner's graph.
+        """
+        from .rendering import MapRenderer
+
+        return MapRenderer(self, **kwargs)
+
     def format_route(self, route_data):
         """
         Format the route for display.
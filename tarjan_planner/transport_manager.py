@@ -2,7 +2,7 @@
 Module containing all functions related to relatives.
 """
 
-import csv
+from .instrumentation import span
 
 
 class TransportManager:
@@ -12,16 +12,47 @@ class TransportManager:
 
     def __init__(self, transport_file):
         self.transport_file = transport_file
-        self.transport = self.load_transport()
+        self._transport = None
+        self._transport_table = None
+
+    @property
+    def transport_table(self):
+        """
+        Transport modes as typed columns with a mode name index, parsed once from file
+        """
+        # Imported here so the menu starts without loading NumPy
+        from .tables import TransportTable
+
+        if self._transport_table is None:
+            if self._transport is not None:
+                # The modes were edited in memory since the file was read
+                self._transport_table = TransportTable.from_rows(self._transport)
+            else:
+                with span("load_csv", file=self.transport_file):
+                    self._transport_table = TransportTable.from_csv(self.transport_file)
+        return self._transport_table
+
+    @property
+    def transport(self):
+        """
+        Transport modes list, loaded from file on first use
+        """
+        if self._transport is None:
+            self._transport = self.load_transport()
+        return self._transport
 
     def load_transport(self):
         """
         Function to load transport data from file
         """
         # Load transport modes from CSV file
-        with open(self.transport_file, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            return list(reader)
+        return self.transport_table.rows()
+
+    def transport_changed(self):
+        """
+        Mark the transport modes list as edited, so the table is rebuilt from it on next use
+        """
+        self._transport_table = None
 
     def get_transport(self):
         """
@@ -70,16 +101,46 @@ class TransportLinkManager(TransportManager):
     def __init__(self, transport_file, links_file):
         super().__init__(transport_file)
         self.links_file = links_file
-        self.links = self.load_links()
+        self._links = None
+        self._links_table = None
+
+    @property
+    def links_table(self):
+        """
+        Transport links as columns of interned names, parsed once from file
+        """
+        from .tables import LinksTable
+
+        if self._links_table is None:
+            if self._links is not None:
+                # The links were edited in memory since the file was read
+                self._links_table = LinksTable.from_rows(self._links)
+            else:
+                with span("load_csv", file=self.links_file):
+                    self._links_table = LinksTable.from_csv(self.links_file)
+        return self._links_table
+
+    @property
+    def links(self):
+        """
+        Transport links list, loaded from file on first use
+        """
+        if self._links is None:
+            self._links = self.load_links()
+        return self._links
 
     def load_links(self):
         """
         Function to load transport links from file
         """
         # Load transport links from CSV file
-        with open(self.links_file, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            return list(reader)
+        return self.links_table.rows()
+
+    def links_changed(self):
+        """
+        Mark the transport links list as edited, so the table is rebuilt from it on next use
+        """
+        self._links_table = None
 
     def get_links(self):
         """
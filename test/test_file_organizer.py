@@ -2,6 +2,7 @@
 Module containing all file_organizer unit tests.
 """
 
+import logging
 import os
 import shutil
 import pytest
@@ -96,4 +97,17 @@ def test_logger():
 
     # Clean up log file after test
     logger.close()
-    os.remove(log_file)
\ No newline at end of file
+    os.remove(log_file)
+
+
+def test_logger_writes_each_line_once(tmp_path):
+    log_file = tmp_path / 'organizer.log'
+    logger = Logger(str(log_file), level=logging.WARNING)
+    logger.log("Skipped info message")
+    for k in range(3):
+        logger.log_error(f"Error {k}")
+    logger.close()
+
+    # One handler only, so every line appears once and in order
+    lines = log_file.read_text().splitlines()
+    assert [line.split(' - ')[-1] for line in lines] == ["Error 0", "Error 1", "Error 2"]
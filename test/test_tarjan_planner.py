@@ -0,0 +1,947 @@
+"""
+Module containing all tarjan_planner unit tests.
+"""
+
+import csv
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+import numpy as np
+import pytest
+from tarjan_planner import cli
+from tarjan_planner.tarjan_planner import TarjanPlanner
+from tarjan_planner.branch_and_bound import branch_and_bound
+from tarjan_planner.clusters import repair
+from tarjan_planner.genetic import genetic_route, order_crossover, random_tours, tour_costs
+from tarjan_planner.distances import accuracy_report, distance_matrix
+from tarjan_planner.instrumentation import span, tracer
+from tarjan_planner.logger import (
+    LOG_FILE, BatchFileHandler, LogPipeline, flush_logs, logger, start_logging, stop_logging
+)
+from tarjan_planner.parallel import parallel_held_karp
+from tarjan_planner.rendering import thin_labels
+from tarjan_planner.road_network import RoadNetwork, read_osm
+from tarjan_planner.service import RouteService
+from tarjan_planner.spatial import GridIndex
+from tarjan_planner.route_solvers import held_karp, local_search, nearest_neighbour, path_cost
+from tarjan_planner.synthetic import generate_city
+from tarjan_planner.tables import RelativesTable
+
+RELATIVES_FILE = "tarjan_planner/relatives.csv"
+TRANSPORT_FILE = "tarjan_planner/transport_modes.csv"
+LINKS_FILE = "tarjan_planner/transport_links.csv"
+
+
+@pytest.fixture
+def small_dataset(tmp_path):
+    # Six streets with a mix of transport links
+    relatives = tmp_path / "relatives.csv"
+    relatives.write_text(
+        "Relative,Street Name,District (Gu),Longitude,Latitude\n"
+        "Tarjan,Yeoui-daero,Yeongdeungpo-gu,126.9243,37.5216\n"
+        "Relative_1,Gangnam-daero,Gangnam-gu,127.0276,37.4979\n"
+        "Relative_2,Yangjae-daero,Seocho-gu,127.0322,37.4833\n"
+        "Relative_3,Sinsa-daero,Gangnam-gu,127.0286,37.5172\n"
+        "Relative_5,Hannam-daero,Yongsan-gu,127.0026,37.5340\n"
+        "Relative_8,Bukhan-ro,Jongno-gu,126.9844,37.5800\n",
+        encoding="utf-8",
+    )
+    modes = tmp_path / "transport_modes.csv"
+    modes.write_text(
+        "Mode of Transport,Speed_kmh,Cost_per_km,Transfer_Time_min\n"
+        "Bus,40,2,5\n"
+        "Train,80,5,2\n"
+        "Bicycle,15,0,1\n"
+        "Walking,5,0,0\n",
+        encoding="utf-8",
+    )
+    links = tmp_path / "transport_links.csv"
+    links.write_text(
+        "Transport Type,Start,End\n"
+        "Bus,Yeoui-daero,Hannam-daero\n"
+        "Bus,Yeoui-daero,Bukhan-ro\n"
+        "Bus,Hannam-daero,Bukhan-ro\n"
+        "Train,Yeoui-daero,Gangnam-daero\n"
+        "Bicycle,Hannam-daero,Sinsa-daero\n"
+        "Bicycle,Sinsa-daero,Gangnam-daero\n"
+        "Bicycle,Sinsa-daero,Yangjae-daero\n"
+        "Bicycle,Gangnam-daero,Yangjae-daero\n",
+        encoding="utf-8",
+    )
+    return str(relatives), str(modes), str(links)
+
+
+def test_held_karp_matches_permutations():
+    rng = np.random.default_rng(0)
+    for n in range(2, 8):
+        weights = rng.random((n, n))
+        weights[rng.random((n, n)) < 0.2] = np.inf
+        order = held_karp(weights, 0)
+        best = min(
+            path_cost(weights, [0] + list(route))
+            for route in itertools.permutations(range(1, n))
+        )
+        if np.isfinite(best):
+            assert path_cost(weights, order) == pytest.approx(best)
+        else:
+            assert order is None
+
+
+def test_find_best_route_methods_agree(small_dataset):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    exact = planner.find_best_route("Bukhan-ro")
+    brute = planner.find_best_route("Bukhan-ro", method="brute_force")
+    assert exact[0]["start"] == "Bukhan-ro"
+    assert len(exact) == len(planner.route_map.nodes) - 1
+    assert sum(s["duration"] for s in exact) == pytest.approx(
+        sum(s["duration"] for s in brute)
+    )
+
+
+def test_local_search_matches_exact_on_small_instances():
+    rng = np.random.default_rng(1)
+    for _ in range(3):
+        points = rng.random((10, 2))
+        weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+        exact = path_cost(weights, held_karp(weights, 0))
+        for construction in ("nearest_neighbour", "greedy"):
+            order = local_search(weights, 0, 0.2, construction)
+            assert order[0] == 0 and sorted(order) == list(range(10))
+            assert path_cost(weights, order) == pytest.approx(exact)
+
+
+def test_branch_and_bound_is_exact_and_interruptible():
+    rng = np.random.default_rng(4)
+    for n in range(2, 11):
+        weights = rng.random((n, n))
+        weights[rng.random((n, n)) < 0.2] = np.inf
+        exact = held_karp(weights, 0)
+        order, report = branch_and_bound(weights, 0)
+        assert report["optimal"]
+        if exact is None:
+            assert order is None
+        else:
+            assert path_cost(weights, order) == pytest.approx(path_cost(weights, exact))
+
+    # Stopped early from a poor route, the gap brackets the optimum
+    points = rng.random((14, 2))
+    weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+    optimum = path_cost(weights, held_karp(weights, 0))
+    order, report = branch_and_bound(weights, 0, initial=list(range(14)), node_limit=3)
+    assert not report["optimal"] and report["interrupted"]
+    assert report["lower_bound"] <= optimum + 1e-9 <= report["cost"] + 1e-9
+    assert report["gap"] == pytest.approx((report["cost"] - report["lower_bound"]) / report["cost"])
+
+
+def test_branch_and_bound_keeps_the_route_being_expanded_on_interrupt(monkeypatch):
+    from tarjan_planner import branch_and_bound as module
+
+    rng = np.random.default_rng(5)
+    points = rng.random((9, 2))
+    weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+    lower_bound = module.lower_bound
+    calls = []
+
+    # The first call is the root bound, the second is inside the root's expansion
+    def interrupt_on_first_child(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        return lower_bound(*args)
+
+    monkeypatch.setattr(module, "lower_bound", interrupt_on_first_child)
+    order, report = branch_and_bound(weights, 0, initial=list(range(9)))
+    assert report["interrupted"] and not report["optimal"]
+    assert report["lower_bound"] <= path_cost(weights, held_karp(weights, 0)) + 1e-9
+
+
+def test_branch_and_bound_method_reports_its_gap(small_dataset):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    brute = planner.find_best_route("Bukhan-ro", method="brute_force")
+    bounded = planner.find_best_route("Bukhan-ro", method="branch_and_bound")
+    assert sum(s["duration"] for s in bounded) == pytest.approx(sum(s["duration"] for s in brute))
+    assert planner.last_bounds["optimal"] and not planner.last_bounds["interrupted"]
+    assert planner.last_bounds["gap"] == 0.0
+    assert planner.last_bounds["lower_bound"] == pytest.approx(planner.last_bounds["cost"])
+
+    # Out of time before the first expansion, only the root bound is certified
+    rng = np.random.default_rng(9)
+    points = rng.random((16, 2))
+    weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+    order, report = branch_and_bound(weights, 0, time_budget=0.0)
+    assert sorted(order) == list(range(16))
+    assert report["interrupted"] and not report["optimal"] and report["nodes_expanded"] == 0
+    assert 0 < report["gap"] < 1
+    assert report["lower_bound"] <= path_cost(weights, held_karp(weights, 0)) + 1e-9
+
+
+def test_genetic_route_is_seeded_and_batched():
+    rng = np.random.default_rng(6)
+    first, second = (random_tours(9, 200, 4, rng) for _ in range(2))
+    children = order_crossover(first, second, rng)
+    assert (np.sort(children, axis=1) == np.arange(9)).all() and (children[:, 0] == 4).all()
+    assert np.allclose(tour_costs(np.eye(9) + 1, first), 8 * np.ones(200))
+
+    points = rng.random((11, 2))
+    weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+    order = genetic_route(weights, 0, generations=40, seed=3)
+    assert order == genetic_route(weights, 0, generations=40, seed=3)
+    assert sorted(order) == list(range(11)) and order[0] == 0
+    assert path_cost(weights, order) == pytest.approx(path_cost(weights, held_karp(weights, 0)))
+
+
+def test_genetic_method_is_reproducible_and_keeps_its_budget(small_dataset):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    brute = planner.find_best_route("Bukhan-ro", method="brute_force")
+    first = planner.find_best_route("Bukhan-ro", method="genetic", seed=5, generations=20)
+    assert first == planner.find_best_route("Bukhan-ro", method="genetic", seed=5, generations=20)
+    assert sum(s["duration"] for s in first) == pytest.approx(sum(s["duration"] for s in brute))
+
+    rng = np.random.default_rng(8)
+    points = rng.random((120, 2))
+    weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+    started = time.perf_counter()
+    order = genetic_route(weights, 0, time_budget=0.3, seed=1)
+    assert time.perf_counter() - started < 0.3 + 0.2
+    assert sorted(order) == list(range(120))
+
+
+def test_genetic_polish_stops_on_asymmetric_weights():
+    rng = np.random.default_rng(4)
+    weights = rng.random((6, 6))
+    np.fill_diagonal(weights, 0)
+    order = genetic_route(weights, 0, generations=5, seed=2)
+    assert sorted(order) == list(range(6)) and order[0] == 0
+    assert path_cost(weights, order) <= path_cost(weights, nearest_neighbour(weights, 0)) + 1e-12
+
+
+def test_heuristic_route_uses_route_data_format(small_dataset):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    route = planner.find_best_route("Bukhan-ro", method="heuristic", time_budget=0.2)
+    assert route[0]["start"] == "Bukhan-ro"
+    assert {"start", "end", "transport", "duration", "cost"} <= set(route[0])
+    assert "Total duration" in planner.format_route(route)
+
+
+def test_shortest_path_closure_allows_revisits(small_dataset, tmp_path):
+    relatives, modes, _ = small_dataset
+    # A star around Hannam-daero has no route without revisiting it
+    links = tmp_path / "star_links.csv"
+    links.write_text(
+        "Transport Type,Start,End\n"
+        "Bus,Hannam-daero,Yeoui-daero\n"
+        "Bus,Hannam-daero,Bukhan-ro\n"
+        "Bicycle,Hannam-daero,Sinsa-daero\n"
+        "Bicycle,Sinsa-daero,Gangnam-daero\n"
+        "Bicycle,Sinsa-daero,Yangjae-daero\n",
+        encoding="utf-8",
+    )
+    planner = TarjanPlanner(relatives, modes, str(links))
+    planner.create_graph()
+    assert planner.find_best_route("Yeoui-daero") == []
+
+    route = planner.find_best_route("Yeoui-daero", use_shortest_paths=True)
+    visited = {route[0]["start"]} | {segment["end"] for segment in route}
+    assert visited == set(planner.route_map.nodes)
+    for segment in route:
+        assert planner.route_map.has_edge(segment["start"], segment["end"])
+    heuristic = planner.find_best_route(
+        "Yeoui-daero", method="heuristic", time_budget=0.2, use_shortest_paths=True
+    )
+    assert sum(s["duration"] for s in heuristic) == pytest.approx(
+        sum(s["duration"] for s in route)
+    )
+
+
+def test_edge_index_keeps_every_mode(small_dataset, tmp_path):
+    relatives, modes, links = small_dataset
+    multi_links = tmp_path / "multi_links.csv"
+    with open(links, encoding="utf-8") as file:
+        multi_links.write_text(
+            file.read() + "Bus,Yeoui-daero,Gangnam-daero\n", encoding="utf-8"
+        )
+    planner = TarjanPlanner(relatives, modes, str(multi_links))
+    planner.create_graph()
+
+    options = planner.edge_index.get_options("Gangnam-daero", "Yeoui-daero")
+    assert sorted(option["transport"] for option in options) == ["Bus", "Train"]
+    i = planner.edge_index.position["Yeoui-daero"]
+    j = planner.edge_index.position["Gangnam-daero"]
+    assert planner.edge_index.best_option(i, j, "time")["transport"] == "Train"
+    assert planner.edge_index.best_option(i, j, "cost")["transport"] == "Bus"
+    assert planner.route_map.edges["Yeoui-daero", "Gangnam-daero"]["transport"] == "Train"
+
+    exact = planner.find_best_route("Bukhan-ro", objective="cost")
+    brute = planner.find_best_route("Bukhan-ro", method="brute_force", objective="cost")
+    assert sum(s["cost"] for s in exact) == pytest.approx(sum(s["cost"] for s in brute))
+
+
+def test_distance_backends_match_geopy():
+    rng = np.random.default_rng(2)
+    lat = 37.4 + rng.random(15) * 0.3
+    lon = 126.8 + rng.random(15) * 0.4
+    reference = distance_matrix(lat, lon, "geodesic")
+    assert distance_matrix(lat, lon, "vincenty") == pytest.approx(reference, abs=1e-6)
+    assert distance_matrix(lat, lon, "haversine") == pytest.approx(reference, rel=5e-3)
+
+    report = accuracy_report(lat, lon)
+    assert report["vincenty"]["max_error_km"] < 1e-6
+    assert report["haversine"]["max_relative_error"] < 5e-3
+    with pytest.raises(ValueError):
+        distance_matrix(lat, lon, "manhattan")
+
+
+def test_create_graph_distance_backend(small_dataset):
+    batched = TarjanPlanner(*small_dataset)
+    batched.create_graph()
+    reference = TarjanPlanner(*small_dataset, distance_backend="geodesic")
+    reference.create_graph()
+    for u, v, data in reference.route_map.edges(data=True):
+        assert batched.route_map.edges[u, v]["distance"] == pytest.approx(data["distance"])
+
+
+def test_planner_cache_warm_start(small_dataset, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    cold = TarjanPlanner(*small_dataset, cache_dir=cache_dir)
+    cold.create_graph()
+    route = cold.find_best_route("Bukhan-ro", use_shortest_paths=True)
+
+    warm = TarjanPlanner(*small_dataset, cache_dir=cache_dir)
+    warm.create_graph()
+    assert warm._cache_key == cold._cache_key
+    assert isinstance(warm.edge_index.matrix("time"), np.memmap)
+    assert sorted(warm.route_map.edges) == sorted(cold.route_map.edges)
+    assert warm.cache.load_route(warm._cache_key, {
+        "start_node": "Bukhan-ro",
+        "method": "held_karp",
+        "objective": "time",
+        "use_shortest_paths": True,
+    }) == route
+    assert warm.find_best_route("Bukhan-ro", use_shortest_paths=True) == route
+    assert warm.last_tour == cold.last_tour
+
+    # A cache hit restores the bounds of the run that was cached
+    bounded = cold.find_best_route("Bukhan-ro", method="branch_and_bound")
+    assert warm.find_best_route("Bukhan-ro", method="branch_and_bound") == bounded
+    assert warm.last_bounds["optimal"] and warm.last_bounds["cost"] == pytest.approx(
+        sum(s["duration"] for s in bounded)
+    )
+
+    # Routes that depend on how much search fitted in the time budget are not cached
+    cold.find_best_route("Bukhan-ro", method="heuristic", time_budget=0.05)
+    assert cold.cache.load_route(cold._cache_key, {
+        "start_node": "Bukhan-ro",
+        "method": "heuristic",
+        "objective": "time",
+        "use_shortest_paths": False,
+    }) is None
+
+    # Changing a data file produces a new cache entry
+    relatives, modes, links = small_dataset
+    with open(links, mode="a", encoding="utf-8") as file:
+        file.write("Walking,Bukhan-ro,Yangjae-daero\nBus,Bukhan-ro,Nowhere-ro\n")
+    stale = TarjanPlanner(*small_dataset, cache_dir=cache_dir)
+    stale.create_graph()
+    assert stale._cache_key != cold._cache_key
+    assert stale.route_map.has_edge("Bukhan-ro", "Yangjae-daero")
+    restored = TarjanPlanner(*small_dataset, cache_dir=cache_dir)
+    restored.create_graph()
+    assert restored.unknown_links == stale.unknown_links != []
+
+
+def test_pareto_front_over_time_and_cost(small_dataset, tmp_path):
+    relatives, modes, links = small_dataset
+    multi_links = tmp_path / "multi_links.csv"
+    with open(links, encoding="utf-8") as file:
+        multi_links.write_text(
+            file.read() + "Bus,Yeoui-daero,Gangnam-daero\nBus,Hannam-daero,Sinsa-daero\n",
+            encoding="utf-8",
+        )
+    planner = TarjanPlanner(relatives, modes, str(multi_links))
+    planner.create_graph()
+    front = planner.find_pareto_routes("Bukhan-ro")
+    totals = [
+        (sum(s["duration"] for s in route), sum(s["cost"] for s in route))
+        for route in front
+    ]
+    assert len(front) >= 2
+    # Sorted by time with strictly decreasing cost, so no point dominates another
+    for (time1, cost1), (time2, cost2) in zip(totals, totals[1:]):
+        assert time1 < time2 and cost1 > cost2
+
+    fastest = planner.find_best_route("Bukhan-ro", method="brute_force", objective="time")
+    cheapest = planner.find_best_route("Bukhan-ro", method="brute_force", objective="cost")
+    assert totals[0][0] == pytest.approx(sum(s["duration"] for s in fastest))
+    assert totals[-1][1] == pytest.approx(sum(s["cost"] for s in cheapest))
+    assert "Total cost" in planner.format_route(front[-1])
+    assert len(planner.format_pareto_front(front).splitlines()) == len(front)
+
+
+def test_parallel_solvers_match_serial(small_dataset):
+    rng = np.random.default_rng(3)
+    weights = rng.random((8, 8))
+    weights[rng.random((8, 8)) < 0.2] = np.inf
+    assert parallel_held_karp(weights, 1, workers=2) == held_karp(weights, 1)
+
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    for method in ("held_karp", "brute_force"):
+        serial = planner.find_best_route("Bukhan-ro", method=method)
+        assert planner.find_best_route("Bukhan-ro", method=method, workers=2) == serial
+
+
+def test_subset_route_visits_only_stops(small_dataset):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    stops = ["Sinsa-daero", "Yangjae-daero"]
+    route = planner.find_best_route("Hannam-daero", stops=stops)
+    assert [segment["end"] for segment in route] == ["Sinsa-daero", "Yangjae-daero"]
+    assert planner.find_best_route("Hannam-daero", method="brute_force", stops=stops) == route
+    with pytest.raises(ValueError):
+        planner.find_best_route("Hannam-daero", stops=["Nowhere"])
+
+
+def test_cli_plan_and_batch(small_dataset, tmp_path, capsys):
+    relatives, modes, links = small_dataset
+    data_args = ["--relatives", relatives, "--modes", modes, "--links", links]
+    assert cli.run(["plan", "--start", "Bukhan-ro", "--format", "json"] + data_args) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["found"] and result["route"][0]["start"] == "Bukhan-ro"
+
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text(
+        json.dumps({"start": "Hannam-daero", "stops": ["Sinsa-daero"], "objective": "cost"}) + "\n"
+        + json.dumps({"start": "Nowhere"}) + "\n",
+        encoding="utf-8",
+    )
+    output = tmp_path / "results.jsonl"
+    assert cli.run(["batch", str(queries), "-o", str(output)] + data_args) == 1
+    first, second = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert first["route"][0]["end"] == "Sinsa-daero"
+    assert second == {"line": 2, "error": "Unknown street 'Nowhere'"}
+
+    # Bad input on plan and sweep is reported without a traceback
+    assert cli.run(["plan", "--start", "Nowhere"] + data_args) == 2
+    assert cli.run(["plan", "--start", "Bukhan-ro", "--method", "brute_force", "--shortest-paths"]
+                   + data_args) == 2
+    assert cli.run(["sweep", "--start", "Bukhan-ro", "--vary", "Bus"] + data_args) == 2
+    errors = capsys.readouterr().err
+    assert "Unknown street 'Nowhere'" in errors and "brute_force does not support" in errors
+
+
+def test_import_defers_heavy_dependencies():
+    code = (
+        "import sys, tarjan_planner\n"
+        "from tarjan_planner import interface\n"
+        "heavy = {'numpy', 'networkx', 'matplotlib', 'geopy'} & set(sys.modules)\n"
+        "print(sorted(heavy))\n"
+        "print(interface.get_relatives_manager()._relatives)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.splitlines() == ["[]", "None"]
+
+
+def test_headless_map_rendering(small_dataset, tmp_path):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    route = planner.find_best_route("Bukhan-ro")
+    planner.plot_graph(route, output_file=str(tmp_path / "route.png"))
+    planner.plot_graph(route, output_file=str(tmp_path / "route.svg"))
+    assert (tmp_path / "route.png").read_bytes().startswith(b"\x89PNG")
+    assert "<svg" in (tmp_path / "route.svg").read_text(encoding="utf-8")
+
+    # A reused renderer keeps a single route overlay on the same figure
+    renderer = planner.make_renderer()
+    for i in range(3):
+        figure = planner.plot_graph(route, output_file=str(tmp_path / f"{i}.png"), renderer=renderer)
+        assert figure is renderer.figure
+    assert len(renderer._overlay) == 1
+
+
+def test_thin_labels_limits_dense_maps():
+    points = np.random.default_rng(4).random((500, 2))
+    kept = thin_labels(points, 25)
+    assert 0 < len(kept) <= 25
+    assert thin_labels(points[:10], 25) == list(range(10))
+
+
+def test_edge_index_csr_matches_links(small_dataset):
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    edge_index = planner.edge_index
+    hannam = edge_index.position["Hannam-daero"]
+    indices, option_ids = edge_index.neighbours(hannam)
+    assert sorted(edge_index.nodes[i] for i in indices) == [
+        "Bukhan-ro", "Sinsa-daero", "Yeoui-daero"
+    ]
+    for j, k in zip(indices, option_ids):
+        ends = {edge_index.arrays["start"][k], edge_index.arrays["end"][k]}
+        assert ends == {hannam, j}
+    assert len(edge_index.pairs()) == planner.route_map.number_of_edges()
+    assert edge_index.indptr[-1] == 2 * len(edge_index.arrays["start"])
+
+
+def test_incremental_updates_match_full_rebuild(small_dataset, tmp_path):
+    relatives, modes, links = small_dataset
+    planner = TarjanPlanner(relatives, modes, links, cache_dir=str(tmp_path / "cache"))
+    planner.create_graph()
+    planner.find_best_route("Bukhan-ro", use_shortest_paths=True)
+    # The rows are loaded, but the table is only rebuilt after an edit
+    table = planner.relatives_manager.table
+    assert planner.relatives_manager.relatives and planner.relatives_manager.table is table
+
+    planner.add_relative("Relative_9", "Samseong-ro", "Gangnam-gu", 127.0590, 37.5110)
+    assert "Samseong-ro" in planner.relatives_manager.table.index
+    planner.add_link("Bicycle", "Gangnam-daero", "Samseong-ro")
+    planner.add_link("Bus", "Hannam-daero", "Sinsa-daero")
+    planner.remove_link("Bus", "Yeoui-daero", "Bukhan-ro")
+    planner.update_transport_mode("Bicycle", speed_kmh=20)
+    planner.remove_relative("Yangjae-daero")
+    route = planner.replan("Bukhan-ro", use_shortest_paths=True)
+
+    # Links spliced into the adjacency match a full CSR rebuild
+    edge_index = planner.edge_index
+    spliced = (edge_index.indptr.copy(), edge_index.indices.copy(), edge_index.edge_option.copy())
+    edge_index._build_csr()
+    for before, after in zip(spliced, (edge_index.indptr, edge_index.indices, edge_index.edge_option)):
+        assert np.array_equal(before, after)
+
+    # Write the same edits to new files and rebuild from scratch
+    edited = [tmp_path / name for name in ("r.csv", "m.csv", "l.csv")]
+    for path, rows in zip(edited, (
+        planner.relatives_manager.get_relatives(),
+        planner.transport_manager.get_transport(),
+        planner.transport_manager.get_links(),
+    )):
+        with open(path, mode="w", encoding="utf-8", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    rebuilt = TarjanPlanner(*map(str, edited))
+    rebuilt.create_graph()
+
+    assert rebuilt.edge_index.nodes == planner.edge_index.nodes
+    for objective in ("time", "cost", "distance"):
+        assert np.allclose(
+            planner.edge_index.matrix(objective), rebuilt.edge_index.matrix(objective)
+        )
+    assert {s["end"] for s in route} | {"Bukhan-ro"} == set(rebuilt.edge_index.nodes)
+    exact = rebuilt.find_best_route("Bukhan-ro", use_shortest_paths=True)
+    assert sum(s["duration"] for s in route) == pytest.approx(
+        sum(s["duration"] for s in exact)
+    )
+
+    # Rebuilding after the edits must not bring back the cached original graph
+    planner.create_graph()
+    assert planner.edge_index.nodes == rebuilt.edge_index.nodes
+    assert np.allclose(planner.edge_index.matrix("time"), rebuilt.edge_index.matrix("time"))
+
+
+def test_synthetic_city_loads_and_is_connected(tmp_path):
+    """
+    Test that a generated city is reproducible and gives a connected graph.
+    """
+    files = generate_city(tmp_path / "a", 40, seed=3)
+    again = generate_city(tmp_path / "b", 40, seed=3)
+    for first, second in zip(files, again):
+        with open(first, encoding="utf-8") as a, open(second, encoding="utf-8") as b:
+            assert a.read() == b.read()
+
+    planner = TarjanPlanner(*files)
+    planner.create_graph()
+    assert len(planner.edge_index.nodes) == 40
+    distances, _ = planner.shortest_path_closure()
+    assert np.isfinite(distances).all()
+
+
+def test_instrumentation_spans_and_export(small_dataset, tmp_path):
+    """
+    Test that planning records nested spans and counters only while tracing is on.
+    """
+    tracer.reset()
+    with span("ignored"):
+        planner = TarjanPlanner(*small_dataset)
+        planner.create_graph()
+    assert not tracer.spans
+
+    tracer.enable(trace_memory=True)
+    try:
+        planner = TarjanPlanner(*small_dataset)
+        planner.create_graph()
+        planner.find_best_route("Yeoui-daero", method="brute_force")
+    finally:
+        tracer.disable()
+    spans = {record["name"]: record for record in tracer.spans}
+    assert spans["distances"]["parent"] == "create_graph"
+    assert spans["solve"]["parent"] == "find_best_route"
+    assert spans["create_graph"]["peak_bytes"] > 0
+    assert tracer.counters["candidates_evaluated"] == 120
+
+    tracer.export(tmp_path / "trace.json")
+    tracer.export(tmp_path / "chrome.json", trace_format="chrome")
+    with open(tmp_path / "chrome.json", encoding="utf-8") as file:
+        events = json.load(file)["traceEvents"]
+    assert {"create_graph", "solve", "candidates_evaluated"} <= {event["name"] for event in events}
+    tracer.reset()
+
+
+def test_columnar_loader_indexes_and_reports_unknown_streets(small_dataset):
+    """
+    Test the chunked typed loader and that links to unknown streets are reported.
+    """
+    relatives_file, modes_file, links_file = small_dataset
+    table = RelativesTable.from_csv(relatives_file, chunk_size=4)
+    assert len(table) == 6
+    assert table.index["Sinsa-daero"] == 3
+    assert table.latitude.dtype == np.float64
+    assert table.longitude[3] == pytest.approx(127.0286)
+    assert table.rows()[0]["Latitude"] == "37.5216"
+
+    with open(links_file, mode="a", encoding="utf-8") as file:
+        file.write(
+            "Bus,Yeoui-daero,Nowhere-ro\nFerry,Yeoui-daero,Bukhan-ro\nBus,Sinsa-daero,Sinsa-daero\n"
+        )
+    planner = TarjanPlanner(relatives_file, modes_file, links_file)
+    planner.create_graph()
+    assert planner.unknown_links == [
+        {"line": 10, "column": "End", "name": "Nowhere-ro", "reason": "unknown"},
+        {"line": 11, "column": "Transport Type", "name": "Ferry", "reason": "unknown"},
+        {"line": 12, "column": "End", "name": "Sinsa-daero", "reason": "self-loop"},
+    ]
+    assert len(planner.edge_index.arrays["start"]) == 8
+    assert not np.any(planner.edge_index.arrays["start"] == planner.edge_index.arrays["end"])
+
+
+def test_route_service_caches_and_reloads(small_dataset, tmp_path):
+    """
+    Test that the service answers queries, caches them and reloads on file changes.
+    """
+    relatives_file, modes_file, links_file = small_dataset
+    defaults = cli.build_parser().parse_args(["serve"])
+    service = RouteService(small_dataset, defaults, workers=1)
+    socket_path = str(tmp_path / "service.sock")
+    query = {"start": "Yeoui-daero", "stops": ["Gangnam-daero", "Yangjae-daero"]}
+
+    async def ask(reader, writer, request):
+        writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await writer.drain()
+        return json.loads(await reader.readline())
+
+    async def session():
+        server = await service.start(socket_path)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            first, second = await asyncio.gather(
+                service.query(dict(query)), service.query(dict(query))
+            )
+            cached = await ask(reader, writer, query)
+            error = await ask(reader, writer, {"start": "Nowhere"})
+
+            # A faster direct train makes the cached route stale
+            with open(links_file, mode="a", encoding="utf-8") as file:
+                file.write("Train,Gangnam-daero,Yangjae-daero\n")
+            reloaded = await ask(reader, writer, query)
+            stats = await ask(reader, writer, {"command": "stats"})
+            writer.close()
+        return first, second, cached, error, reloaded, stats
+
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    expected = cli.route_result(query, planner.find_best_route("Yeoui-daero", stops=query["stops"]))
+    try:
+        first, second, cached, error, reloaded, stats = asyncio.run(session())
+    finally:
+        service.close()
+
+    assert first == second == cached == expected
+    assert error == {"error": "Unknown street 'Nowhere'"}
+    assert reloaded["route"][-1]["transport"] == "Train"
+    assert stats["cache_hits"] == 1
+    assert stats["reloads"] == 1
+
+
+def test_route_service_recovers_from_worker_and_file_errors(small_dataset, tmp_path):
+    """
+    Test that the service replies with errors for a dead worker or a missing file, then recovers.
+    """
+    defaults = cli.build_parser().parse_args(["serve"])
+    service = RouteService(small_dataset, defaults, workers=1)
+    not_a_socket = tmp_path / "notes.txt"
+    not_a_socket.write_text("keep me", encoding="utf-8")
+    socket_path = str(tmp_path / "service.sock")
+
+    async def ask(reader, writer, request):
+        writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await writer.drain()
+        return json.loads(await reader.readline())
+
+    async def session():
+        with pytest.raises(ValueError):
+            await service.start(str(not_a_socket))
+        server = await service.start(socket_path)
+        async with server:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+            solved = await ask(reader, writer, {"start": "Yeoui-daero"})
+            for pid in list(service.pool._processes):
+                os.kill(pid, signal.SIGKILL)
+            broken = await ask(reader, writer, {"start": "Gangnam-daero"})
+            restarted = await ask(reader, writer, {"start": "Gangnam-daero"})
+            cached = await ask(reader, writer, {"start": "Yeoui-daero"})
+            os.remove(small_dataset[2])
+            missing = await ask(reader, writer, {"start": "Yeoui-daero"})
+            writer.close()
+        return solved, broken, restarted, cached, missing
+
+    try:
+        solved, broken, restarted, cached, missing = asyncio.run(session())
+    finally:
+        service.close()
+
+    assert not_a_socket.read_text(encoding="utf-8") == "keep me"
+    assert "error" in broken and "route" in restarted
+    assert cached == solved
+    assert "error" in missing
+
+
+def test_subset_routes_reuse_cached_tables(small_dataset):
+    """
+    Test that subset queries match find_best_route and reuse earlier tables.
+    """
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    stops = planner.select_stops(districts=["Gangnam-gu", "Seocho-gu", "Yongsan-gu"])
+    assert stops == ["Gangnam-daero", "Yangjae-daero", "Sinsa-daero", "Hannam-daero"]
+    assert planner.select_stops(districts=["Gangnam-gu"], exclude=["Relative_3"]) == ["Gangnam-daero"]
+
+    queries = [stops, stops[:3], stops[1:] + ["Bukhan-ro"], stops]
+    for query in queries:
+        route = planner.find_subset_route("Yeoui-daero", query, use_shortest_paths=True)
+        expected = planner.find_best_route("Yeoui-daero", stops=query, use_shortest_paths=True)
+        assert sum(segment["duration"] for segment in route) == pytest.approx(
+            sum(segment["duration"] for segment in expected)
+        )
+        assert set(query) <= {segment["end"] for segment in route}
+
+    stats = planner.subset_cache_stats()
+    assert (stats["misses"], stats["hits"], stats["partial_hits"]) == (1, 2, 1)
+    assert 0 < stats["memory_mb"] <= stats["max_memory_mb"]
+    planner.remove_link("Bus", "Hannam-daero", "Bukhan-ro")
+    assert planner.subset_cache_stats()["entries"] == 0
+
+
+def test_clustered_route_covers_every_stop(tmp_path):
+    """
+    Test that the clustered method visits every street once, close to the flat heuristic.
+    """
+    planner = TarjanPlanner(*generate_city(tmp_path, 150, seed=4))
+    planner.create_graph()
+    start = planner.edge_index.nodes[0]
+    flat = planner.find_best_route(start, method="heuristic", time_budget=0.5, use_shortest_paths=True)
+    for clustering in ("kmeans", "district"):
+        route = planner.find_best_route(
+            start, method="clustered", time_budget=0.5, use_shortest_paths=True,
+            clustering=clustering, cluster_size=30,
+        )
+        assert planner.last_tour["order"][0] == start
+        assert sorted(planner.last_tour["order"]) == sorted(planner.edge_index.nodes)
+        assert sum(segment["duration"] for segment in route) < 1.15 * sum(
+            segment["duration"] for segment in flat
+        )
+    assert planner.last_decomposition["clusters"] > 1
+    assert sum(planner.last_decomposition["sizes"]) == 150
+
+
+def test_cluster_repair_removes_missing_links():
+    """
+    Test that the join repair can still improve a path that uses missing links.
+    """
+    rng = np.random.default_rng(20)
+    points = rng.random((8, 2))
+    weights = np.linalg.norm(points[:, None] - points[None], axis=2)
+    missing = rng.random((8, 8)) < 0.3
+    missing |= missing.T
+    np.fill_diagonal(missing, False)
+    weights[missing] = np.inf
+    order = rng.permutation(8).tolist()
+    assert not np.isfinite(path_cost(weights, order))
+    assert np.isfinite(path_cost(weights, repair(weights, order, 0.2)))
+
+
+def test_spatial_index_matches_brute_force(small_dataset, tmp_path):
+    """
+    Test radius pairs and k-nearest queries against all-pairs distances.
+    """
+    rng = np.random.default_rng(5)
+    lat = 37.55 + rng.normal(0, 0.03, 300)
+    lon = 126.98 + rng.normal(0, 0.04, 300)
+    index = GridIndex(lat, lon)
+    distances = distance_matrix(lat, lon)
+    i, j, d = index.pairs_within(0.8)
+    expected_i, expected_j = np.nonzero(np.triu(distances <= 0.8, 1))
+    assert np.array_equal(i, expected_i) and np.array_equal(j, expected_j)
+    assert np.allclose(d, distances[i, j])
+
+    planar_distances = ((index.points[:, None] - index.points[None]) ** 2).sum(axis=2)
+    np.fill_diagonal(planar_distances, np.inf)
+    nearest = index.nearest(5)
+    assert np.allclose(
+        np.take_along_axis(planar_distances, nearest, axis=1), np.sort(planar_distances, axis=1)[:, :5]
+    )
+
+    # Yeoui-daero is more than 3 km from every other street
+    planner = TarjanPlanner(*small_dataset, proximity_radius_km=3.0)
+    planner.create_graph()
+    walking = planner.edge_index.modes.index("Walking")
+    added = planner.edge_index.arrays["mode"] == walking
+    names = {
+        tuple(sorted((planner.edge_index.nodes[a], planner.edge_index.nodes[b])))
+        for a, b in zip(planner.edge_index.arrays["start"][added], planner.edge_index.arrays["end"][added])
+    }
+    assert ("Gangnam-daero", "Yangjae-daero") in names
+    assert all(planner.edge_index.arrays["distance"][added] <= 3.0)
+    assert not any("Yeoui-daero" in pair for pair in names)
+
+
+def test_road_network_matches_dijkstra(small_dataset, tmp_path):
+    """
+    Test contraction hierarchy distances against Dijkstra on a synthetic street grid.
+    """
+    import networkx as nx
+
+    # A 14 x 14 grid over the small dataset with some streets missing
+    rng = np.random.default_rng(3)
+    lines = ['<?xml version="1.0"?>', '<osm version="0.6">']
+    ids = np.arange(14 * 14).reshape(14, 14) + 1
+    for (r, c), node in np.ndenumerate(ids):
+        lines.append(f'<node id="{node}" lat="{37.47 + 0.01 * r}" lon="{126.91 + 0.01 * c}"/>')
+    for way, refs in enumerate(list(ids) + list(ids.T)):
+        refs = [ref for ref in refs if rng.random() > 0.15]
+        highway = "construction" if way == 3 else "residential"
+        lines.append(
+            f'<way id="{way}">' + "".join(f'<nd ref="{ref}"/>' for ref in refs)
+            + f'<tag k="highway" v="{highway}"/></way>'
+        )
+    lines.append("</osm>")
+    osm = tmp_path / "seoul.osm"
+    osm.write_text("\n".join(lines), encoding="utf-8")
+
+    network = RoadNetwork.from_osm(str(osm), str(tmp_path / "roads"))
+    latitude, longitude, first, second = read_osm(str(osm))
+    graph = nx.Graph()
+    for a, b in zip(first.tolist(), second.tolist()):
+        length = float(distance_matrix([latitude[a], latitude[b]], [longitude[a], longitude[b]], "haversine")[0, 1])
+        graph.add_edge(a, b, weight=length)
+    sources, targets = rng.choice(len(network), 15), rng.choice(len(network), 15)
+    expected = [[nx.dijkstra_path_length(graph, int(s), int(t)) for t in targets] for s in sources]
+    assert np.allclose(network.hierarchy.many_to_many(sources, targets), expected)
+
+    # The second load reads the stored hierarchy
+    cached = RoadNetwork.from_osm(str(osm), str(tmp_path / "roads"))
+    assert np.array_equal(cached.hierarchy.up_indices, network.hierarchy.up_indices)
+
+    # Road distances can only be longer than straight lines
+    road = TarjanPlanner(*small_dataset, road_network=str(osm))
+    road.create_graph()
+    straight = TarjanPlanner(*small_dataset)
+    straight.create_graph()
+    assert np.all(road.edge_index.arrays["distance"] >= straight.edge_index.arrays["distance"] - 1e-9)
+    route = road.find_best_route(start_node="Yeoui-daero", objective="distance")
+    assert len(route) == len(road.edge_index.nodes) - 1
+
+    # Each hop is the road distance between the snapped ends, plus the snapping offsets
+    expected_total = 0.0
+    for segment in route:
+        (lon1, lat1), (lon2, lat2) = road.positions[segment["start"]], road.positions[segment["end"]]
+        (a, b), offsets = network.snap([lat1, lat2], [lon1, lon2])
+        expected_total += nx.dijkstra_path_length(graph, int(a), int(b)) + offsets.sum()
+    position = road.edge_index.position
+    total = sum(
+        road.edge_index.best_option(position[s["start"]], position[s["end"]], "distance")["distance"]
+        for s in route
+    )
+    assert total == pytest.approx(expected_total)
+
+
+def test_sweep_matches_edited_transport_file(small_dataset, tmp_path, capsys):
+    """
+    Test that each sweep scenario matches a planner built from the edited modes file.
+    """
+    relatives, modes, links = small_dataset
+    planner = TarjanPlanner(*small_dataset)
+    planner.create_graph()
+    grid = {"Bus": {"Speed_kmh": ["x1", "x0.25"]}, "Bicycle": {"Transfer_Time_min": [1, 30]}}
+    rows = planner.sweep("Yeoui-daero", grid)
+    assert [(row["Bus:Speed_kmh"], row["Bicycle:Transfer_Time_min"]) for row in rows] == [
+        (40, 1), (40, 30), (10, 1), (10, 30)
+    ]
+    for row in rows:
+        edited = tmp_path / f"modes_{row['scenario']}.csv"
+        edited.write_text(
+            "Mode of Transport,Speed_kmh,Cost_per_km,Transfer_Time_min\n"
+            f"Bus,{row['Bus:Speed_kmh']},2,5\n"
+            "Train,80,5,2\n"
+            f"Bicycle,15,0,{row['Bicycle:Transfer_Time_min']}\n"
+            "Walking,5,0,0\n",
+            encoding="utf-8",
+        )
+        rebuilt = TarjanPlanner(relatives, str(edited), links)
+        rebuilt.create_graph()
+        route = rebuilt.find_best_route("Yeoui-daero")
+        assert row["total_duration"] == pytest.approx(sum(s["duration"] for s in route))
+        assert row["total_cost"] == pytest.approx(sum(s["cost"] for s in route))
+
+    data_args = ["--relatives", str(relatives), "--modes", str(modes), "--links", str(links)]
+    assert cli.run(["sweep", "--start", "Yeoui-daero", "--vary", "Bus:Speed_kmh=40,10"] + data_args) == 0
+    assert "Bus:Speed_kmh" in capsys.readouterr().out
+
+
+def test_batched_logging_writes_each_line_once(tmp_path):
+    """
+    Test that queued, batched log lines are written once, in order, and filtered by level.
+    """
+    log_file = tmp_path / "planner.log"
+    handler = BatchFileHandler(str(log_file), batch_size=10, flush_interval=60)
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    test_logger = logging.getLogger("tarjan_planner_test_logger")
+    test_logger.propagate = False
+    pipeline = LogPipeline(test_logger, [handler])
+    try:
+        test_logger.info("direct 0")
+        pipeline.start()
+        for k in range(1, 25):
+            test_logger.info("queued %d", k)
+            test_logger.debug("hidden %d", k)
+        pipeline.flush()
+        lines = log_file.read_text(encoding="utf-8").splitlines()
+        assert lines == ["INFO direct 0"] + [f"INFO queued {k}" for k in range(1, 25)]
+
+        test_logger.error("stopped")
+        pipeline.flush()
+        assert log_file.read_text(encoding="utf-8").splitlines()[-1] == "ERROR stopped"
+    finally:
+        pipeline.close()
+
+    # The planner's own logger writes through the same pipeline
+    start_logging()
+    try:
+        # Unique per run, since the log file keeps the lines of earlier runs
+        marker = f"batched logging marker {time.time_ns()}"
+        logger.info(marker)
+        flush_logs()
+        with open(LOG_FILE, encoding="utf-8") as file:
+            assert file.read().count(marker) == 1
+    finally:
+        stop_logging()